@@ -4,8 +4,11 @@ import { api } from '../services/api';
 
 export default function AdminDashboard() {
   const [users, setUsers] = useState([]);
+  const [usersCursor, setUsersCursor] = useState(null);
   const [redFlags, setRedFlags] = useState([]);
+  const [redFlagsCursor, setRedFlagsCursor] = useState(null);
   const [courses, setCourses] = useState([]);
+  const [coursesCursor, setCoursesCursor] = useState(null);
   const [showCourseForm, setShowCourseForm] = useState(false);
   const [activeTab, setActiveTab] = useState('users');
   const toast = useToast();
@@ -16,28 +19,51 @@ export default function AdminDashboard() {
     fetchCourses();
   }, []);
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (cursor = null) => {
     try {
-      const res = await api.get('/admin/users');
-      setUsers(res.data);
+      const params = { limit: 50 };
+      if (cursor) params.cursor = cursor;
+      const res = await api.get('/admin/users', { params });
+      setUsers(prev => cursor ? [...prev, ...res.data.users] : res.data.users);
+      setUsersCursor(res.data.next_cursor);
     } catch (err) {
       toast.error('Failed to fetch users');
     }
   };
 
-  const fetchRedFlags = async () => {
+  const fetchRedFlags = async (cursor = null) => {
     try {
-      const res = await api.get('/admin/red-flags');
-      setRedFlags(res.data);
+      const params = { limit: 50 };
+      if (cursor) params.cursor = cursor;
+      const res = await api.get('/admin/red-flags', { params });
+      setRedFlags(prev => cursor ? [...prev, ...res.data.red_flags] : res.data.red_flags);
+      setRedFlagsCursor(res.data.next_cursor);
     } catch (err) {
       toast.error('Failed to fetch red flags');
     }
   };
 
-  const fetchCourses = async () => {
+  const handleExport = async (kind) => {
     try {
-      const res = await api.get('/courses');
-      setCourses(res.data);
+      const res = await api.get(`/admin/export/${kind}`, { params: { format: 'csv' }, responseType: 'blob' });
+      const url = URL.createObjectURL(res.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `${kind}.csv`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      toast.error('Export failed');
+    }
+  };
+
+  const fetchCourses = async (cursor = null) => {
+    try {
+      const params = { view: 'card', limit: 50 };
+      if (cursor) params.cursor = cursor;
+      const res = await api.get('/courses', { params });
+      setCourses(prev => cursor ? [...prev, ...res.data.courses] : res.data.courses);
+      setCoursesCursor(res.data.next_cursor);
     } catch (err) {
       toast.error('Failed to fetch courses');
     }
@@ -119,7 +145,23 @@ export default function AdminDashboard() {
 
         {activeTab === 'users' && (
           <div className="bg-white rounded-lg shadow-lg p-6">
-            <h2 className="text-2xl font-bold mb-4">User Accounts</h2>
+            <div className="flex justify-between items-center mb-4">
+              <h2 className="text-2xl font-bold">User Accounts</h2>
+              <div className="flex gap-2">
+                <button
+                  onClick={() => handleExport('users')}
+                  className="px-4 py-2 border rounded-lg text-gray-700 hover:bg-gray-100"
+                >
+                  Export users
+                </button>
+                <button
+                  onClick={() => handleExport('enrollments')}
+                  className="px-4 py-2 border rounded-lg text-gray-700 hover:bg-gray-100"
+                >
+                  Export enrollments
+                </button>
+              </div>
+            </div>
             <div className="overflow-x-auto">
               <table className="w-full">
                 <thead>
@@ -160,13 +202,29 @@ export default function AdminDashboard() {
                   ))}
                 </tbody>
               </table>
+              {usersCursor && (
+                <button
+                  onClick={() => fetchUsers(usersCursor)}
+                  className="mt-4 px-4 py-2 border rounded text-gray-700 hover:bg-gray-100"
+                >
+                  Load more
+                </button>
+              )}
             </div>
           </div>
         )}
 
         {activeTab === 'redflags' && (
           <div className="bg-white rounded-lg shadow-lg p-6">
-            <h2 className="text-2xl font-bold mb-4">Red Flagged Users</h2>
+            <div className="flex justify-between items-center mb-4">
+              <h2 className="text-2xl font-bold">Red Flagged Users</h2>
+              <button
+                onClick={() => handleExport('red-flags')}
+                className="px-4 py-2 border rounded-lg text-gray-700 hover:bg-gray-100"
+              >
+                Export CSV
+              </button>
+            </div>
             <div className="overflow-x-auto">
               <table className="w-full">
                 <thead>
@@ -188,6 +246,14 @@ export default function AdminDashboard() {
                   ))}
                 </tbody>
               </table>
+              {redFlagsCursor && (
+                <button
+                  onClick={() => fetchRedFlags(redFlagsCursor)}
+                  className="mt-4 px-4 py-2 border rounded text-gray-700 hover:bg-gray-100"
+                >
+                  Load more
+                </button>
+              )}
             </div>
           </div>
         )}
@@ -306,6 +372,14 @@ export default function AdminDashboard() {
                     ))}
                   </tbody>
                 </table>
+                {coursesCursor && (
+                  <button
+                    onClick={() => fetchCourses(coursesCursor)}
+                    className="mt-4 px-4 py-2 border rounded text-gray-700 hover:bg-gray-100"
+                  >
+                    Load more
+                  </button>
+                )}
               </div>
             )}
           </div>
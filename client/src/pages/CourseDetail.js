@@ -15,20 +15,12 @@ export default function CourseDetail({ user }) {
   useEffect(() => {
     const fetchCourse = async () => {
       try {
-        const response = await api.get(`/courses/${id}`);
+        // signed in, the course comes back with our enrollment status in the same request
+        const response = await api.get(`/courses/${id}`, { params: user ? { include: 'enrollment' } : {} });
         const courseDetails = response.data;
         setCourse(courseDetails);
         console.log('Course loaded:', courseDetails.title);
-        
-        if (user) {
-          // check if user is enrolled
-          try {
-            const enrollRes = await api.get(`/enrollments/check/${id}`);
-            setEnrolled(enrollRes.data.enrolled);
-          } catch (err) {
-            console.error('Error checking enrollment:', err);
-          }
-        }
+        setEnrolled(Boolean(courseDetails.enrollment?.enrolled));
       } catch (error) {
         console.error('Error fetching course:', error);
       } finally {
@@ -90,7 +82,9 @@ export default function CourseDetail({ user }) {
                   {course.modules.map((module, idx) => (
                     <div key={module.id} className="border border-gray-200 rounded-lg p-4 hover:bg-gray-50">
                       <p className="font-semibold text-gray-900">Module {idx + 1}: {module.title}</p>
-                      <p className="text-gray-600 text-sm mt-1">{module.content.substring(0, 100)}...</p>
+                      <p className="text-gray-600 text-sm mt-1 capitalize">
+                        {module.module_type}{module.duration ? ` · ${module.duration} min` : ''}
+                      </p>
                     </div>
                   ))}
                 </div>
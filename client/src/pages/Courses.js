@@ -6,39 +6,61 @@ import { api } from '../services/api';
 // Course listing page
 export default function Courses({ user }) {
   const [courses, setCourses] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [enrolledIds, setEnrolledIds] = useState({});
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState('');
   const [level, setLevel] = useState('');
   // const [category, setCategory] = useState(''); // TODO: add category filter later
 
   useEffect(() => {
-    fetchCourses();
-  }, []);
+    // small debounce so typing doesn't fire a request per keystroke
+    const timer = setTimeout(() => fetchCourses(), 300);
+    return () => clearTimeout(timer);
+  }, [search, level]);
 
-  const fetchCourses = async () => {
+  // cursor is null for the first page, otherwise we append to what we have
+  const fetchCourses = async (cursor = null) => {
     try {
-      const response = await api.get('/courses');
-      console.log('Fetched courses:', response.data.length);
-      setCourses(Array.isArray(response.data) ? response.data : []);
+      const params = { view: 'card', limit: 24 };
+      if (search) params.search = search;
+      if (level) params.level = level;
+      if (cursor) params.cursor = cursor;
+      const response = await api.get('/courses', { params });
+      const page = Array.isArray(response.data.courses) ? response.data.courses : [];
+      setCourses(prev => cursor ? [...prev, ...page] : page);
+      setNextCursor(response.data.next_cursor);
+      fetchEnrollmentStatus(page);
     } catch (error) {
       console.error('Error fetching courses:', error);
-      setCourses([]);
+      if (!cursor) setCourses([]);
     } finally {
       setLoading(false);
     }
   };
 
+  // "enrolled" badges for a whole page in one request
+  const fetchEnrollmentStatus = async (page) => {
+    if (user?.role !== 'student' || page.length === 0) return;
+    try {
+      const res = await api.post('/enrollments/status', { course_ids: page.map(c => c.id) });
+      const enrolled = {};
+      Object.entries(res.data.statuses).forEach(([courseId, status]) => {
+        if (status.enrolled) enrolled[courseId] = status;
+      });
+      setEnrolledIds(prev => ({ ...prev, ...enrolled }));
+    } catch (error) {
+      console.error('Error fetching enrollment status:', error);
+    }
+  };
+
   // TODO: implement this later
   // const handleCategoryChange = (cat) => {
   //   setCategory(cat);
   // }
 
-  const filteredCourses = courses.filter(courseItem => {
-    const matchesSearch = courseItem.title.toLowerCase().includes(search.toLowerCase()) ||
-                         courseItem.description.toLowerCase().includes(search.toLowerCase());
-    const matchesLevel = !level || courseItem.level === level;
-    return matchesSearch && matchesLevel;
-  });
+  // search and level are filtered on the server now
+  const filteredCourses = courses;
 
   // loading spinner
   if (loading) return (
@@ -127,15 +149,29 @@ export default function Courses({ user }) {
                       </div>
 
                       <p className="text-gray-400 mb-4">
-                        {courseData.description}
+                        {courseData.summary}
                       </p>
 
                       <div className="flex items-center justify-between text-sm">
-                        <span className="text-blue-400">Start Course →</span>
+                        {enrolledIds[courseData.id] ? (
+                          <span className="text-green-400">
+                            Enrolled · {enrolledIds[courseData.id].progress_percentage}% complete →
+                          </span>
+                        ) : (
+                          <span className="text-blue-400">Start Course →</span>
+                        )}
                       </div>
                     </div>
                   </Link>
                 ))}
+                {nextCursor && (
+                  <button
+                    onClick={() => fetchCourses(nextCursor)}
+                    className="w-full py-3 bg-gray-800 border border-gray-700 text-gray-300 hover:border-blue-500"
+                  >
+                    Load more
+                  </button>
+                )}
               </div>
             )}
           </div>
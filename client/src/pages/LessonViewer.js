@@ -28,12 +28,14 @@ export default function LessonViewer({ user }) {
 
   const fetchCourse = async () => {
     try {
-      const response = await api.get(`/courses/${courseId}`);
-      const courseInfo = response.data;
-      setCourse(courseInfo);
+      // course gives us the outline, the lesson body is loaded on its own
+      const [response, moduleResponse] = await Promise.all([
+        api.get(`/courses/${courseId}`),
+        api.get(`/courses/${courseId}/modules/${moduleId}`)
+      ]);
+      setCourse(response.data);
       
-      // find current module
-      const currentMod = courseInfo.modules.find(m => m.id === parseInt(moduleId));
+      const currentMod = moduleResponse.data;
       setCurrentModule(currentMod);
       setCode(currentMod?.challenge_code || '');
 
@@ -44,12 +46,35 @@ export default function LessonViewer({ user }) {
       // parse completed module IDs
       const completedIds = enrollment?.completed_module_ids || [];
       setCompletedModules(Array.isArray(completedIds) ? completedIds : []);
+
+      // heartbeat so "last accessed" stays current, fire and forget
+      if (enrollment) api.post(`/courses/${courseId}/progress`, {}).catch(() => {});
     } catch (err) {
       console.error('Error:', err);
     }
   };
 
+  const submitForGrading = async () => {
+    // graded (and recorded) on the server, it marks the module complete when everything passes
+    try {
+      const res = await api.post(`/modules/${moduleId}/submissions`, { code });
+      setTestResults(res.data.results);
+      setOutput(res.data.error || res.data.output || '');
+      if (res.data.status === 'passed') {
+        setShowSuccess(true);
+        setTimeout(() => setShowSuccess(false), 3000);
+        setCompletedModules(res.data.progress.completed_module_ids);
+      }
+    } catch (err) {
+      setOutput(err.response?.data?.error || 'Error running tests: ' + err.message);
+    }
+  };
+
   const runTests = () => {
+    if (currentModule?.challenge_runner) {
+      submitForGrading();
+      return;
+    }
     if (!currentModule?.challenge_tests) {
       setOutput('No tests available');
       return;
@@ -83,21 +108,13 @@ export default function LessonViewer({ user }) {
 
   const markModuleComplete = async () => {
     try {
-      const enrollRes = await api.get(`/enrollments/my-enrollments`);
-      const enrollment = enrollRes.data.find(e => e.course_id === parseInt(courseId));
-      
-      if (enrollment && !completedModules.includes(moduleId)) {
-        const newCompleted = [...completedModules, moduleId];
-        // calcualte new progress percentage (typo intentional)
-        const progressPercent = Math.round((newCompleted.length / course.modules.length) * 100);
-        console.log('Updating progress to:', progressPercent);
-        
-        await api.put(`/enrollments/${enrollment.id}`, {
-          completed_modules: newCompleted.length,
-          completed_module_ids: newCompleted,
-          progress_percentage: progressPercent
+      if (!completedModules.includes(moduleId)) {
+        // one call: the server finds our enrollment and works out the progress
+        const res = await api.post(`/courses/${courseId}/progress`, {
+          module_id: parseInt(moduleId)
         });
-        setCompletedModules(newCompleted);
+        console.log('Progress is now:', res.data.progress_percentage);
+        setCompletedModules(res.data.completed_module_ids);
       }
     } catch (error) {
       console.error('Error marking complete:', error);
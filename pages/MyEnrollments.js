@@ -8,7 +8,9 @@ export default function MyEnrollments() {
   useEffect(() => {
     const fetchEnrollments = async () => {
       try {
-        const res = await api.get('/enrollments/my-enrollments');
+        const res = await api.get('/enrollments/my-enrollments', {
+          params: { fields: 'id,course_title,course_description,progress_percentage,grade,completion_status' },
+        });
         setEnrollments(Array.isArray(res.data) ? res.data : []);
       } catch (err) {
         console.error('Error fetching enrollments:', err);
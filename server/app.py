@@ -1,30 +1,121 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, abort, stream_with_context
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from flask_migrate import Migrate
+from flask_jwt_extended import JWTManager, jwt_required, current_user, get_current_user, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from config import Config
-from models import db, bcrypt, User, Course, Module, Enrollment, InstructorApplication, RedFlag
-from datetime import datetime
+from models import db, hasher, User, Course, Module, Enrollment, InstructorApplication, RedFlag, UserStats, DailyStats, Submission
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+import course_search
+import course_counters
+import dashboard_stats
+import course_import
+import engine_profiles
+import schema
+import json_provider
+import serializers
+from response_cache import cache
+from compression import compression
+from auth import create_token, load_identity, forget_identity
+from password_hashing import HashingBusy
+from grading import grader, GradingBusy, GraderUnavailable, RUNNERS
+from google_verifier import google_verifier, GoogleUnavailable
+from progress_buffer import heartbeats
+from exports import EXPORTS, FORMATS, stream_export
+from request_metrics import request_metrics
+from rate_limit import rate_limiter
+import click
 import re
 import json
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+import base64
+import io
+import shutil
+import tempfile
 
-# TODO: add rate limiting later
 # TODO: maybe add email verification?
 
 app = Flask(__name__)
 app.config.from_object(Config)
+json_provider.init_app(app)
 
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 db.init_app(app)
-bcrypt.init_app(app)
+engine_profiles.init_app(app)
+hasher.init_app(app)
+grader.init_app(app)
 jwt = JWTManager(app)
-migrate = Migrate(app, db)
+# Flask-Migrate pulls in Alembic, which is only needed by the `flask db`
+# commands, so it's set up when the app is loaded by the flask CLI
+if click.get_current_context(silent=True) is not None:
+    schema.init_migrate(app)
+schema.init_app(app)
+course_search.init_app(app)
+course_counters.init_app(app)
+dashboard_stats.init_app(app)
+course_import.init_app(app)
+cache.init_app(app)
+google_verifier.init_app(app)
+heartbeats.init_app(app)
+request_metrics.init_app(app)
+rate_limiter.init_app(app)  # after metrics, so rejected requests are counted too
+compression.init_app(app)
 
 def is_valid_email(email):
     return re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email)
 
+# catalog cursors are opaque to the client: base64 of the "|"-joined position
+# of the last row, (created_at, id) for the catalog or the offset for search
+def encode_cursor(*parts):
+    raw = '|'.join(str(p) for p in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+# serve a cached JSON body (or build and cache it), with ETag/Last-Modified so
+# clients can revalidate and get a 304. build() may return an error response
+# tuple instead of data, which is passed through and never cached.
+def cached_json(key, build, version=None, last_modified=None, max_age=None):
+    entry = cached_entry(key, build, version, last_modified)
+    if isinstance(entry, tuple):
+        return entry
+    return cached_response(entry, max_age)
+
+def cached_entry(key, build, version=None, last_modified=None):
+    entry = cache.get(key, version)
+    if entry is None:
+        result = build()
+        if isinstance(result, tuple):
+            return result
+        body = app.json.dumps_bytes(result)
+        entry = cache.set(key, body, version, last_modified, compression.precompress(body))
+    return entry
+
+def cached_response(entry, max_age=None):
+    response = app.response_class(entry.body, mimetype='application/json')
+    response.precompressed = entry.variants  # picked up by compression.py
+    response.set_etag(entry.etag)
+    response.last_modified = entry.last_modified
+    if max_age is None:
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+# the signed-in user on a public endpoint: None without a token, and with one
+# that is expired, invalid or for a deleted user, rather than a 401
+def optional_user():
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return None
+    return get_current_user()
+
 @jwt.unauthorized_loader
 def unauthorized_callback(callback):
     return jsonify({'error': 'Missing or invalid token'}), 401
@@ -33,6 +124,32 @@ def unauthorized_callback(callback):
 def invalid_token_callback(callback):
     return jsonify({'error': 'Invalid token'}), 401
 
+@app.errorhandler(serializers.InvalidFields)
+def invalid_fields(e):
+    return jsonify({'error': str(e)}), 400
+
+@app.errorhandler(HashingBusy)
+@app.errorhandler(GradingBusy)
+def hashing_busy(e):
+    # too many logins queued for bcrypt (or submissions for the grader), fail fast and let the client retry
+    response = jsonify({'error': 'Server busy, please retry'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(GraderUnavailable)
+def grader_unavailable(e):
+    app.logger.error('grading unavailable: %s', e)
+    return jsonify({'error': 'Grading is unavailable'}), 503
+
+# current_user is resolved once per request from the identity cache, see auth.py
+@jwt.user_lookup_loader
+def user_lookup_callback(_jwt_header, jwt_data):
+    return load_identity(int(jwt_data['sub']))
+
+@jwt.user_lookup_error_loader
+def user_lookup_error_callback(_jwt_header, jwt_data):
+    return jsonify({'error': 'User not found'}), 401
+
 # AUTH
 @app.route('/api/auth/register', methods=['POST'])
 def register():
@@ -71,7 +188,7 @@ def register():
     db.session.add(user)
     db.session.commit()
     
-    token = create_access_token(identity=str(user.id))
+    token = create_token(user)
     return jsonify({'token': token, 'user': user.to_dict()}), 201
 
 @app.route('/api/auth/login', methods=['POST'])
@@ -81,16 +198,27 @@ def login():
     user = User.query.filter_by(email=data.get('email')).first()
     # print(f"Login attempt for: {data.get('email')}")
     
+    if user:
+        # hand the pooled connection back while bcrypt runs
+        db.session.expunge(user)
+        db.session.rollback()
+    
     if not user or not user.check_password(data.get('password', '')):
         return jsonify({'error': 'Invalid credentials'}), 401
     
-    token = create_access_token(identity=str(user.id))
+    # upgrade hashes made with an older cost factor while we have the password
+    if user.password_needs_rehash():
+        user = db.session.merge(user)
+        user.set_password(data['password'])
+        db.session.commit()
+    
+    token = create_token(user)
     return jsonify({'token': token, 'user': user.to_dict()}), 200
 
 @app.route('/api/auth/me', methods=['GET'])
 @jwt_required()
 def get_me():
-    user = User.query.get(int(get_jwt_identity()))
+    user = db.session.get(User, current_user.id)
     return jsonify(user.to_dict()), 200
 
 @app.route('/api/auth/google', methods=['POST'])
@@ -99,7 +227,7 @@ def google_login():
     token = data.get('token')
     
     try:
-        idinfo = id_token.verify_oauth2_token(token, google_requests.Request(), Config.GOOGLE_CLIENT_ID)
+        idinfo = google_verifier.verify(token)
         
         email = idinfo['email']
         user = User.query.filter_by(email=email).first()
@@ -117,18 +245,42 @@ def google_login():
             db.session.add(user)
             db.session.commit()
         
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_token(user)
         return jsonify({'token': access_token, 'user': user.to_dict()}), 200
         
     except ValueError:
         return jsonify({'error': 'Invalid token'}), 401
+    except GoogleUnavailable:
+        return jsonify({'error': 'Google sign-in is unavailable, please retry'}), 503
 
 # COURSES
 @app.route('/api/courses', methods=['GET'])
 def get_courses():
+    return cached_json(cache.catalog_key(request.args), build_catalog, version=catalog_version())
+
+# every course or module write bumps the catalog_version row (see course_counters.py), so a page cached by
+# any worker is checked against the database, like the course detail; one primary-key lookup
+def catalog_version():
+    return format_catalog_version(db.session.execute(course_counters.catalog_version_query()).scalar())
+
+def format_catalog_version(generation):
+    return str(generation or 0)
+
+def build_catalog():
     category = request.args.get('category')
     level = request.args.get('level')
     search = request.args.get('search')
+    cursor = request.args.get('cursor')
+    card = request.args.get('view') == 'card'
+    sort = request.args.get('sort', 'created')  # created (oldest first) or popular
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    
+    if sort not in ('created', 'popular'):
+        return jsonify({'error': 'Invalid sort'}), 400
+    if card and ('fields' in request.args or 'include' in request.args):
+        return jsonify({'error': 'fields and include are not supported with view=card'}), 400
+    # ?fields= / ?include= for the full view, see serializers.py
+    fields, includes = (None, None) if card else serializers.courses.from_request()
     
     query = Course.query.filter_by(is_published=True)
     # filter courses based on params
@@ -137,22 +289,141 @@ def get_courses():
         query = query.filter_by(category=category)
     if level:
         query = query.filter_by(level=level)
-    if search:
-        # search in title
+    dialect = db.engine.dialect.name
+    if search and not course_search.is_supported(dialect):
+        # no full-text index on this database, fall back to a title scan
         query = query.filter(Course.title.ilike(f'%{search}%'))
+        search = None
+    
+    try:
+        if search:
+            # ranked search results page by offset, the plain catalog by (created_at, id)
+            # or (student_count, id) depending on the sort
+            offset = int(decode_cursor(cursor)[0]) if cursor else 0
+        elif cursor and sort == 'popular':
+            last_count, last_id = decode_cursor(cursor)
+            query = query.filter(db.or_(
+                Course.student_count < int(last_count),
+                db.and_(Course.student_count == int(last_count), Course.id < int(last_id))
+            ))
+        elif cursor:
+            last_created, last_id = decode_cursor(cursor)
+            query = query.filter(db.or_(
+                Course.created_at > datetime.fromisoformat(last_created),
+                db.and_(Course.created_at == datetime.fromisoformat(last_created), Course.id > int(last_id))
+            ))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
-    courseList = query.all()
-    return jsonify([c.to_dict() for c in courseList]), 200
+    snippets = None
+    if search:
+        # the index pages through the matching ids itself, the courses are loaded for that page only
+        matches = course_search.match_courses(search, dialect, query.with_entities(Course.id), limit + 1, offset)
+        if matches is None:
+            return jsonify({'courses': [], 'next_cursor': None}), 200
+        query = Course.query.join(matches, matches.c.course_id == Course.id).order_by(matches.c.rank, Course.id)
+        query = Course.catalog_query(query, card=True) if card else query.options(*serializers.courses.options(fields, includes))
+        rows = query.all()
+        next_cursor = encode_cursor(offset + limit) if len(rows) > limit else None
+        rows = rows[:limit]
+        found = course_search.snippets(search, dialect, [row[0].id if card else row.id for row in rows])
+        snippets = [found.get(row[0].id if card else row.id) for row in rows]
+    else:
+        if sort == 'popular':
+            query = query.order_by(Course.student_count.desc(), Course.id.desc())
+        else:
+            query = query.order_by(Course.created_at, Course.id)
+        query = Course.catalog_query(query, card=True) if card else query.options(*serializers.courses.options(fields, includes))
+        # fetch one extra row to know if there is another page
+        rows = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1][0] if card else rows[limit - 1]
+            if sort == 'popular':
+                next_cursor = encode_cursor(last.student_count, last.id)
+            else:
+                next_cursor = encode_cursor(last.created_at.isoformat(), last.id)
+        rows = rows[:limit]
+    
+    # rows are Course objects, or (Course, summary) for cards
+    if card:
+        courseList = [c.to_card_dict(summary) for c, summary in rows]
+    else:
+        courseList = serializers.courses.dump_all(rows, fields, includes)
+    if snippets is not None:
+        for item, snippet in zip(courseList, snippets):
+            item['snippet'] = snippet
+    return {'courses': courseList, 'next_cursor': next_cursor}
 
 @app.route('/api/courses/<int:id>', methods=['GET'])
 def get_course(id):
-    course = Course.query.get_or_404(id)
-    return jsonify(course.to_dict(include_modules=True)), 200
+    include = course_detail_include()
+    # updated_at is the course version; a cheap PK lookup tells us if the cache is still good
+    row = db.session.query(Course.updated_at).filter_by(id=id).first()
+    if row is None:
+        abort(404)
+    updated_at = row[0]
+    entry = cached_entry(
+        cache.course_key(id),
+        lambda: serializers.courses.dump(db.session.scalars(course_detail_query(id)).one(), *COURSE_DETAIL),
+        version=updated_at.isoformat() if updated_at else None,
+        last_modified=updated_at
+    )
+    if not include:
+        return cached_response(entry)
+    
+    # ?include=enrollment adds the caller's enrollment status, saving the client a second request;
+    # signed out it's the same public response as without it
+    user = optional_user()
+    if user is None:
+        response = cached_response(entry)
+    else:
+        response = course_with_enrollment(entry, enrollment_statuses(user.id, [id])[id])
+    response.vary.add('Authorization')
+    return response
+
+# the course detail body: the catalog fields plus the module outline
+COURSE_DETAIL = serializers.courses.select(include='modules')
+
+def course_detail_query(id):
+    return db.select(Course).filter_by(id=id).options(*serializers.courses.options(*COURSE_DETAIL))
+
+def course_detail_include():
+    include = [name for name in request.args.get('include', '').split(',') if name]
+    if any(name != 'enrollment' for name in include):
+        raise serializers.InvalidFields('Unknown include(s), only enrollment is supported')
+    return include
+
+def course_with_enrollment(entry, status):
+    # the cached body plus the caller's enrollment, so it's private to them
+    body = app.json.loads(entry.body)
+    body['enrollment'] = status
+    response = jsonify(body)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/courses/<int:course_id>/modules/<int:module_id>', methods=['GET'])
+def get_module(course_id, module_id):
+    # lesson bodies are versioned by their course's updated_at, like the course detail
+    row = db.session.query(Course.updated_at).join(Module, Module.course_id == Course.id).filter(
+        Course.id == course_id, Module.id == module_id
+    ).first()
+    if row is None:
+        abort(404)
+    updated_at = row[0]
+    return cached_json(
+        cache.module_key(module_id),
+        lambda: db.session.get(Module, module_id).to_dict(),
+        version=updated_at.isoformat() if updated_at else None,
+        last_modified=updated_at,
+        max_age=app.config['MODULE_CACHE_MAX_AGE']
+    )
 
 @app.route('/api/courses', methods=['POST'])
 @jwt_required()
 def create_course():
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     
     if user.role != 'instructor':
         return jsonify({'error': 'Instructor access required'}), 403
@@ -172,13 +443,14 @@ def create_course():
     
     db.session.add(course)
     db.session.commit()
+    cache.invalidate_catalog()
     
     return jsonify(course.to_dict()), 201
 
 @app.route('/api/courses/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_course(id):
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     course = Course.query.get_or_404(id)
     
     if course.instructor_id != user.id:
@@ -191,12 +463,13 @@ def update_course(id):
             setattr(course, key, data[key])
     
     db.session.commit()
+    cache.invalidate_course(course.id)
     return jsonify(course.to_dict()), 200
 
 @app.route('/api/courses/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_course(id):
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     course = Course.query.get_or_404(id)
     
     if course.instructor_id != user.id:
@@ -204,6 +477,7 @@ def delete_course(id):
     
     db.session.delete(course)
     db.session.commit()
+    cache.invalidate_course(id)
     
     return jsonify({'message': 'Course deleted'}), 200
 
@@ -214,21 +488,24 @@ def delete_course(id):
 @app.route('/api/courses/instructor/my-courses', methods=['GET'])
 @jwt_required()
 def get_instructor_courses():
-    user = User.query.get(int(get_jwt_identity()))
-    courses = Course.query.filter_by(instructor_id=user.id).all()
-    return jsonify([c.to_dict() for c in courses]), 200
+    user = current_user
+    fields, includes = serializers.courses.from_request()
+    courses = Course.query.filter_by(instructor_id=user.id).options(*serializers.courses.options(fields, includes))
+    return jsonify(serializers.courses.dump_all(courses, fields, includes)), 200
 
 # MODULES
 @app.route('/api/courses/<int:course_id>/modules', methods=['POST'])
 @jwt_required()
 def create_module(course_id):
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     course = Course.query.get_or_404(course_id)
     
     if course.instructor_id != user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
     data = request.get_json()
+    if data.get('challenge_runner') not in (None,) + RUNNERS:
+        return jsonify({'error': f'challenge_runner must be one of {", ".join(RUNNERS)}'}), 400
     
     module = Module(
         title=data['title'],
@@ -236,64 +513,131 @@ def create_module(course_id):
         video_url=data.get('video_url'),
         duration=int(data.get('duration', 0)),
         order=data['order'],
-        course_id=course_id
+        course_id=course_id,
+        module_type=data.get('module_type', 'lesson'),
+        challenge_code=data.get('challenge_code'),
+        challenge_tests=data.get('challenge_tests'),
+        challenge_solution=data.get('challenge_solution'),
+        challenge_runner=data.get('challenge_runner')
     )
     
+    # bump the course version so cached detail pages pick up the new module
+    course.updated_at = datetime.utcnow()
     db.session.add(module)
     db.session.commit()
+    cache.invalidate_course(course_id)
     
-    return jsonify(module.to_dict()), 201
+    return jsonify(module.to_dict(include_solution=True)), 201
 
 # ENROLLMENTS
 @app.route('/api/enrollments', methods=['POST'])
 @jwt_required()
 def enroll():
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     data = request.get_json()
     
     if user.role != 'student':
         return jsonify({'error': 'Access denied'}), 403
     
-    if Enrollment.query.filter_by(user_id=user.id, course_id=data['course_id']).first():
+    course = db.session.get(Course, data['course_id'])
+    if course is None or not course.is_published:
+        return jsonify({'error': 'Course not found'}), 404
+    
+    if Enrollment.query.filter_by(user_id=user.id, course_id=course.id).first():
         return jsonify({'error': 'Already enrolled'}), 400
     
-    enrollment = Enrollment(user_id=user.id, course_id=data['course_id'])
+    enrollment = Enrollment(user_id=user.id, course_id=course.id)
     db.session.add(enrollment)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        # a concurrent request enrolled us first and the unique index caught it; anything else is a real error
+        if not is_duplicate_enrollment(e):
+            raise
+        return jsonify({'error': 'Already enrolled'}), 400
     
-    return jsonify(enrollment.to_dict()), 201
+    return jsonify(serializers.enrollments.dump(enrollment, *serializers.enrollments.select())), 201
+
+def is_duplicate_enrollment(error):
+    # Postgres names the violated constraint, SQLite only lists its columns
+    constraint = getattr(getattr(error.orig, 'diag', None), 'constraint_name', None)
+    if constraint is not None:
+        return constraint == 'ix_enrollments_user_course'
+    return 'UNIQUE constraint failed: enrollments.user_id, enrollments.course_id' in str(error.orig)
 
 @app.route('/api/enrollments', methods=['GET'])
 @jwt_required()
 def get_enrollments():
-    user = User.query.get(int(get_jwt_identity()))
-    enrollments = Enrollment.query.filter_by(user_id=user.id).all()
-    return jsonify([e.to_dict() for e in enrollments]), 200
+    return jsonify(my_enrollments()), 200
+
+def my_enrollments():
+    fields, includes = serializers.enrollments.from_request()
+    enrollments = db.session.scalars(my_enrollments_query(current_user.id, fields, includes))
+    return serializers.enrollments.dump_all(enrollments, fields, includes)
+
+def my_enrollments_query(user_id, fields, includes):
+    return db.select(Enrollment).filter_by(user_id=user_id).options(*serializers.enrollments.options(fields, includes))
 
 @app.route('/api/enrollments/check/<int:course_id>', methods=['GET'])
 @jwt_required()
 def check_enrollment(course_id):
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     enrollment = Enrollment.query.filter_by(user_id=user.id, course_id=course_id).first()
     return jsonify({'enrolled': enrollment is not None}), 200
 
+# the status fields of an enrollment, for course pages and "enrolled" badges
+ENROLLMENT_STATUS_FIELDS = ('id', 'progress_percentage', 'completed_modules', 'completion_status', 'last_accessed')
+
+def enrollment_statuses(user_id, course_ids):
+    # course id -> status, one IN query on (user_id, course_id)
+    return dump_enrollment_statuses(course_ids, db.session.scalars(enrollment_status_query(user_id, course_ids)))
+
+def enrollment_status_query(user_id, course_ids):
+    return db.select(Enrollment).filter(
+        Enrollment.user_id == user_id, Enrollment.course_id.in_(course_ids)
+    ).options(*serializers.enrollments.options(ENROLLMENT_STATUS_FIELDS + ('course_id',)))
+
+def dump_enrollment_statuses(course_ids, enrollments):
+    statuses = {course_id: {'enrolled': False} for course_id in course_ids}
+    for e in enrollments:
+        status = serializers.enrollments.dump(e, ENROLLMENT_STATUS_FIELDS)
+        status['enrollment_id'] = status.pop('id')
+        statuses[e.course_id] = dict(status, enrolled=True)
+    return statuses
+
+@app.route('/api/enrollments/status', methods=['POST'])
+@jwt_required()
+def get_enrollment_statuses():
+    course_ids = requested_course_ids()
+    if isinstance(course_ids, tuple):
+        return course_ids
+    statuses = enrollment_statuses(current_user.id, course_ids)
+    return jsonify({'statuses': {str(course_id): status for course_id, status in statuses.items()}}), 200
+
+def requested_course_ids():
+    # the body's course_ids, deduplicated, or an error response
+    data = request.get_json(silent=True) or {}
+    course_ids = data.get('course_ids')
+    limit = app.config['ENROLLMENT_STATUS_MAX_IDS']
+    if not isinstance(course_ids, list) or not course_ids:
+        return jsonify({'error': 'course_ids must be a non-empty list'}), 400
+    if len(course_ids) > limit:
+        return jsonify({'error': f'At most {limit} course ids per request'}), 400
+    try:
+        return list(dict.fromkeys(int(c) for c in course_ids))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid course id'}), 400
+
 @app.route('/api/enrollments/my-enrollments', methods=['GET'])
 @jwt_required()
 def get_my_enrollments():
-    user = User.query.get(int(get_jwt_identity()))
-    enrollments = Enrollment.query.filter_by(user_id=user.id).all()
-    result = []
-    for e in enrollments:
-        data = e.to_dict()
-        data['course_title'] = e.course.title
-        data['course_description'] = e.course.description
-        result.append(data)
-    return jsonify(result), 200
+    # same list as GET /api/enrollments
+    return jsonify(my_enrollments()), 200
 
 @app.route('/api/enrollments/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_enrollment(id):
-    current_user = User.query.get(int(get_jwt_identity()))
     enrollment = Enrollment.query.get_or_404(id)
     
     if enrollment.user_id != current_user.id:
@@ -301,34 +645,140 @@ def update_enrollment(id):
     
     requestData = request.get_json()
     
-    # update progress tracking
-    if 'progress_percentage' in requestData:
-        enrollment.progress_percentage = requestData['progress_percentage']
-        if requestData['progress_percentage'] >= 100:  # changed from == to >= just in case
-            enrollment.completion_status = 'completed'
-            # print('Course completed!')  # debug
+    # progress is derived from module_completions on the server, the client
+    # only says which module(s) it finished
+    module_ids = []
+    if requestData.get('module_id') is not None:
+        module_ids.append(requestData['module_id'])
+    if isinstance(requestData.get('completed_module_ids'), list):
+        module_ids.extend(requestData['completed_module_ids'])
+    try:
+        module_ids = {int(m) for m in module_ids}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid module id'}), 400
     
-    if 'completed_modules' in requestData:
-        enrollment.completed_modules = requestData['completed_modules']
-        # store module IDs as comma-separated string
-        if isinstance(requestData.get('completed_module_ids'), list):
-            enrollment.completed_module_ids = ','.join(map(str, requestData['completed_module_ids']))
+    if module_ids:
+        valid_ids = [m for (m,) in db.session.query(Module.id).filter(
+            Module.course_id == enrollment.course_id, Module.id.in_(module_ids)
+        )]
+        if valid_ids:
+            enrollment.mark_modules_complete(valid_ids)
     
     enrollment.last_accessed = datetime.utcnow()
     
     db.session.commit()
-    return jsonify(enrollment.to_dict()), 200
+    return jsonify(serializers.enrollments.dump(enrollment, *serializers.enrollments.select())), 200
+
+@app.route('/api/courses/<int:course_id>/progress', methods=['POST'])
+@jwt_required()
+def record_progress(course_id):
+    data = request.get_json(silent=True) or {}
+    module_id = data.get('module_id')
+    
+    # no module: just a "still here" heartbeat, buffered and written in batches
+    if module_id is None:
+        heartbeats.touch(current_user.id, course_id)
+        return jsonify({'status': 'queued'}), 202
+    
+    try:
+        module_id = int(module_id)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid module id'}), 400
+    
+    enrollment = Enrollment.query.filter_by(user_id=current_user.id, course_id=course_id).first()
+    if not enrollment:
+        return jsonify({'error': 'Not enrolled'}), 404
+    if not db.session.query(Module.id).filter_by(id=module_id, course_id=course_id).first():
+        return jsonify({'error': 'Module not in this course'}), 400
+    
+    # safe to repeat: completing a module twice is a no-op
+    enrollment.mark_modules_complete([module_id])
+    db.session.commit()
+    return jsonify(enrollment.to_progress_dict()), 200
+
+# CHALLENGE SUBMISSIONS
+@app.route('/api/modules/<int:module_id>/submissions', methods=['POST'])
+@jwt_required()
+def submit_challenge(module_id):
+    module = db.session.get(Module, module_id)
+    if module is None:
+        abort(404)
+    if module.module_type != 'challenge' or not module.challenge_runner:
+        return jsonify({'error': 'This challenge is checked in the browser'}), 400
+    
+    data = request.get_json(silent=True) or {}
+    code = data.get('code')
+    if not isinstance(code, str):
+        return jsonify({'error': 'code is required'}), 400
+    if len(code) > app.config['GRADER_MAX_CODE_LENGTH']:
+        return jsonify({'error': 'Code is too long'}), 400
+    
+    enrollment_id = db.session.query(Enrollment.id).filter_by(user_id=current_user.id, course_id=module.course_id).scalar()
+    if enrollment_id is None:
+        return jsonify({'error': 'Not enrolled'}), 404
+    try:
+        tests = json.loads(module.challenge_tests or '[]')
+    except ValueError:
+        tests = []
+    runner = module.challenge_runner
+    
+    # don't sit on a pooled connection while the sandbox runs
+    db.session.close()
+    result = grader.grade(runner, code, tests)
+    
+    results = result.get('results') or []
+    submission = Submission(
+        enrollment_id=enrollment_id,
+        module_id=module_id,
+        code=code,
+        grading_key=result['key'],
+        status=result['status'],
+        passed_tests=sum(1 for r in results if r.get('passed')),
+        total_tests=len(results),
+        results=json.dumps(results),
+        output=result.get('output') or None,
+        error=result.get('error'),
+        duration_ms=result.get('duration_ms')
+    )
+    db.session.add(submission)
+    enrollment = db.session.get(Enrollment, enrollment_id)
+    if submission.status == 'passed':
+        enrollment.mark_modules_complete([module_id])
+    db.session.commit()
+    
+    body = submission.to_dict()
+    body['cached'] = result['cached']
+    if submission.status == 'passed':
+        body['progress'] = enrollment.to_progress_dict()
+    return jsonify(body), 201
+
+@app.route('/api/modules/<int:module_id>/submissions', methods=['GET'])
+@jwt_required()
+def get_submissions(module_id):
+    course_id = db.session.query(Module.course_id).filter_by(id=module_id).scalar()
+    if course_id is None:
+        abort(404)
+    enrollment_id = db.session.query(Enrollment.id).filter_by(user_id=current_user.id, course_id=course_id).scalar()
+    if enrollment_id is None:
+        return jsonify({'error': 'Not enrolled'}), 404
+    
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    fields, includes = serializers.submissions.from_request()
+    submissions = Submission.query.filter_by(enrollment_id=enrollment_id, module_id=module_id).order_by(
+        Submission.created_at.desc(), Submission.id.desc()
+    ).options(*serializers.submissions.options(fields)).limit(limit)
+    return jsonify({'submissions': serializers.submissions.dump_all(submissions, fields)}), 200
 
 # INSTRUCTOR APPLICATIONS
 @app.route('/api/instructor-applications', methods=['POST'])
 @jwt_required()
 def apply_instructor():
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     
     if user.role != 'student':
         return jsonify({'error': 'Only students can apply'}), 403
     
-    if user.instructor_application:
+    if InstructorApplication.query.filter_by(user_id=user.id).first():
         return jsonify({'error': 'Application already exists'}), 400
     
     data = request.get_json()
@@ -347,18 +797,19 @@ def apply_instructor():
 @app.route('/api/instructor-applications', methods=['GET'])
 @jwt_required()
 def get_applications():
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     
     if user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
     
-    apps = InstructorApplication.query.all()
-    return jsonify([a.to_dict() for a in apps]), 200
+    fields, includes = serializers.applications.from_request()
+    apps = InstructorApplication.query.options(*serializers.applications.options(fields, includes))
+    return jsonify(serializers.applications.dump_all(apps, fields, includes)), 200
 
 @app.route('/api/instructor-applications/<int:id>', methods=['PUT'])
 @jwt_required()
 def review_application(id):
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     
     if user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -375,42 +826,93 @@ def review_application(id):
         applicant.role = 'instructor'
     
     db.session.commit()
+    forget_identity(app_obj.user_id)
     return jsonify(app_obj.to_dict()), 200
 
 # STATS
 @app.route('/api/stats', methods=['GET'])
 @jwt_required()
 def get_stats():
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     
-    if user.role == 'instructor':
-        courses = Course.query.filter_by(instructor_id=user.id).count()
-        students = db.session.query(Enrollment).join(Course).filter(Course.instructor_id == user.id).count()
-        return jsonify({'courses': courses, 'students': students}), 200
+    if user.role not in ('instructor', 'student'):
+        return jsonify({}), 200
     
-    elif user.role == 'student':
-        enrollments = Enrollment.query.filter_by(user_id=user.id).count()
-        completed = Enrollment.query.filter_by(user_id=user.id, completion_status='completed').count()
-        return jsonify({'enrollments': enrollments, 'completed': completed}), 200
+    # one primary-key lookup; the row is kept current by dashboard_stats.py
+    stats = db.session.get(UserStats, (user.id, user.role)) or UserStats(
+        courses=0, enrollments=0, completions=0, progress_sum=0
+    )
     
-    return jsonify({}), 200
+    if user.role == 'instructor':
+        return jsonify({
+            'courses': stats.courses,
+            'students': stats.enrollments,
+            'completions': stats.completions,
+            'average_progress': stats.average_progress()
+        }), 200
+    
+    return jsonify({
+        'enrollments': stats.enrollments,
+        'completed': stats.completions,
+        'average_progress': stats.average_progress()
+    }), 200
+
+@app.route('/api/stats/daily', methods=['GET'])
+@jwt_required()
+def get_daily_stats():
+    user = current_user
+    days = min(max(request.args.get('days', 30, type=int), 1), 365)
+    
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    rows = DailyStats.query.filter(
+        DailyStats.user_id == user.id,
+        DailyStats.role == user.role,
+        DailyStats.day >= start
+    ).all()
+    by_day = {row.day: row for row in rows}
+    
+    # zero-filled so the client can chart it directly
+    buckets = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = by_day.get(day)
+        buckets.append(row.to_dict() if row else {'day': day.isoformat(), 'enrollments': 0, 'completions': 0})
+    return jsonify({'days': buckets}), 200
 
 # ADMIN ENDPOINTS
+# admin listings are keyset-paginated on id, oldest first
+def admin_page(query, id_column, name, serializer):
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = query.filter(id_column > int(decode_cursor(cursor)[0]))
+        except ValueError:
+            raise ValueError('Invalid cursor')
+    
+    fields, includes = serializer.from_request()
+    rows = query.options(*serializer.options(fields, includes)).order_by(id_column).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    return {name: serializer.dump_all(rows[:limit], fields, includes), 'next_cursor': next_cursor}
+
 @app.route('/api/admin/users', methods=['GET'])
 @jwt_required()
 def get_all_users():
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     
     if user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
     
-    users = User.query.all()
-    return jsonify([u.to_dict() for u in users]), 200
+    try:
+        return jsonify(admin_page(User.query, User.id, 'users', serializers.users)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
 @jwt_required()
 def delete_user(user_id):
-    admin = User.query.get(int(get_jwt_identity()))
+    admin = current_user
     
     if admin.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -425,27 +927,53 @@ def delete_user(user_id):
         username=user.username,
         reason='Account deleted by admin'
     )
+    course_ids = [c.id for c in user.courses]
     db.session.add(red_flag)
     db.session.delete(user)
     db.session.commit()
+    forget_identity(user_id)
+    # an instructor's courses go with them
+    for course_id in course_ids:
+        cache.invalidate_course(course_id)
     
     return jsonify({'message': 'User deleted and red flagged'}), 200
 
 @app.route('/api/admin/red-flags', methods=['GET'])
 @jwt_required()
 def get_red_flags():
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     
     if user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
     
-    flags = RedFlag.query.all()
-    return jsonify([f.to_dict() for f in flags]), 200
+    try:
+        return jsonify(admin_page(RedFlag.query, RedFlag.id, 'red_flags', serializers.red_flags)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/admin/export/<kind>', methods=['GET'])
+@jwt_required()
+def admin_export(kind):
+    user = current_user
+    
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    fmt = request.args.get('format', 'ndjson')
+    if kind not in EXPORTS:
+        return jsonify({'error': f'Unknown export: {kind}'}), 404
+    if fmt not in FORMATS:
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    
+    chunks = stream_export(kind, fmt, app.config['EXPORT_CHUNK_SIZE'])
+    response = app.response_class(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{fmt}'
+    return response
 
 @app.route('/api/admin/courses', methods=['POST'])
 @jwt_required()
 def admin_create_course():
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     
     if user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -466,13 +994,45 @@ def admin_create_course():
     
     db.session.add(course)
     db.session.commit()
+    cache.invalidate_catalog()
     
     return jsonify(course.to_dict()), 201
 
+@app.route('/api/admin/import', methods=['POST'])
+@jwt_required()
+def admin_import_courses():
+    user = current_user
+    
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    batch_size = min(max(request.args.get('batch_size', app.config['IMPORT_BATCH_SIZE'], type=int), 1), 5000)
+    start = max(request.args.get('start', 0, type=int), 0)
+    instructors = course_import.load_instructors()
+    
+    # spool the bundle to disk so both passes can stream it
+    with tempfile.TemporaryFile() as spool:
+        shutil.copyfileobj(request.stream, spool)
+        spool.seek(0)
+        bundle = io.TextIOWrapper(spool, encoding='utf-8')
+        try:
+            count = course_import.validate(bundle, instructors)
+        except course_import.BundleError as e:
+            return jsonify({'error': str(e), 'problems': e.errors}), 400
+        
+        bundle.seek(0)
+        try:
+            stats = course_import.import_bundle(bundle, instructors, batch_size, start)
+        except course_import.ImportFailed as e:
+            return jsonify({'error': str(e), 'next_start': e.next_start}), 500
+    
+    stats['validated'] = count
+    return jsonify(stats), 201
+
 @app.route('/api/admin/courses/<int:course_id>', methods=['DELETE'])
 @jwt_required()
 def admin_delete_course(course_id):
-    user = User.query.get(int(get_jwt_identity()))
+    user = current_user
     
     if user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -480,6 +1040,7 @@ def admin_delete_course(course_id):
     course = Course.query.get_or_404(course_id)
     db.session.delete(course)
     db.session.commit()
+    cache.invalidate_course(course_id)
     
     return jsonify({'message': 'Course deleted'}), 200
 
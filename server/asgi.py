@@ -0,0 +1,113 @@
+import asyncio
+import io
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from app import app
+from async_db import async_db
+from async_views import VIEWS
+from google_verifier import google_verifier, GoogleUnavailable
+import schema
+
+# ASGI entry point, for I/O-bound deployments:
+#   uvicorn asgi:application --workers 4
+# The catalog, course, lesson and enrollment reads run as async views
+# (async_views.py) on the event loop, so a worker keeps serving while their
+# queries wait on the database. Every other request goes to the Flask app on
+# a pool of ASGI_WSGI_THREADS threads, as under gunicorn.
+#
+# Async views go through the same Flask pipeline as the sync ones: request
+# context, before_request hooks (metrics, rate limiting), error handlers and
+# after_request hooks (CORS, compression), then teardown.
+
+# requests whose body an async view reads
+BODY_METHODS = ('POST',)
+
+
+class AsyncFlask:
+    def __init__(self, app, views, threads):
+        self.app = app
+        self.views = views
+        self.wsgi = WSGIMiddleware(app, workers=threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD', 'POST'):
+            return await self.wsgi(scope, receive, send)
+
+        environ = build_environ(scope, None)
+        try:
+            rule, view_args = self.app.url_map.bind_to_environ(environ).match(return_rule=True)
+        except Exception:
+            rule = None  # 404, 405 and redirects are the Flask app's to answer
+        view = self.views.get(rule.endpoint) if rule is not None else None
+        if view is None:
+            if rule is not None and rule.endpoint == 'google_login':
+                # fetch Google's certs here rather than on a worker thread; without them the view answers 503
+                try:
+                    await google_verifier.get_certs_async()
+                except GoogleUnavailable:
+                    pass
+            return await self.wsgi(scope, receive, send)
+
+        body = await read_body(receive) if scope['method'] in BODY_METHODS else b''
+        environ = build_environ(scope, io.BytesIO(body))
+        status, headers, chunks = await self.dispatch(environ, view, view_args)
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]})
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+    async def dispatch(self, environ, view, view_args):
+        # Flask.wsgi_app and full_dispatch_request, awaiting the view
+        ctx = self.app.request_context(environ)
+        error = None
+        try:
+            try:
+                ctx.push()
+                try:
+                    rv = self.app.preprocess_request()
+                    if rv is None:
+                        rv = await view(**view_args)
+                except Exception as e:
+                    rv = self.app.handle_user_exception(e)
+                response = self.app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = self.app.handle_exception(e)
+            # read it all before teardown, which releases the rate limiter slot and the session
+            headers = response.get_wsgi_headers(environ).to_wsgi_list()
+            chunks = list(response.get_app_iter(environ))
+            response.close()
+            return response.status_code, headers, chunks
+        finally:
+            if error is not None and self.app.should_ignore_error(error):
+                error = None
+            ctx.pop(error)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_db.dispose()
+                await google_verifier.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise asyncio.CancelledError()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+# every uvicorn worker imports this, so it only checks the schema version; migrate before starting them
+schema.ensure_schema(app)
+async_db.init_app(app)
+application = AsyncFlask(app, VIEWS, app.config['ASGI_WSGI_THREADS'])
@@ -0,0 +1,57 @@
+import shlex
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from models import db
+import engine_profiles
+
+# Async engine for the native async views of the ASGI server (asgi.py). It
+# points at the same database as db.engine, through aiosqlite or asyncpg,
+# with the same pool size and timeouts and (on SQLite) the same pragmas.
+# The async views only read; every write still goes through db.session.
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def _server_settings(options):
+    # libpq's "-c name=value ..." options string, as the dict asyncpg wants
+    words = shlex.split(options)
+    return dict(word.split('=', 1) for flag, word in zip(words, words[1:]) if flag == '-c')
+
+
+class AsyncDatabase:
+    def __init__(self, app=None):
+        self.engine = None
+        self.session = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        with app.app_context():
+            url = db.engine.url  # relative SQLite paths already resolved against the instance folder
+        backend = url.get_backend_name()
+        if backend not in ASYNC_DRIVERS:
+            raise ValueError(f'No async driver for {url.drivername}')
+        if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+            raise ValueError('The ASGI server needs a database file, an in-memory SQLite database is per driver')
+
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        if 'pool_size' in options:
+            # an event loop keeps far more queries in flight than a worker has threads, so it would open and
+            # close overflow connections on every burst; same ceiling per process, all of it pooled
+            options['pool_size'] += options.pop('max_overflow', 0)
+            options['max_overflow'] = 0
+        connect_args = dict(options.pop('connect_args', {}))
+        if 'options' in connect_args:
+            connect_args['server_settings'] = _server_settings(connect_args.pop('options'))
+        self.engine = create_async_engine(url.set(drivername=ASYNC_DRIVERS[backend]),
+                                          connect_args=connect_args, **options)
+        pragmas = app.config.get('SQLITE_PRAGMAS')
+        if backend == 'sqlite' and pragmas:
+            engine_profiles.listen_pragmas(self.engine.sync_engine, pragmas)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def dispose(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+
+async_db = AsyncDatabase()
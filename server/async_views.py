@@ -0,0 +1,149 @@
+import asyncio
+from flask import abort, jsonify, request
+from flask_jwt_extended import decode_token, get_current_user, verify_jwt_in_request
+from sqlalchemy import select
+import app as views
+import course_counters
+import serializers
+from app import app, cached_response
+from async_db import async_db
+from auth import load_identity_async
+from compression import compression
+from models import Course, Module
+from response_cache import cache, LRUBackend
+
+# Async versions of the read endpoints that spend their time waiting on the
+# database, for the ASGI server (asgi.py). They run inside the Flask request
+# context, after the same before_request hooks and with the same error
+# handlers, so they answer exactly what the views in app.py do; only the SQL
+# goes through async_db instead of db.session.
+#
+# Auth: verify_jwt_in_request() loads the user through auth.load_identity,
+# a blocking query on a cache miss, so the identity is put in the cache
+# through the async session first.
+
+
+async def cache_call(fn, *args):
+    # the in-process LRU is a dict lookup; Redis is a network round trip, kept off the event loop
+    if isinstance(cache.backend, LRUBackend):
+        return fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+
+async def cached_entry(key, build, version=None, last_modified=None):
+    # app.cached_entry with an async build()
+    entry = await cache_call(cache.get, key, version)
+    if entry is None:
+        body = app.json.dumps_bytes(await build())
+        variants = await asyncio.to_thread(compression.precompress, body)
+        entry = await cache_call(cache.set, key, body, version, last_modified, variants)
+    return entry
+
+
+async def load_identity(session):
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer '):
+        return
+    try:
+        claims = decode_token(auth[7:])
+    except Exception:
+        return  # verify_jwt_in_request() answers for it
+    await load_identity_async(session, claims['sub'])
+
+
+async def current_user(session):
+    # jwt_required()
+    await load_identity(session)
+    verify_jwt_in_request()
+    return get_current_user()
+
+
+async def optional_user(session):
+    await load_identity(session)
+    return views.optional_user()
+
+
+async def get_courses():
+    # cache hits only: building a page (filters, cursors, full-text search) is left to the sync view,
+    # on a worker thread
+    async with async_db.session() as session:
+        version = views.format_catalog_version((await session.execute(course_counters.catalog_version_query())).scalar())
+    entry = await cache_call(lambda: cache.get(cache.catalog_key(request.args), version))
+    if entry is None:
+        return await asyncio.to_thread(views.get_courses)
+    return cached_response(entry)
+
+
+async def get_course(id):
+    include = views.course_detail_include()
+    async with async_db.session() as session:
+        row = (await session.execute(select(Course.updated_at).filter_by(id=id))).first()
+        if row is None:
+            abort(404)
+        updated_at = row[0]
+
+        async def build():
+            course = (await session.scalars(views.course_detail_query(id))).one()
+            return serializers.courses.dump(course, *views.COURSE_DETAIL)
+
+        entry = await cached_entry(cache.course_key(id), build,
+                                   version=updated_at.isoformat() if updated_at else None, last_modified=updated_at)
+        if not include:
+            return cached_response(entry)
+
+        user = await optional_user(session)
+        if user is None:
+            response = cached_response(entry)
+        else:
+            enrollments = (await session.scalars(views.enrollment_status_query(user.id, [id]))).all()
+            response = views.course_with_enrollment(entry, views.dump_enrollment_statuses([id], enrollments)[id])
+    response.vary.add('Authorization')
+    return response
+
+
+async def get_module(course_id, module_id):
+    async with async_db.session() as session:
+        row = (await session.execute(select(Course.updated_at).join(Module, Module.course_id == Course.id).filter(
+            Course.id == course_id, Module.id == module_id
+        ))).first()
+        if row is None:
+            abort(404)
+        updated_at = row[0]
+
+        async def build():
+            return (await session.get(Module, module_id)).to_dict()
+
+        entry = await cached_entry(cache.module_key(module_id), build,
+                                   version=updated_at.isoformat() if updated_at else None, last_modified=updated_at)
+    return cached_response(entry, app.config['MODULE_CACHE_MAX_AGE'])
+
+
+async def get_enrollments():
+    # GET /api/enrollments and /api/enrollments/my-enrollments
+    async with async_db.session() as session:
+        user = await current_user(session)
+        fields, includes = serializers.enrollments.from_request()
+        enrollments = await session.scalars(views.my_enrollments_query(user.id, fields, includes))
+        return jsonify(serializers.enrollments.dump_all(enrollments, fields, includes)), 200
+
+
+async def get_enrollment_statuses():
+    async with async_db.session() as session:
+        user = await current_user(session)
+        course_ids = views.requested_course_ids()
+        if isinstance(course_ids, tuple):
+            return course_ids
+        enrollments = (await session.scalars(views.enrollment_status_query(user.id, course_ids))).all()
+    statuses = views.dump_enrollment_statuses(course_ids, enrollments)
+    return jsonify({'statuses': {str(course_id): status for course_id, status in statuses.items()}}), 200
+
+
+# Flask endpoint -> async view
+VIEWS = {
+    'get_courses': get_courses,
+    'get_course': get_course,
+    'get_module': get_module,
+    'get_enrollments': get_enrollments,
+    'get_my_enrollments': get_enrollments,
+    'get_enrollment_statuses': get_enrollment_statuses,
+}
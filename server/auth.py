@@ -0,0 +1,68 @@
+from flask import current_app
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select
+from models import db, User
+from response_cache import LRUBackend
+
+# Who is calling, without a users query on every request.
+#
+# Tokens carry the role and username as claims for the client. On the server
+# the current user is resolved once per request (flask-jwt-extended memoizes
+# the lookup) from a small TTL cache, and only a cache miss reads the users
+# table. Role changes and deletions drop the cached entry right away; other
+# workers pick them up within IDENTITY_CACHE_TTL.
+
+
+class Identity:
+    def __init__(self, id, role, username):
+        self.id = id
+        self.role = role
+        self.username = username
+
+
+_cache = None
+
+
+def _identity_cache():
+    global _cache
+    if _cache is None:
+        _cache = LRUBackend(current_app.config.get('IDENTITY_CACHE_SIZE', 10000),
+                            ttl=current_app.config.get('IDENTITY_CACHE_TTL', 60))
+    return _cache
+
+
+def create_token(user):
+    return create_access_token(
+        identity=str(user.id),
+        additional_claims={'role': user.role, 'username': user.username}
+    )
+
+
+def load_identity(user_id):
+    cache = _identity_cache()
+    identity = cache.get(user_id)
+    if identity is None:
+        row = db.session.query(User.id, User.role, User.username).filter_by(id=user_id).first()
+        if row is None:
+            return None
+        identity = Identity(*row)
+        cache.set(user_id, identity)
+    return identity
+
+
+async def load_identity_async(session, user_id):
+    # load_identity for the async views in asgi.py: same cache, the miss is read through an AsyncSession
+    cache = _identity_cache()
+    identity = cache.get(user_id)
+    if identity is None:
+        result = await session.execute(select(User.id, User.role, User.username).filter_by(id=user_id))
+        row = result.first()
+        if row is None:
+            return None
+        identity = Identity(*row)
+        cache.set(user_id, identity)
+    return identity
+
+
+def forget_identity(user_id):
+    _identity_cache().delete(user_id)
@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.common import use_temp_database, summarize
+
+# Sync (gunicorn, app:app) against async (uvicorn, asgi:application) under
+# the same request mix, one server at a time:
+#   python -m benchmarks.async_load --connections 128 --duration 20
+#   DATABASE_URL=postgresql://... python -m benchmarks.async_load --workers 4 --threads 8 --uvicorn-workers 4
+# Reports requests per second, latency percentiles and non-200 responses for
+# each server, and the resident memory of its whole process tree after the
+# run (Linux, read from /proc), so worker counts can be set for equal memory.
+# The mix is the endpoints with async views: catalog pages, course detail
+# (half with ?include=enrollment), lesson bodies, "my enrollments" and batch
+# enrollment status.
+#
+# A local SQLite file answers in microseconds, so on its own this mostly
+# shows each server's overhead. --db-latency-ms N makes every SQLite
+# query wait N ms first, in the thread that runs it (a request thread
+# under gunicorn, aiosqlite's connection thread under uvicorn), which is what
+# a database across the network looks like to the servers.
+
+# sitecustomize for the server processes, wraps sqlite3.connect (SQLAlchemy's pysqlite goes through dbapi2)
+LATENCY_SHIM = '''
+import sqlite3
+import time
+
+class Cursor(sqlite3.Cursor):
+    def execute(self, sql, *args):
+        if not sql.lstrip().upper().startswith('PRAGMA'):  # connection setup, not a query
+            time.sleep({delay})
+        return super().execute(sql, *args)
+
+class Connection(sqlite3.Connection):
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+_connect = sqlite3.connect
+sqlite3.connect = sqlite3.dbapi2.connect = lambda *args, **kwargs: _connect(*args, **dict(kwargs, factory=Connection))
+'''
+
+SERVERS = {
+    'sync': lambda args, port: ['gunicorn', '-w', str(args.workers), '--threads', str(args.threads),
+                                '-b', f'127.0.0.1:{port}', 'app:app'],
+    'async': lambda args, port: [sys.executable, '-m', 'uvicorn', 'asgi:application', '--workers',
+                                 str(args.uvicorn_workers or args.workers), '--port', str(port),
+                                 '--log-level', 'warning'],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def tree_rss_mb(pid):
+    # RSS of pid and all its descendants
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack += children.get(current, [])
+        try:
+            with open(f'/proc/{current}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            pass
+    return round(total / 1024, 1)
+
+
+def build_mix(count, course_ids, modules, tokens, seed=1):
+    rng = random.Random(seed)
+    mix = []
+    for _ in range(count):
+        kind = rng.random()
+        token = rng.choice(tokens)
+        if kind < 0.25:
+            category = rng.choice(('Programming', 'Web Development', 'Data Science'))
+            mix.append(('catalog', 'GET', f'/api/courses?limit=20&category={category}', None, None))
+        elif kind < 0.5:
+            if rng.random() < 0.5:
+                mix.append(('course', 'GET', f'/api/courses/{rng.choice(course_ids)}', None, None))
+            else:
+                mix.append(('course+enrollment', 'GET', f'/api/courses/{rng.choice(course_ids)}?include=enrollment',
+                            token, None))
+        elif kind < 0.7:
+            course_id, module_id = rng.choice(modules)
+            mix.append(('module', 'GET', f'/api/courses/{course_id}/modules/{module_id}', None, None))
+        elif kind < 0.9:
+            mix.append(('my enrollments', 'GET', '/api/enrollments/my-enrollments?include=course', token, None))
+        else:
+            ids = rng.sample(course_ids, min(20, len(course_ids)))
+            mix.append(('enrollment status', 'POST', '/api/enrollments/status', token, {'course_ids': ids}))
+    return mix
+
+
+def drive(base_url, mix, connections, duration):
+    # one load generator process: `connections` concurrent keep-alive clients walking the mix
+    import httpx
+
+    async def run():
+        latencies, outcomes = {}, Counter()
+        deadline = time.perf_counter() + duration
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            async def user(offset):
+                i = offset
+                while time.perf_counter() < deadline:
+                    label, method, url, token, body = mix[i % len(mix)]
+                    i += connections
+                    headers = {'Accept-Encoding': 'gzip'}
+                    if token:
+                        headers['Authorization'] = f'Bearer {token}'
+                    start = time.perf_counter()
+                    try:
+                        response = await client.request(method, url, headers=headers, json=body)
+                        outcomes[response.status_code] += 1
+                    except httpx.HTTPError as e:
+                        outcomes[type(e).__name__] += 1
+                        continue
+                    latencies.setdefault(label, []).append(time.perf_counter() - start)
+            await asyncio.gather(*(user(n) for n in range(connections)))
+        return latencies, outcomes
+
+    return asyncio.run(run())
+
+
+def wait_until_up(base_url, timeout=60):
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(base_url + '/api/courses?limit=1').status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'server at {base_url} did not come up')
+
+
+def measure(name, args, env, mix):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(SERVERS[name](args, port), env=env, cwd=os.path.dirname(os.path.dirname(__file__)),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if not args.verbose else None,
+                              start_new_session=True)
+    try:
+        wait_until_up(base_url)
+        per_process = max(1, args.connections // args.generators)
+        with ProcessPoolExecutor(args.generators) as pool:
+            # warm up: fill the response caches and the connection pools
+            list(pool.map(drive, [base_url] * args.generators, [mix] * args.generators,
+                          [per_process] * args.generators, [args.warmup] * args.generators))
+            started = time.perf_counter()
+            results = list(pool.map(drive, [base_url] * args.generators, [mix] * args.generators,
+                                    [per_process] * args.generators, [args.duration] * args.generators))
+            elapsed = time.perf_counter() - started
+        rss = tree_rss_mb(server.pid)
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+
+    by_label = {}
+    for result, _ in results:
+        for label, samples in result.items():
+            by_label.setdefault(label, []).extend(samples)
+    latencies = [latency for samples in by_label.values() for latency in samples]
+    outcomes = sum((outcome for _, outcome in results), Counter())
+    return dict(rps=round(len(latencies) / elapsed, 1), rss_mb=rss, outcomes={str(k): v for k, v in outcomes.items()},
+                **summarize(latencies), endpoints={label: summarize(samples) for label, samples in sorted(by_label.items())})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--uvicorn-workers', type=int, help='uvicorn worker processes (default: --workers)')
+    parser.add_argument('--connections', type=int, default=64, help='concurrent clients')
+    parser.add_argument('--generators', type=int, default=2, help='load generator processes')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per server')
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--db-latency-ms', type=float, default=0, help='wait before every SQLite statement')
+    parser.add_argument('--only', choices=tuple(SERVERS), help='run just one server')
+    parser.add_argument('--verbose', action='store_true', help="show the servers' stderr")
+    args = parser.parse_args()
+
+    fresh = not os.environ.get('DATABASE_URL')
+    use_temp_database()
+    from app import app
+    from auth import create_token
+    from models import db, Course, Module, User
+
+    if fresh:
+        import seed
+        from benchmarks.dataset import SCALES, generate
+        seed.seed()
+        with app.app_context():
+            generate(SCALES['small'])
+
+    with app.app_context():
+        course_ids = [id for (id,) in db.session.query(Course.id).filter_by(is_published=True)]
+        modules = db.session.query(Module.course_id, Module.id).order_by(Module.id).limit(2000).all()
+        students = User.query.filter_by(role='student').order_by(User.id).limit(200).all()
+        tokens = [create_token(s) for s in students]
+    mix = build_mix(5000, course_ids, [tuple(m) for m in modules], tokens)
+
+    report = {'config': {'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0],
+                         'workers': args.workers, 'threads': args.threads,
+                         'uvicorn_workers': args.uvicorn_workers or args.workers,
+                         'connections': args.connections, 'duration': args.duration,
+                         'db_latency_ms': args.db_latency_ms}}
+    env = dict(os.environ)
+    if args.db_latency_ms:
+        if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+            sys.exit('--db-latency-ms only works with SQLite')
+        shim = tempfile.mkdtemp(prefix='lms-latency-')
+        with open(os.path.join(shim, 'sitecustomize.py'), 'w') as f:
+            f.write(LATENCY_SHIM.format(delay=args.db_latency_ms / 1000))
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [shim, env.get('PYTHONPATH')]))
+    for name in SERVERS:
+        if args.only in (None, name):
+            report[name] = measure(name, args, env, mix)
+            print(f'{name}: {report[name]["rps"]} req/s, p99 {report[name]["p99_ms"]} ms, '
+                  f'{report[name]["rss_mb"]} MB', file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+from benchmarks.common import use_temp_database
+
+# The catalog must run the same number of statements however many courses a
+# page holds: fills a throwaway database with N courses, counts the SQL each
+# catalog variant issues on a full page (limit=100, response cache cleared),
+# grows it to 10N courses and counts again. Exits 1 if any count changed,
+# i.e. something is loaded per course again.
+#   python -m benchmarks.catalog_queries
+#   python -m benchmarks.catalog_queries --courses 20 --verbose
+
+# (name, path): every way the catalog page is built
+VARIANTS = [
+    ('default', '/api/courses?limit=100'),
+    ('popular', '/api/courses?limit=100&sort=popular'),
+    ('category', '/api/courses?limit=100&category=Programming'),
+    ('cards', '/api/courses?limit=100&view=card'),
+    ('modules and instructor', '/api/courses?limit=100&include=modules,instructor'),
+    ('sparse fields', '/api/courses?limit=100&fields=id,title,instructor_name,module_count'),
+    ('search', '/api/courses?limit=100&search=learn'),
+]
+
+
+def volumes(courses):
+    return {'users': courses * 20, 'courses': courses, 'modules': courses * 8, 'enrollments': courses * 30}
+
+
+def count_statements(app, verbose=False):
+    from sqlalchemy import event
+    from models import db
+    from response_cache import cache
+
+    client = app.test_client()
+    statements = []
+
+    def record(conn, cursor, statement, *_):
+        statements.append(statement)
+
+    counts = {}
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for name, path in VARIANTS:
+            cache.clear()
+            statements.clear()
+            response = client.get(path)
+            if response.status_code != 200:
+                sys.exit(f'{name}: {path} answered {response.status_code}')
+            counts[name] = (len(statements), len(response.get_json()['courses']))
+            if verbose:
+                print(f'--- {name}: {path}')
+                for statement in statements:
+                    print('   ', ' '.join(statement.split())[:160])
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, default=10, help='N, the smaller catalog (at most 10, pages hold 100)')
+    parser.add_argument('--verbose', action='store_true', help='print the statements of every request')
+    args = parser.parse_args()
+
+    if os.environ.get('DATABASE_URL'):
+        sys.exit('benchmarks.catalog_queries builds its own database, unset DATABASE_URL')
+    use_temp_database()
+    from app import app
+    from models import db
+    from benchmarks.dataset import generate
+
+    with app.app_context():
+        db.create_all()
+        generate(volumes(args.courses))
+    small = count_statements(app, args.verbose)
+    with app.app_context():
+        generate(volumes(args.courses * 9), seed=43)
+    large = count_statements(app, args.verbose)
+
+    failed = False
+    for name, _ in VARIANTS:
+        (before, rows_before), (after, rows_after) = small[name], large[name]
+        ok = before == after
+        failed |= not ok
+        print(f'{name:24} {rows_before:4} courses: {before:3} statements   '
+              f'{rows_after:4} courses: {after:3} statements   {"ok" if ok else "CHANGED"}')
+    if failed:
+        print('statement count depends on the number of courses')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+# Shared setup for the benchmark scripts. Run them from server/, e.g.
+#   python -m benchmarks.login
+# They use a throwaway SQLite database unless DATABASE_URL is already set.
+# Rate limiting is off unless asked for, the benchmarks would only measure
+# their own 429s otherwise (benchmarks.rate_limit measures the limiter).
+
+os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+
+
+def use_temp_database():
+    if not os.environ.get('DATABASE_URL'):
+        path = os.path.join(tempfile.mkdtemp(prefix='lms-bench-'), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    return os.environ['DATABASE_URL']
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    # latencies in seconds -> milliseconds
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 99) * 1000, 2),
+        'max_ms': round(max(samples) * 1000, 2) if samples else 0.0,
+    }
@@ -0,0 +1,315 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+# Synthetic dataset on top of seed.py's accounts and courses.
+#   python -m benchmarks.dataset --scale medium --seed 42
+#   python -m benchmarks.dataset --users 5000 --courses 300 --modules 9000 --enrollments 40000
+#
+# Volumes are skewed the way real catalogs are: a few instructors own most
+# courses, course popularity follows a power law, module counts and lesson
+# lengths are log-normal, and most students enroll in a handful of courses
+# while a few enroll in many. The same --seed always produces the same rows.
+#
+# Rows go in through executemany inserts in --batch-size chunks with explicit
+# ids, so nothing is flushed through the ORM; the counters, search index and
+# dashboard stats are filled in at the end. Every synthetic account's password
+# is "password123".
+#
+# Uses DATABASE_URL as is (it must already be set), and appends to whatever is
+# there unless --reset is given, which reseeds from seed.py first.
+
+SCALES = {
+    'small': {'users': 2_000, 'courses': 200, 'modules': 6_000, 'enrollments': 20_000},
+    'medium': {'users': 100_000, 'courses': 5_000, 'modules': 200_000, 'enrollments': 1_000_000},
+    'large': {'users': 1_000_000, 'courses': 50_000, 'modules': 2_000_000, 'enrollments': 10_000_000},
+}
+
+# everything is dated relative to this, not to now, so reruns match
+ANCHOR = datetime(2024, 1, 1)
+HISTORY_DAYS = 730
+
+INSTRUCTOR_SHARE = 0.005
+PUBLISHED_SHARE = 0.95
+LEVELS = [('beginner', 5), ('intermediate', 3), ('advanced', 1)]
+CATEGORIES = [('Programming', 8), ('Web Development', 6), ('Data Science', 4), ('Computer Science', 3),
+              ('Design', 2), ('DevOps', 2), ('Mobile', 1), ('Security', 1)]
+MODULE_TYPES = [('lesson', 16), ('challenge', 3), ('project', 1)]
+PRICES = [(0, 6), (9.99, 2), (19.99, 2), (49.99, 1), (99.99, 1)]
+
+TOPICS = ['JavaScript', 'Python', 'React', 'SQL', 'Django', 'Flask', 'Node.js', 'TypeScript', 'Go', 'Rust',
+          'Docker', 'Kubernetes', 'CSS', 'HTML', 'Machine Learning', 'Pandas', 'Algorithms', 'Linux', 'Git',
+          'GraphQL', 'Vue', 'Swift', 'Kotlin', 'Testing', 'Security', 'Figma', 'AWS', 'PostgreSQL']
+ADJECTIVES = ['Practical', 'Modern', 'Complete', 'Hands-on', 'Advanced', 'Essential', 'Intro to', 'Mastering',
+              'Applied', 'Professional']
+SUFFIXES = ['Fundamentals', 'Bootcamp', 'in Depth', 'for Beginners', 'Patterns', 'Projects', 'Crash Course',
+            'Workshop', 'Deep Dive', 'from Scratch']
+WORDS = ('the a of to and in is for with you that this we will build learn code data function state '
+         'request server client query index cache test deploy component module variable loop array object '
+         'class method error value type string number list map set tree graph api route model view form '
+         'design layout responsive performance memory thread process file network security token user').split()
+
+FIRST_NAMES = ['Ada', 'Alan', 'Grace', 'Linus', 'Margaret', 'Ken', 'Barbara', 'Dennis', 'Frances', 'Guido',
+               'Radia', 'Tim', 'Anita', 'Donald', 'Hedy', 'Edsger', 'Katherine', 'John', 'Shafi', 'Yukihiro']
+LAST_NAMES = ['Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Hamilton', 'Thompson', 'Liskov', 'Ritchie', 'Allen',
+              'Rossum', 'Perlman', 'Berners-Lee', 'Borg', 'Knuth', 'Lamarr', 'Dijkstra', 'Johnson', 'Backus']
+
+
+def weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights)[0]
+
+
+def zipf_cum_weights(count, exponent):
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def spread(rng, total, count, sigma, minimum=1):
+    # split total into count log-normally distributed parts of at least minimum
+    raw = [rng.lognormvariate(0, sigma) for _ in range(count)]
+    scale = max(total - minimum * count, 0) / sum(raw)
+    return [minimum + int(r * scale) for r in raw]
+
+
+def paragraph_pool(rng, size=200):
+    # lesson and description text is stitched together from a fixed pool
+    pool = []
+    for _ in range(size):
+        words = rng.choices(WORDS, k=rng.randint(40, 120))
+        pool.append(' '.join(words).capitalize() + '.')
+    return pool
+
+
+def text_of(rng, pool, paragraphs):
+    return '\n\n'.join(rng.choices(pool, k=paragraphs))
+
+
+def when(rng, after=None):
+    start = after or ANCHOR
+    span = (ANCHOR + timedelta(days=HISTORY_DAYS)) - start
+    return start + timedelta(seconds=rng.randrange(max(int(span.total_seconds()), 1)))
+
+
+class Loader:
+    # executemany inserts in fixed-size batches, one transaction per batch
+    def __init__(self, engine, batch_size):
+        self.engine = engine
+        self.batch_size = batch_size
+
+    def insert(self, table, rows):
+        count = 0
+        started = time.perf_counter()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                count += self._flush(table, batch)
+                batch = []
+        if batch:
+            count += self._flush(table, batch)
+        elapsed = time.perf_counter() - started
+        print(f'  {table.name}: {count} rows in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} rows/s)')
+        return count
+
+    def _flush(self, table, batch):
+        with self.engine.begin() as connection:
+            connection.execute(table.insert(), batch)
+        return len(batch)
+
+
+def next_id(connection, table):
+    from models import db
+    return (connection.execute(db.select(db.func.max(table.c.id))).scalar() or 0) + 1
+
+
+def generate(volumes, seed=42, batch_size=10_000, completion_rate=0.3):
+    from models import db, hasher, User, Course, Module, Enrollment, ModuleCompletion
+    import course_search
+    import dashboard_stats
+
+    rng = random.Random(seed)
+    pool = paragraph_pool(rng)
+    loader = Loader(db.engine, batch_size)
+    users, courses, modules, enrollments = (m.__table__ for m in (User, Course, Module, Enrollment))
+
+    with db.engine.connect() as connection:
+        first_user, first_course, first_module, first_enrollment = (
+            next_id(connection, t) for t in (users, courses, modules, enrollments)
+        )
+
+    # users: a small share of instructors, everyone else a student
+    password_hash = hasher.generate_password_hash('password123')
+    user_count = volumes['users']
+    instructor_count = max(1, int(user_count * INSTRUCTOR_SHARE))
+    instructor_ids = list(range(first_user, first_user + instructor_count))
+    student_ids = list(range(first_user + instructor_count, first_user + user_count))
+
+    def user_rows():
+        for offset in range(user_count):
+            user_id = first_user + offset
+            role = 'instructor' if offset < instructor_count else 'student'
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield {
+                'id': user_id, 'username': f'{role}{user_id}', 'email': f'{role}{user_id}@example.com',
+                'password_hash': password_hash, 'role': role, 'first_name': first, 'last_name': last,
+                'avatar': f'https://ui-avatars.com/api/?name={first}+{last}', 'created_at': when(rng),
+            }
+
+    print('Generating users...')
+    loader.insert(users, user_rows())
+
+    # courses: owned by instructors with a power-law skew; module counts log-normal
+    course_count = volumes['courses']
+    module_counts = spread(rng, volumes['modules'], course_count, sigma=0.6)
+    instructor_weights = zipf_cum_weights(instructor_count, 0.9)
+    course_created = []
+
+    def course_rows():
+        for offset in range(course_count):
+            created = when(rng)
+            course_created.append(created)
+            topic = rng.choice(TOPICS)
+            yield {
+                'id': first_course + offset,
+                'title': f'{rng.choice(ADJECTIVES)} {topic} {rng.choice(SUFFIXES)}',
+                'description': f'Learn {topic}. ' + text_of(rng, pool, rng.randint(1, 4)),
+                'price': weighted(rng, PRICES), 'level': weighted(rng, LEVELS),
+                'category': weighted(rng, CATEGORIES), 'duration': rng.randint(2, 120),
+                'instructor_id': rng.choices(instructor_ids, cum_weights=instructor_weights)[0],
+                'is_published': rng.random() < PUBLISHED_SHARE,
+                'created_at': created, 'updated_at': created,
+                'student_count': 0, 'module_count': module_counts[offset],
+            }
+
+    print('Generating courses...')
+    loader.insert(courses, course_rows())
+
+    # modules: ids are contiguous per course, so course i owns
+    # first_module_of[i] .. first_module_of[i] + module_counts[i] - 1
+    first_module_of = [first_module + before for before in accumulate([0] + module_counts[:-1])]
+
+    def module_rows():
+        for offset, count in enumerate(module_counts):
+            for order in range(1, count + 1):
+                module_type = weighted(rng, MODULE_TYPES)
+                yield {
+                    'id': first_module_of[offset] + order - 1,
+                    'title': f'{order}. {rng.choice(ADJECTIVES)} {rng.choice(WORDS)} {rng.choice(WORDS)}',
+                    'content': text_of(rng, pool, max(1, int(rng.lognormvariate(1.2, 0.6)))),
+                    'duration': rng.randint(5, 60), 'order': order, 'course_id': first_course + offset,
+                    'created_at': course_created[offset], 'module_type': module_type,
+                    'challenge_code': '// your code here' if module_type == 'challenge' else None,
+                }
+
+    print('Generating modules...')
+    loader.insert(modules, module_rows())
+
+    # enrollments: per-student counts are exponential, course choice follows
+    # popularity; a share of enrollments has finished some leading modules.
+    # Enrollments and their completions go in together, a batch of students at a time.
+    course_order = list(range(course_count))
+    rng.shuffle(course_order)
+    popularity = zipf_cum_weights(course_count, 1.1)
+    mean_enrollments = volumes['enrollments'] / max(len(student_ids), 1)
+    student_counts = [0] * course_count
+
+    def enrollment_rows(user_id, enrollment_id):
+        wanted = min(course_count // 2 or 1, int(rng.expovariate(1 / mean_enrollments)) if mean_enrollments else 0)
+        picked = set()
+        while len(picked) < wanted:
+            picked.update(rng.choices(course_order, cum_weights=popularity, k=wanted - len(picked)))
+        for offset in sorted(picked):
+            student_counts[offset] += 1
+            total = module_counts[offset]
+            # of the students who started, a quarter finish and the rest drop off early
+            done = 0
+            if rng.random() < completion_rate:
+                done = total if rng.random() < 0.25 else min(total, 1 + int(rng.expovariate(4 / total)))
+            enrolled = when(rng, course_created[offset])
+            last_seen = when(rng, enrolled)
+            step = (last_seen - enrolled) / max(done, 1)
+            yield {
+                'id': enrollment_id, 'user_id': user_id, 'course_id': first_course + offset,
+                'enrollment_date': enrolled, 'progress_percentage': done * 100 // total,
+                'completed_modules': done, 'last_accessed': last_seen,
+                'completion_status': 'completed' if done == total else 'in_progress',
+            }, [
+                {'enrollment_id': enrollment_id, 'module_id': first_module_of[offset] + index,
+                 'completed_at': enrolled + step * (index + 1)}
+                for index in range(done)
+            ]
+            enrollment_id += 1
+
+    print('Generating enrollments...')
+    started = time.perf_counter()
+    enrollment_id = first_enrollment
+    completion_count = 0
+    batch, finished = [], []
+    for position, user_id in enumerate(student_ids, start=1):
+        for row, done in enrollment_rows(user_id, enrollment_id):
+            batch.append(row)
+            finished.extend(done)
+            enrollment_id += 1
+        if len(batch) >= batch_size or position == len(student_ids):
+            with db.engine.begin() as connection:
+                if batch:
+                    connection.execute(enrollments.insert(), batch)
+                if finished:
+                    connection.execute(ModuleCompletion.__table__.insert(), finished)
+            completion_count += len(finished)
+            batch, finished = [], []
+    elapsed = time.perf_counter() - started
+    count = enrollment_id - first_enrollment
+    print(f'  enrollments: {count} rows and {completion_count} module completions in {elapsed:.1f}s '
+          f'({(count + completion_count) / elapsed if elapsed else 0:.0f} rows/s)')
+
+    print('Updating derived data...')
+    with db.engine.begin() as connection:
+        connection.execute(
+            db.update(courses).where(courses.c.id == db.bindparam('b_id')).values(student_count=db.bindparam('b_count')),
+            [{'b_id': first_course + offset, 'b_count': count} for offset, count in enumerate(student_counts) if count]
+        )
+        if connection.dialect.name == 'postgresql':
+            # explicit ids skip the sequences, move them past what we inserted
+            for table in (users, courses, modules, enrollments):
+                connection.execute(db.text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), (SELECT max(id) FROM {table.name}))"
+                ))
+        course_search.create_index(connection, rebuild=True)
+        dashboard_stats.rebuild(connection)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    for name in ('users', 'courses', 'modules', 'enrollments'):
+        parser.add_argument(f'--{name}', type=int, help=f'override the scale\'s {name}')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--completion-rate', type=float, default=0.3,
+                        help='share of enrollments with at least one module finished')
+    parser.add_argument('--reset', action='store_true', help='drop everything and run seed.py first')
+    args = parser.parse_args()
+
+    volumes = dict(SCALES[args.scale])
+    for name in volumes:
+        if getattr(args, name) is not None:
+            volumes[name] = getattr(args, name)
+
+    from app import app
+    from models import db
+    if args.reset:
+        import seed
+        seed.seed()
+
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        generate(volumes, args.seed, args.batch_size, args.completion_rate)
+    print(f'Done in {time.perf_counter() - started:.1f}s: {volumes}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+import argparse
+import json
+import os
+import subprocess
+import time
+from datetime import datetime
+from benchmarks.common import use_temp_database, summarize
+
+# Times every /api/* route through the Flask test client and records query
+# counts and latency percentiles.
+#   python -m benchmarks.endpoints --requests 50 --output results.json
+#   python -m benchmarks.endpoints --compare results-before.json
+#
+# Point DATABASE_URL at a database filled by benchmarks.dataset to measure at
+# scale; without it a throwaway database gets the "small" dataset. Write
+# endpoints create their own throwaway rows outside the timed part, so the
+# dataset is left close to how it was found. Routes without a case below are
+# listed under "uncovered" in the results.
+
+SKIPPED = {
+    # needs a real Google ID token
+    'POST /api/auth/google': 'needs a Google ID token',
+}
+
+
+class Case:
+    def __init__(self, name, method, path, role=None, body=None, setup=None, requests=None, raw=False):
+        self.name = name
+        self.method = method
+        self.path = path  # str.format template, filled from the context and setup()
+        self.role = role  # whose token to send, a key of Context.tokens
+        self.body = body  # dict/str, or callable(values) -> dict/str
+        self.setup = setup  # callable(context, i) -> extra template values, untimed
+        self.requests = requests  # cap for heavy endpoints
+        self.raw = raw  # send body as raw data instead of JSON
+
+
+class Context:
+    # ids of representative rows plus tokens for each role
+    def __init__(self, app):
+        from sqlalchemy import func
+        from models import db, User, Course, Module, Enrollment
+        from auth import create_token
+
+        self.app = app
+        with app.app_context():
+            busiest_course = Course.query.order_by(Course.student_count.desc(), Course.id).first()
+            busiest_student = db.session.query(Enrollment.user_id).group_by(Enrollment.user_id).order_by(
+                func.count().desc(), Enrollment.user_id).first()[0]
+            busiest_instructor = db.session.query(Course.instructor_id).group_by(Course.instructor_id).order_by(
+                func.count().desc(), Course.instructor_id).first()[0]
+            admin = User.query.filter_by(role='admin').order_by(User.id).first()
+            enrollment = Enrollment.query.filter_by(user_id=busiest_student).order_by(Enrollment.id).first()
+            self.values = {
+                'course_id': busiest_course.id,
+                'module_id': Module.query.filter_by(course_id=busiest_course.id).order_by(Module.order).first().id,
+                'student_id': busiest_student,
+                'instructor_id': busiest_instructor,
+                'enrollment_course_id': enrollment.course_id,
+                'enrollment_id': enrollment.id,
+                'enrollment_module_id': Module.query.filter_by(course_id=enrollment.course_id).first().id,
+            }
+            users = {'student': db.session.get(User, busiest_student), 'instructor': db.session.get(User, busiest_instructor),
+                     'admin': admin}
+            self.tokens = {role: create_token(user) for role, user in users.items()}
+            self.emails = {role: user.email for role, user in users.items()}
+
+    def make(self, model, **fields):
+        from models import db
+        with self.app.app_context():
+            row = model(**fields)
+            db.session.add(row)
+            db.session.commit()
+            return row.id
+
+    def course(self, i):
+        from models import Course
+        return {'course_id': self.make(
+            Course, title=f'Bench course {i}', description='Throwaway course for the benchmark', price=0,
+            level='beginner', category='Benchmark', instructor_id=self.values['instructor_id']
+        )}
+
+    def student(self, i):
+        from models import db, User
+        from auth import create_token
+        unique = stamp()
+        user_id = self.make(User, username=f'bench{unique}', email=f'bench{unique}@example.com',
+                            password_hash='!', role='student')
+        with self.app.app_context():
+            self.tokens['fresh'] = create_token(db.session.get(User, user_id))
+        return {'user_id': user_id}
+
+    def challenge(self, i):
+        # one server-graded challenge in the benchmark student's course, made on first use
+        from models import Module
+        if 'challenge_id' not in self.values:
+            self.values['challenge_id'] = self.make(
+                Module, title='Bench challenge', content='Write add(a, b).', order=999, module_type='challenge',
+                course_id=self.values['enrollment_course_id'], challenge_runner='python',
+                challenge_tests=json.dumps([{'description': 'adds', 'test': 'return add(2, 3)', 'expected': 5}])
+            )
+        return {'challenge_id': self.values['challenge_id']}
+
+    def application(self, i):
+        from models import InstructorApplication
+        values = self.student(i)
+        values['application_id'] = self.make(InstructorApplication, user_id=values['user_id'], qualifications='bench')
+        return values
+
+
+def bundle(values):
+    module = {'title': 'Lesson', 'content': 'Benchmark lesson'}
+    course = {'title': 'Imported bench course', 'description': 'From the benchmark', 'price': 0, 'level': 'beginner',
+              'category': 'Benchmark', 'instructor_id': values['instructor_id'], 'modules': [module] * 10}
+    return json.dumps(course) + '\n'
+
+
+def stamp():
+    return f'{os.getpid()}{time.time_ns()}'
+
+
+CASES = [
+    Case('register', 'POST', '/api/auth/register', body=lambda v: {
+        'username': f'reg{stamp()}', 'email': f'reg{stamp()}@example.com', 'password': 'password123',
+        'first_name': 'Bench', 'last_name': 'User'}, requests=20),
+    Case('login', 'POST', '/api/auth/login', body=lambda v: {'email': v['student_email'], 'password': 'password123'},
+         requests=20),
+    Case('me', 'GET', '/api/auth/me', role='student'),
+    Case('catalog', 'GET', '/api/courses'),
+    Case('catalog cards', 'GET', '/api/courses?view=card&limit=24'),
+    Case('catalog popular', 'GET', '/api/courses?view=card&sort=popular'),
+    Case('catalog search', 'GET', '/api/courses?search=python&view=card'),
+    Case('catalog filtered', 'GET', '/api/courses?category=Programming&level=beginner'),
+    Case('catalog modules', 'GET', '/api/courses?include=modules&fields=id,title,module_count'),
+    Case('course detail', 'GET', '/api/courses/{course_id}'),
+    Case('course detail enrolled', 'GET', '/api/courses/{enrollment_course_id}?include=enrollment', role='student'),
+    Case('module', 'GET', '/api/courses/{course_id}/modules/{module_id}'),
+    Case('create course', 'POST', '/api/courses', role='instructor', body={
+        'title': 'Bench course', 'description': 'Created by the benchmark', 'price': 0, 'level': 'beginner',
+        'category': 'Benchmark'}),
+    Case('update course', 'PUT', '/api/courses/{course_id}', role='instructor', setup=Context.course,
+         body={'title': 'Bench course (edited)'}),
+    Case('delete course', 'DELETE', '/api/courses/{course_id}', role='instructor', setup=Context.course),
+    Case('instructor courses', 'GET', '/api/courses/instructor/my-courses', role='instructor'),
+    Case('create module', 'POST', '/api/courses/{course_id}/modules', role='instructor', setup=Context.course,
+         body={'title': 'Bench module', 'content': 'Benchmark lesson', 'order': 1}),
+    Case('enroll', 'POST', '/api/enrollments', role='student', setup=Context.course,
+         body=lambda v: {'course_id': v['course_id']}),
+    Case('enrollments', 'GET', '/api/enrollments', role='student'),
+    Case('check enrollment', 'GET', '/api/enrollments/check/{course_id}', role='student'),
+    Case('enrollment status', 'POST', '/api/enrollments/status', role='student',
+         body=lambda v: {'course_ids': [v['course_id'], v['enrollment_course_id']] + list(range(1, 49))}),
+    Case('my enrollments', 'GET', '/api/enrollments/my-enrollments', role='student'),
+    Case('my enrollments course', 'GET', '/api/enrollments/my-enrollments?include=course', role='student'),
+    Case('my enrollments slim', 'GET', '/api/enrollments/my-enrollments?fields=course_id,progress_percentage',
+         role='student'),
+    Case('update enrollment', 'PUT', '/api/enrollments/{enrollment_id}', role='student',
+         body=lambda v: {'module_id': v['enrollment_module_id']}),
+    Case('progress', 'POST', '/api/courses/{enrollment_course_id}/progress', role='student',
+         body=lambda v: {'module_id': v['enrollment_module_id']}),
+    Case('heartbeat', 'POST', '/api/courses/{enrollment_course_id}/progress', role='student', body={}),
+    # unique code each time, so every submission really runs in a sandbox
+    Case('submit challenge', 'POST', '/api/modules/{challenge_id}/submissions', role='student', setup=Context.challenge,
+         body=lambda v: {'code': f'def add(a, b):\n    return a + b  # {stamp()}\n'}, requests=50),
+    Case('submissions', 'GET', '/api/modules/{challenge_id}/submissions', role='student', setup=Context.challenge),
+    Case('apply instructor', 'POST', '/api/instructor-applications', role='fresh', setup=Context.student,
+         body={'qualifications': 'Benchmark'}),
+    Case('applications', 'GET', '/api/instructor-applications', role='admin'),
+    Case('review application', 'PUT', '/api/instructor-applications/{application_id}', role='admin',
+         setup=Context.application, body={'status': 'rejected'}),
+    Case('stats student', 'GET', '/api/stats', role='student'),
+    Case('stats instructor', 'GET', '/api/stats', role='instructor'),
+    Case('daily stats', 'GET', '/api/stats/daily', role='instructor'),
+    Case('admin users', 'GET', '/api/admin/users', role='admin'),
+    Case('admin delete user', 'DELETE', '/api/admin/users/{user_id}', role='admin', setup=Context.student),
+    Case('red flags', 'GET', '/api/admin/red-flags', role='admin'),
+    Case('export users', 'GET', '/api/admin/export/users?format=csv', role='admin', requests=3),
+    Case('export enrollments', 'GET', '/api/admin/export/enrollments', role='admin', requests=3),
+    Case('admin create course', 'POST', '/api/admin/courses', role='admin', body=lambda v: {
+        'title': 'Bench course', 'description': 'Created by the benchmark', 'price': 0, 'level': 'beginner',
+        'category': 'Benchmark', 'instructor_id': v['instructor_id']}),
+    Case('admin import', 'POST', '/api/admin/import', role='admin', body=bundle, raw=True, requests=10),
+    Case('admin delete course', 'DELETE', '/api/admin/courses/{course_id}', role='admin', setup=Context.course),
+]
+
+
+def run_case(app, context, case, requests, counter, cold=False):
+    from response_cache import cache
+    client = app.test_client()
+    samples, queries, statuses = [], [], {}
+    for i in range(min(requests, case.requests or requests)):
+        values = dict(context.values)
+        values['student_email'] = context.emails['student']
+        if case.setup:
+            values.update(case.setup(context, i))
+        body = case.body(values) if callable(case.body) else case.body
+        headers = {'Authorization': f'Bearer {context.tokens[case.role]}'} if case.role else {}
+        kwargs = {'data': body} if case.raw else {'json': body}
+
+        if cold:
+            cache.clear()
+        counter['n'] = 0
+        started = time.perf_counter()
+        response = client.open(case.path.format(**values), method=case.method, headers=headers, **kwargs)
+        response.get_data()  # drain streamed responses inside the timing
+        samples.append(time.perf_counter() - started)
+        queries.append(counter['n'])
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    return {
+        'method': case.method,
+        'path': case.path,
+        'status': statuses,
+        'queries': {'mean': round(sum(queries) / len(queries), 2), 'max': max(queries)},
+        'latency': summarize(samples),
+    }
+
+
+def route_keys(app):
+    return sorted(
+        f'{method} {rule.rule}'
+        for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+    )
+
+
+def covered_keys(app, context):
+    adapter = app.url_map.bind('localhost')
+    keys = set()
+    for case in CASES:
+        values = dict({'challenge_id': 0}, **context.values, user_id=0, application_id=0)
+        path = case.path.format(**values).split('?')[0]
+        rule, _ = adapter.match(path, method=case.method, return_rule=True)
+        keys.add(f'{case.method} {rule.rule}')
+    return keys
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['endpoints']
+    print(f'{"endpoint":<24}{"p50 ms":>18}{"p95 ms":>18}{"queries":>14}')
+    for name, result in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        p50 = f'{before["latency"]["p50_ms"]} -> {result["latency"]["p50_ms"]}'
+        p95 = f'{before["latency"]["p95_ms"]} -> {result["latency"]["p95_ms"]}'
+        q = f'{before["queries"]["mean"]} -> {result["queries"]["mean"]}'
+        print(f'{name:<24}{p50:>18}{p95:>18}{q:>14}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=30, help='requests per endpoint')
+    parser.add_argument('--only', help='comma-separated case names')
+    parser.add_argument('--cold', action='store_true', help='clear the response cache before every request')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='earlier results file to diff against')
+    args = parser.parse_args()
+
+    fresh = not os.environ.get('DATABASE_URL')
+    use_temp_database()
+    from sqlalchemy import event
+    from app import app
+    from models import db, User, Course, Module, Enrollment
+
+    if fresh:
+        import seed
+        from benchmarks.dataset import SCALES, generate
+        seed.seed()
+        with app.app_context():
+            generate(SCALES['small'])
+
+    context = Context(app)
+    counter = {'n': 0}
+
+    def count(*_):
+        counter['n'] += 1
+
+    cases = CASES
+    if args.only:
+        wanted = {name.strip() for name in args.only.split(',')}
+        cases = [case for case in CASES if case.name in wanted]
+
+    results = {}
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        rows = {model.__tablename__: db.session.query(model).count() for model in (User, Course, Module, Enrollment)}
+        dialect = db.engine.dialect.name
+        db.session.remove()
+    for case in cases:
+        results[case.name] = run_case(app, context, case, args.requests, counter, args.cold)
+        latency = results[case.name]['latency']
+        print(f'{case.name:<24} p50 {latency["p50_ms"]:>8} ms  p95 {latency["p95_ms"]:>8} ms  '
+              f'queries {results[case.name]["queries"]["mean"]:>6}  {results[case.name]["status"]}')
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'ran_at': datetime.utcnow().isoformat(),
+            'database': dialect,
+            'cold_cache': args.cold,
+            'rows': rows,
+            'requests': args.requests,
+        },
+        'endpoints': results,
+        'skipped': SKIPPED,
+        'uncovered': sorted(set(route_keys(app)) - covered_keys(app, context) - set(SKIPPED)),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {args.output}')
+    if report['uncovered']:
+        print('No benchmark case for: ' + ', '.join(report['uncovered']))
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
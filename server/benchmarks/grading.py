@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import use_temp_database, summarize
+
+# Challenge submissions per second through POST /api/modules/<id>/submissions,
+# sandbox included.
+#   python -m benchmarks.grading --threads 8 --requests 400 --workers 4
+#   python -m benchmarks.grading --repeat 0.8   # 80% resubmit a known answer (result cache hits)
+# Every submission is unique unless --repeat is set, so by default each one
+# really runs in a sandbox.
+
+TESTS = [
+    {'description': 'add works', 'test': 'return add(2, 3)', 'expected': 5},
+    {'description': 'add handles negatives', 'test': 'return add(-2, -3)', 'expected': -5},
+    {'description': 'add is a function', 'test': 'return "def add" in code'},
+]
+
+ANSWER = 'def add(a, b):\n    # attempt {}\n    return a + b\n'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=None, help='GRADER_WORKERS (default: config)')
+    parser.add_argument('--students', type=int, default=50)
+    parser.add_argument('--repeat', type=float, default=0.0, help='share of submissions that repeat an earlier answer')
+    args = parser.parse_args()
+
+    if args.workers:
+        os.environ['GRADER_WORKERS'] = str(args.workers)
+    os.environ.setdefault('GRADER_MAX_PENDING', str(args.threads))
+    use_temp_database()
+    from app import app
+    from auth import create_token
+    from grading import grader
+    from models import db, User, Course, Module, Enrollment
+
+    with app.app_context():
+        db.create_all()
+        instructor = User(username='bench_teacher', email='bench_teacher@example.com', role='instructor', password_hash='!')
+        db.session.add(instructor)
+        db.session.flush()
+        course = Course(title='Grading', description='Grading benchmark', price=0, level='beginner',
+                        category='Benchmark', instructor_id=instructor.id)
+        db.session.add(course)
+        db.session.flush()
+        module = Module(title='Add', content='Write add(a, b).', order=1, course_id=course.id, module_type='challenge',
+                        challenge_tests=json.dumps(TESTS), challenge_runner='python')
+        students = [User(username=f'bench_student{i}', email=f'bench_student{i}@example.com', role='student',
+                         password_hash='!') for i in range(args.students)]
+        db.session.add_all([module] + students)
+        db.session.flush()
+        db.session.add_all([Enrollment(user_id=s.id, course_id=course.id) for s in students])
+        db.session.commit()
+        module_id = module.id
+        tokens = [create_token(s) for s in students]
+
+    plan = []
+    for i in range(args.requests):
+        attempt = 0 if i and (i * 7919 % 1000) < args.repeat * 1000 else i
+        plan.append((tokens[i % len(tokens)], ANSWER.format(attempt)))
+
+    def submit(item):
+        token, code = item
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post(f'/api/modules/{module_id}/submissions', json={'code': code},
+                               headers={'Authorization': f'Bearer {token}'})
+        body = response.get_json() or {}
+        outcome = body.get('status') if response.status_code == 201 else response.status_code
+        return outcome, body.get('cached', False), time.perf_counter() - start
+
+    # start the sandboxes before the clock does
+    grader.grade('python', 'pass', [])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(submit, plan))
+    elapsed = time.perf_counter() - started
+    grader.shutdown()
+
+    report = {
+        'config': {
+            'threads': args.threads,
+            'grader_workers': app.config['GRADER_WORKERS'],
+            'repeat': args.repeat,
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0],
+        },
+        'outcomes': dict(Counter(str(outcome) for outcome, _, _ in results)),
+        'cache_hits': sum(1 for _, cached, _ in results if cached),
+        'latency': summarize([latency for _, _, latency in results]),
+        'submissions_per_sec': round(len(results) / elapsed, 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+from benchmarks.common import use_temp_database
+
+# Cold start budget for the serverless handler: imports index.py in a fresh
+# interpreter under `python -X importtime` and fails (exit 1) if the import is
+# slower than the budget or pulls in a module that should stay lazy.
+#   python -m benchmarks.import_time
+#   python -m benchmarks.import_time --budget-ms 500 --runs 10
+# Takes the fastest of several runs, the others mostly measure the machine.
+# The database is migrated beforehand, so the import only sees the version
+# check it does on every cold start.
+
+# only needed by the CLI, Google sign-in or password checks
+LAZY_MODULES = ('alembic', 'flask_migrate', 'google.auth', 'requests', 'bcrypt')
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def measure():
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import index'],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    # a module is reported after everything it imported, so index.py's own
+    # imports are the lines since the previous top-level one
+    subtree = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = match.groups()
+        if indent:
+            subtree.append((int(cumulative), len(indent), name))
+        elif name == 'index':
+            total = int(cumulative)
+            break
+        else:
+            subtree = []  # imported by site.py or the interpreter, not by us
+    else:
+        sys.exit('index was not imported')
+    modules = {name for _, _, name in subtree}
+    # direct imports of index.py and app.py, the usual suspects when the budget is blown
+    children = [(cumulative, name) for cumulative, depth, name in subtree if depth <= 4]
+    return total / 1000, modules, children
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('IMPORT_BUDGET_MS') or 800))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    use_temp_database()
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'ensure-schema'], check=True,
+                   cwd=os.path.dirname(os.path.dirname(__file__)))
+
+    runs = [measure() for _ in range(args.runs)]
+    best, modules, children = min(runs, key=lambda run: run[0])
+    print(f'import index: best {best:.1f} ms, worst {max(run[0] for run in runs):.1f} ms '
+          f'over {args.runs} runs (budget {args.budget_ms:.0f} ms)')
+    for cumulative, name in sorted(children, reverse=True)[:args.top]:
+        print(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+    failures = []
+    if best > args.budget_ms:
+        failures.append(f'import took {best:.1f} ms, budget is {args.budget_ms:.0f} ms')
+    eager = [name for name in modules if any(name == lazy or name.startswith(lazy + '.') for lazy in LAZY_MODULES)]
+    if eager:
+        failures.append('imported eagerly: ' + ', '.join(sorted(eager)[:10]))
+    for failure in failures:
+        print('FAIL ' + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import use_temp_database, summarize
+
+# Concurrent logins against /api/auth/login.
+#   python -m benchmarks.login --threads 32 --requests 256
+# Reports login latency percentiles and how many requests were shed with 503.
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=256)
+    args = parser.parse_args()
+
+    use_temp_database()
+    from app import app
+    from models import db, User
+
+    with app.app_context():
+        db.create_all()
+        if not User.query.filter_by(email='bench@example.com').first():
+            user = User(username='bench', email='bench@example.com', role='student')
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.commit()
+
+    def login(_):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post('/api/auth/login', json={'email': 'bench@example.com', 'password': 'password123'})
+        return response.status_code, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(login, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for status, latency in results if status == 200]
+    report = {
+        'config': {
+            'threads': args.threads,
+            'bcrypt_rounds': app.config['BCRYPT_LOG_ROUNDS'],
+            'hash_workers': app.config['HASH_WORKERS'],
+            'hash_max_pending': app.config['HASH_MAX_PENDING'],
+        },
+        'ok': summarize(ok),
+        'shed_503': sum(1 for status, _ in results if status == 503),
+        'errors': sum(1 for status, _ in results if status not in (200, 503)),
+        'logins_per_sec': round(len(ok) / elapsed, 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
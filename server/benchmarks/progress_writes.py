@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import use_temp_database, summarize
+
+# Many students posting lesson completions at once, the write path that used
+# to fail with "database is locked" on SQLite.
+#   python -m benchmarks.progress_writes --threads 32 --requests 2000
+#   python -m benchmarks.progress_writes --profile default   # SQLAlchemy defaults, for comparison
+# Reports completed writes per second, latency and every non-200 outcome.
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--modules', type=int, default=40)
+    parser.add_argument('--profile', choices=('tuned', 'default'), default='tuned')
+    args = parser.parse_args()
+
+    os.environ['DB_PROFILE'] = args.profile
+    use_temp_database()
+    from app import app
+    from auth import create_token
+    from models import db, User, Course, Module, Enrollment
+
+    with app.app_context():
+        db.create_all()
+        instructor = User(username='bench_teacher', email='bench_teacher@example.com', role='instructor', password_hash='!')
+        db.session.add(instructor)
+        db.session.flush()
+        course = Course(title='Concurrency', description='Write benchmark', price=0, level='beginner',
+                        category='Benchmark', instructor_id=instructor.id)
+        db.session.add(course)
+        db.session.flush()
+        modules = [Module(title=f'Lesson {i}', content='...', order=i, course_id=course.id) for i in range(args.modules)]
+        students = [User(username=f'bench_student{i}', email=f'bench_student{i}@example.com', role='student',
+                         password_hash='!') for i in range(args.students)]
+        db.session.add_all(modules + students)
+        db.session.flush()
+        db.session.add_all([Enrollment(user_id=s.id, course_id=course.id) for s in students])
+        db.session.commit()
+        course_id = course.id
+        module_ids = [m.id for m in modules]
+        tokens = [create_token(s) for s in students]
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar() \
+            if db.engine.dialect.name == 'sqlite' else None
+
+    rng = random.Random(1)
+    plan = [(rng.choice(tokens), rng.choice(module_ids)) for _ in range(args.requests)]
+
+    def post(item):
+        token, module_id = item
+        client = app.test_client()
+        start = time.perf_counter()
+        try:
+            response = client.post(f'/api/courses/{course_id}/progress', json={'module_id': module_id},
+                                   headers={'Authorization': f'Bearer {token}'})
+            outcome = response.status_code
+        except Exception as e:  # raised straight out of the view when exceptions propagate
+            outcome = type(e).__name__ + ': ' + str(e).split('\n')[0]
+        return outcome, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(post, plan))
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for outcome, latency in results if outcome == 200]
+    report = {
+        'config': {
+            'profile': args.profile,
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0],
+            'journal_mode': journal_mode,
+            'threads': args.threads,
+            'students': args.students,
+        },
+        'ok': summarize(ok),
+        'failures': dict(Counter(str(outcome) for outcome, _ in results if outcome != 200)),
+        'writes_per_sec': round(len(ok) / elapsed, 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
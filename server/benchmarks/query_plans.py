@@ -0,0 +1,127 @@
+import argparse
+import os
+import re
+import sys
+from benchmarks.common import use_temp_database
+from benchmarks.endpoints import CASES, Context, run_case
+
+# Query-plan regression check: runs every endpoint case from
+# benchmarks.endpoints, records the SQL it issues and EXPLAINs each
+# statement. Exits 1 if any of them reads a whole table instead of using an
+# index, unless the case/table pair is listed in ALLOWED_SCANS.
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.query_plans
+#   python -m benchmarks.query_plans --only "catalog filtered,enroll" --verbose
+# Point DATABASE_URL at a database filled by benchmarks.dataset (medium or
+# larger) so the planner sees realistic row counts; without it a throwaway
+# database gets the "small" dataset. Without --analyze SQLite has no table
+# statistics and plans as if every table were large, which is the question
+# here; with it, tiny tables (applications, red flags) are scanned anyway.
+
+# scans that are the point of the endpoint, or walk the primary key under a LIMIT
+ALLOWED_SCANS = {
+    ('admin users', 'users'): 'keyset page, primary key order with a LIMIT',
+    ('red flags', 'red_flags'): 'keyset page, primary key order with a LIMIT',
+    ('export users', 'users'): 'exports every row',
+    ('export enrollments', 'enrollments'): 'exports every row',
+    ('export enrollments', 'courses'): 'exports every row (joined course titles)',
+    ('applications', 'instructor_applications'): 'lists every application',
+}
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)')
+SQLITE_INDEXED = ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY KEY', 'VIRTUAL TABLE')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+EXPLAINED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+def scanned_tables(connection, statement, parameters, tables):
+    # returns (plan lines, tables read in full)
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        plan = [row[-1] for row in rows]
+        matches = [SQLITE_SCAN.match(line) for line in plan if not any(s in line for s in SQLITE_INDEXED)]
+        scans = {m.group(1) for m in matches if m}
+    else:
+        plan = [row[0] for row in connection.exec_driver_sql('EXPLAIN ' + statement, parameters)]
+        scans = {m.group(1) for line in plan for m in POSTGRES_SCAN.finditer(line)}
+    # aliased tables show up as courses_1 and so on
+    return plan, {re.sub(r'_\d+$', '', name) for name in scans} & tables
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', help='comma-separated case names')
+    parser.add_argument('--requests', type=int, default=2, help='requests per case')
+    parser.add_argument('--analyze', action='store_true', help='ANALYZE the tables first')
+    parser.add_argument('--verbose', action='store_true', help='print every plan, not just the failures')
+    args = parser.parse_args()
+
+    fresh = not os.environ.get('DATABASE_URL')
+    use_temp_database()
+    from sqlalchemy import event
+    from app import app
+    from models import db
+
+    if fresh:
+        import seed
+        from benchmarks.dataset import SCALES, generate
+        seed.seed()
+        with app.app_context():
+            generate(SCALES['small'])
+
+    with app.app_context():
+        if args.analyze:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ANALYZE')
+        engine = db.engine
+    tables = set(db.metadata.tables)
+    context = Context(app)
+
+    cases = CASES
+    if args.only:
+        wanted = {name.strip() for name in args.only.split(',')}
+        cases = [case for case in CASES if case.name in wanted]
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip()[:6].upper().startswith(EXPLAINED):
+            captured.append((statement, parameters))
+
+    counter = {'n': 0}
+    failures = []
+    for case in cases:
+        captured.clear()
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            run_case(app, context, case, args.requests, counter, cold=True)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+        seen = set()
+        with engine.connect() as connection:
+            for statement, parameters in captured:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                plan, scans = scanned_tables(connection, statement, parameters, tables)
+                bad = {t for t in scans if (case.name, t) not in ALLOWED_SCANS}
+                if bad:
+                    failures.append((case.name, sorted(bad), statement, plan))
+                if args.verbose or bad:
+                    print(f'[{case.name}] {"SCAN " + ", ".join(sorted(bad)) if bad else "ok"}')
+                    print('  ' + ' '.join(statement.split())[:300])
+                    for line in plan:
+                        print('    ' + line)
+        print(f'{case.name:<24} {len(seen):>3} statements  '
+              f'{"FAIL" if any(f[0] == case.name for f in failures) else "ok"}')
+
+    if failures:
+        print(f'\n{len(failures)} statement(s) read a whole table:')
+        for name, bad, statement, _ in failures:
+            print(f'  {name}: {", ".join(bad)}: {" ".join(statement.split())[:160]}')
+        sys.exit(1)
+    print('\nno table scans outside ALLOWED_SCANS')
+
+
+if __name__ == '__main__':
+    main()
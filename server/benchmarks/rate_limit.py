@@ -0,0 +1,117 @@
+import argparse
+import itertools
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import use_temp_database, summarize, percentile
+
+# What the rate limiter costs and what it does.
+#   python -m benchmarks.rate_limit --requests 2000
+#   python -m benchmarks.rate_limit --redis-url redis://localhost:6379/0
+# - overhead: the same cached course detail request with the limiter off and
+#   on, anonymous (IP bucket) and signed in (user bucket, token decoded)
+# - take: one bucket update on its own, per backend
+# - login burst: one IP posting logins back to back, how many get a 429
+# - concurrency: more threads than RATE_LIMIT_MAX_CONCURRENT, how many get a 503
+
+
+def timed(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--redis-url', default=None, help='also time the redis backend')
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--max-concurrent', type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ['RATE_LIMIT_ENABLED'] = '1'
+    os.environ['RATE_LIMIT_BURST'] = str(10 ** 9)  # the overhead runs must never be throttled
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    use_temp_database()
+    from app import app
+    from auth import create_token
+    from models import db, User, Course
+    from rate_limit import rate_limiter, MemoryBuckets, RedisBuckets
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', role='student')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        course = Course(title='Rate limits', description='Limiter benchmark', price=0, level='beginner',
+                        category='Benchmark', instructor_id=user.id)
+        db.session.add(course)
+        db.session.commit()
+        course_id = course.id
+        token = create_token(user)
+
+    client = app.test_client()
+    url = f'/api/courses/{course_id}'
+    signed_in = {'Authorization': f'Bearer {token}'}
+    client.get(url)  # warm the response cache
+
+    overhead = {}
+    for label, headers in (('anonymous', {}), ('signed_in', signed_in)):
+        for enabled in (False, True):
+            rate_limiter.enabled = enabled
+            samples = timed(lambda: client.get(url, headers=headers), args.requests)
+            overhead[f'{label} {"on" if enabled else "off"}'] = summarize(samples)
+        on, off = overhead[f'{label} on'], overhead[f'{label} off']
+        overhead[f'{label} added_p50_us'] = round((on['p50_ms'] - off['p50_ms']) * 1000)
+
+    backends = {'memory': MemoryBuckets(5, 100)}
+    if args.redis_url:
+        backends['redis'] = RedisBuckets(args.redis_url, 5, 100)
+    take = {}
+    for name, buckets in backends.items():
+        keys = itertools.cycle([f'bench:{i}' for i in range(1000)])
+        samples = timed(lambda: buckets.take(next(keys), 1), args.requests)
+        take[name] = {'p50_us': round(percentile(samples, 50) * 1e6, 2), 'p99_us': round(percentile(samples, 99) * 1e6, 2)}
+        buckets.clear()
+
+    # realistic limits from here on
+    rate_limiter.buckets = MemoryBuckets(app.config['RATE_LIMIT_RATE'], 100)
+    logins = Counter()
+    retry_after = set()
+    for _ in range(args.logins):
+        response = client.post('/api/auth/login', json={'email': 'bench@example.com', 'password': 'password123'})
+        logins[response.status_code] += 1
+        if response.status_code == 429:
+            retry_after.add(response.headers['Retry-After'])
+
+    rate_limiter.buckets = MemoryBuckets(10 ** 6, 10 ** 9)
+    rate_limiter._in_flight = threading.BoundedSemaphore(args.max_concurrent)
+
+    def search(i):
+        response = app.test_client().get(f'/api/courses?search=limits{i % 3}',
+                                         environ_base={'REMOTE_ADDR': f'10.0.0.{i % 250}'})
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        concurrency = Counter(pool.map(search, range(args.threads * 20)))
+
+    report = {
+        'overhead': overhead,
+        'take': take,
+        'login_burst': {'responses': dict(logins), 'retry_after': sorted(retry_after)},
+        'concurrency': {'max_concurrent': args.max_concurrent, 'threads': args.threads,
+                        'responses': dict(concurrency)},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
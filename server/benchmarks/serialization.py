@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import time
+from benchmarks.common import use_temp_database, percentile
+
+# Serialization CPU and bytes on the wire for the big JSON responses.
+#   python -m benchmarks.serialization --runs 200
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.serialization --courses 50
+# - serialize: the same payload through the stdlib and the orjson providers
+# - compress: size and time per content encoding, at the live level and at
+#   the level cached entries are stored with
+# - http: bytes and latency through the app, with and without Accept-Encoding
+# Payloads are a catalog page with each course's module outline (what
+# /api/courses?include=modules returns) and every lesson of one course with
+# its text.
+
+
+def timed_us(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {'p50_us': round(percentile(samples, 50) * 1e6, 1), 'p99_us': round(percentile(samples, 99) * 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--courses', type=int, default=20, help='courses in the catalog page')
+    args = parser.parse_args()
+
+    fresh = not os.environ.get('DATABASE_URL')
+    use_temp_database()
+    from app import app
+    from compression import compression
+    from json_provider import FastJSONProvider
+    import serializers
+    from models import db, Course, Module
+
+    if fresh:
+        import seed
+        from benchmarks.dataset import SCALES, generate
+        seed.seed()
+        with app.app_context():
+            generate(SCALES['small'])
+
+    with app.app_context():
+        courses = Course.query.filter_by(is_published=True).order_by(Course.created_at, Course.id).limit(args.courses).all()
+        fields, includes = serializers.courses.select(include='modules')
+        catalog = {'courses': serializers.courses.dump_all(courses, fields, includes), 'next_cursor': None}
+        biggest = db.session.query(Module.course_id).group_by(Module.course_id).order_by(
+            db.func.sum(db.func.length(Module.content)).desc()).first()[0]
+        lessons = [m.to_dict() for m in Module.query.filter_by(course_id=biggest).order_by(Module.order)]
+        course_id = courses[0].id
+
+    providers = {'stdlib': FastJSONProvider(app, 'stdlib'), 'orjson': FastJSONProvider(app, 'orjson')}
+    if providers['orjson'].orjson is None:
+        del providers['orjson']
+
+    report = {'serialize': {}, 'compress': {}, 'http': {}}
+    for label, payload in (('catalog_with_modules', catalog), ('course_lessons', lessons)):
+        report['serialize'][label] = {name: timed_us(lambda: p.dumps_bytes(payload), args.runs)
+                                      for name, p in providers.items()}
+        body = app.json.dumps_bytes(payload)
+        sizes = {'identity': {'bytes': len(body)}}
+        for encoding in compression.encodings:
+            for best in (False, True):
+                compressed = compression.compress(body, encoding, best=best)
+                sizes[f'{encoding}{" (cached)" if best else ""}'] = dict(
+                    bytes=len(compressed), ratio=round(len(body) / len(compressed), 1),
+                    **timed_us(lambda: compression.compress(body, encoding, best=best), max(1, args.runs // 10)))
+        report['compress'][label] = sizes
+
+    client = app.test_client()
+    urls = {'catalog': f'/api/courses?limit={args.courses}&include=modules', 'course_detail': f'/api/courses/{course_id}'}
+    for label, url in urls.items():
+        client.get(url)  # fill the response cache
+        for encoding in ('identity',) + compression.encodings:
+            headers = {'Accept-Encoding': encoding}
+            response = client.get(url, headers=headers)
+            timing = timed_us(lambda: client.get(url, headers=headers), args.runs)
+            report['http'][f'{label} {encoding}'] = dict(
+                bytes=len(response.data), content_encoding=response.headers.get('Content-Encoding'), **timing)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import gzip
+from flask import request
+
+# Response compression, negotiated by Accept-Encoding: brotli when the
+# brotli package is installed and the client takes it, else gzip. Bodies
+# under COMPRESS_MIN_SIZE bytes aren't worth it and are sent as they are,
+# and so are streamed responses (exports).
+#
+# Cached responses (see cached_json in app.py) are compressed once, when the
+# entry is stored, at a higher level than live responses can afford; a hit
+# just picks the stored variant.
+
+COMPRESSIBLE = ('application/json', 'text/csv', 'text/plain', 'text/html')
+
+
+class Compression:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.min_size = 1024
+        self.level = 6
+        self.brotli_quality = 4
+        self.brotli = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        self.brotli = None
+        if app.config.get('COMPRESS_BROTLI', True):
+            try:
+                import brotli  # optional dependency, gzip only without it
+                self.brotli = brotli
+            except ImportError:
+                pass
+        if self.enabled:
+            app.after_request(self._compress_response)
+
+    @property
+    def encodings(self):
+        return ('br', 'gzip') if self.brotli is not None else ('gzip',)
+
+    def compress(self, body, encoding, best=False):
+        # best: once per cache entry rather than once per response, so spend more CPU on it
+        if encoding == 'br':
+            return self.brotli.compress(body, quality=9 if best else self.brotli_quality)
+        return gzip.compress(body, compresslevel=9 if best else self.level, mtime=0)
+
+    def precompress(self, body):
+        # every encoding we might serve, for a body about to be cached
+        if not self.enabled or len(body) < self.min_size:
+            return {}
+        return {encoding: self.compress(body, encoding, best=True) for encoding in self.encodings}
+
+    def negotiate(self):
+        return request.accept_encodings.best_match(self.encodings)
+
+    def _compress_response(self, response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or response.mimetype not in COMPRESSIBLE or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.content_length is not None and response.content_length < self.min_size:
+            return response
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        variants = getattr(response, 'precompressed', None) or {}
+        body = variants.get(encoding)
+        if body is None:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            body = self.compress(data, encoding)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # the compressed bytes are a different representation of the same resource
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compression = Compression()
@@ -1,10 +1,138 @@
 import os
 from datetime import timedelta
 
+
+def database_url():
+    url = os.environ.get('DATABASE_URL') or 'sqlite:///lms.db'
+    # Heroku-style URLs still say postgres://, which SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+# Engine profiles. DB_PROFILE=default leaves SQLAlchemy's defaults alone.
+# The tuned profile (the default) gives Postgres a sized, pre-pinged pool
+# with server-side timeouts. For SQLite it sets the connect-time pragmas
+# below, applied by engine_profiles.py: WAL so readers never block the
+# writer, a busy timeout so concurrent writers queue instead of failing
+# with "database is locked", and bigger page and mmap caches. Its pool is
+# larger than the default so request threads don't queue for a connection.
+def engine_options(url, profile):
+    if profile != 'tuned':
+        return {}
+    if url.startswith('postgresql'):
+        statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS') or 15000)
+        return {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 20),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT') or 10),  # seconds to wait for a connection
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 1800),
+            'pool_pre_ping': True,
+            'connect_args': {
+                'options': f'-c statement_timeout={statement_timeout} -c idle_in_transaction_session_timeout=60000'
+            },
+        }
+    if url.startswith('sqlite'):
+        if url in ('sqlite://', 'sqlite:///:memory:'):
+            return {}  # in-memory: one shared connection, nothing to size
+        return {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 30),
+            'connect_args': {'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000) / 1000},
+        }
+    return {}
+
+
+def sqlite_pragmas(profile):
+    if profile != 'tuned':
+        return {}
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # safe with WAL: a crash can lose the last commits, never corrupt
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024),
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_KB') or 64 * 1024),  # negative = KiB
+        'temp_store': 'MEMORY',
+    }
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///lms.db'
+    SQLALCHEMY_DATABASE_URI = database_url()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_PROFILE = os.environ.get('DB_PROFILE') or 'tuned'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI, DB_PROFILE)
+    SQLITE_PRAGMAS = sqlite_pragmas(DB_PROFILE)
+    # queue SQLite writers inside the process instead of letting them poll for the lock
+    SQLITE_SERIALIZE_WRITES = DB_PROFILE == 'tuned' and os.environ.get('SQLITE_SERIALIZE_WRITES', '1') != '0'
+    # on startup, refuse to run against a database that's behind the newest migration; migrating is a deploy
+    # step (`flask ensure-schema`). 1 migrates on the spot, only for a single process that starts alone
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '0') == '1'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=7)
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID') or '547695762624-llaksg97e6n0gbutf03judckpppi3rho.apps.googleusercontent.com'
+    # where Google's ID token signing certs are fetched from (point at a local stand-in for offline testing)
+    GOOGLE_CERTS_URL = os.environ.get('GOOGLE_CERTS_URL') or 'https://www.googleapis.com/oauth2/v1/certs'
+    # response cache for catalog/course detail: 'memory' (per process LRU) or 'redis' (shared)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+    CACHE_TTL = int(os.environ.get('CACHE_TTL') or 300)  # seconds
+    # how long browsers may reuse a lesson body before revalidating
+    MODULE_CACHE_MAX_AGE = int(os.environ.get('MODULE_CACHE_MAX_AGE') or 300)
+    # role/username of recently seen users, so auth checks skip the users table
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE') or 10000)
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL') or 60)  # seconds
+    # bcrypt cost factor; hashes made with a different cost are redone on next login
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS') or 12)
+    # bcrypt process pool (0 = hash inline) and how many hashes may queue before we answer 503
+    HASH_WORKERS = int(os.environ.get('HASH_WORKERS') or 2)
+    HASH_MAX_PENDING = int(os.environ.get('HASH_MAX_PENDING') or 32)
+    # challenge grading sandboxes (see grading.py): pool size, how many submissions may queue before we
+    # answer 503, and the limits each submission runs under
+    GRADER_WORKERS = int(os.environ.get('GRADER_WORKERS') or 2)
+    GRADER_MAX_PENDING = int(os.environ.get('GRADER_MAX_PENDING') or 16)
+    GRADER_CPU_SECONDS = int(os.environ.get('GRADER_CPU_SECONDS') or 2)
+    GRADER_MEMORY_MB = int(os.environ.get('GRADER_MEMORY_MB') or 256)
+    GRADER_WALL_SECONDS = int(os.environ.get('GRADER_WALL_SECONDS') or 5)
+    GRADER_MAX_CODE_LENGTH = int(os.environ.get('GRADER_MAX_CODE_LENGTH') or 64 * 1024)
+    GRADER_CACHE_SIZE = int(os.environ.get('GRADER_CACHE_SIZE') or 2048)
+    # account submissions run as, in an empty chroot (needs the server to run as root); empty keeps the server's
+    # user and filesystem, for development only
+    GRADER_USER = os.environ.get('GRADER_USER', 'nobody')
+    # last_accessed heartbeats are buffered and written in batches
+    HEARTBEAT_BATCH_SIZE = int(os.environ.get('HEARTBEAT_BATCH_SIZE') or 100)
+    HEARTBEAT_FLUSH_INTERVAL = int(os.environ.get('HEARTBEAT_FLUSH_INTERVAL') or 30)  # seconds, 0 writes through
+    # rows fetched per round trip by the admin export endpoints
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE') or 1000)
+    # courses per transaction for bulk imports (flask import-courses, POST /api/admin/import)
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 500)
+    # course ids per POST /api/enrollments/status
+    ENROLLMENT_STATUS_MAX_IDS = int(os.environ.get('ENROLLMENT_STATUS_MAX_IDS') or 100)
+    # token buckets per user (or IP when signed out), see rate_limit.py for the per-route costs
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND') or 'memory'  # or 'redis', shared by all workers
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL') or CACHE_REDIS_URL
+    RATE_LIMIT_RATE = float(os.environ.get('RATE_LIMIT_RATE') or 5)  # tokens per second
+    RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST') or 100)
+    # requests in flight per process before we answer 503 (0 = no cap)
+    RATE_LIMIT_MAX_CONCURRENT = int(os.environ.get('RATE_LIMIT_MAX_CONCURRENT') or 64)
+    # proxies in front of the app that append to X-Forwarded-For (Heroku/Vercel: 1)
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES') or 0)
+    # app.json: 'orjson' (falls back to the stdlib if it isn't installed) or 'stdlib'
+    JSON_BACKEND = os.environ.get('JSON_BACKEND') or 'orjson'
+    # gzip/brotli by Accept-Encoding for bodies of at least COMPRESS_MIN_SIZE bytes, see compression.py
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') != '0'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)  # gzip, 1-9
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY') or 4)  # 0-11
+    COMPRESS_BROTLI = os.environ.get('COMPRESS_BROTLI', '1') != '0'  # use brotli if it's installed
+    # request metrics on /metrics; SQL is counted for a sampled share of requests
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+    METRICS_SQL_SAMPLE_RATE = float(os.environ.get('METRICS_SQL_SAMPLE_RATE') or 1.0)
+    METRICS_SLOW_QUERY_MS = int(os.environ.get('METRICS_SLOW_QUERY_MS') or 200)
+    METRICS_EXPLAIN = os.environ.get('METRICS_EXPLAIN') == '1'  # log the plan of slow SELECTs
+    METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING') == '1'  # Server-Timing header, dev only
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # /metrics is served only if set, with "Authorization: Bearer <token>"
+    # ASGI server (asgi.py): threads for the endpoints without an async view, per worker process
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS') or 16)
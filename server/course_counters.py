@@ -0,0 +1,110 @@
+from sqlalchemy import event
+from models import db, Course, Module, Enrollment, CatalogVersion
+
+# Keeps courses.student_count and courses.module_count in step with the
+# enrollments and modules tables. Every ORM insert/delete of an enrollment or
+# module (including cascades from deleting a course or user) issues an
+# atomic "count = count +/- 1" UPDATE inside the same flush, so the counter
+# commits or rolls back together with the row it counts.
+#
+# The same way, every course or module insert/update/delete bumps the one
+# catalog_version row, which cached catalog pages are checked against.
+# Enrollments don't: student counts on cached pages may lag by up to
+# CACHE_TTL rather than every enrollment writing that one row.
+#
+# Bulk inserts that bypass the ORM unit of work must set the counters and
+# call catalog_changed themselves; `flask reconcile-counters` finds and
+# repairs any drift.
+
+courses = Course.__table__
+catalog_version = CatalogVersion.__table__
+
+
+def _bump(connection, course_id, column, delta):
+    connection.execute(
+        # updated_at is the course's content version (cache key, Last-Modified), a count changing isn't an edit
+        db.update(courses).where(courses.c.id == course_id).values(
+            {column: courses.c[column] + delta, 'updated_at': courses.c.updated_at}
+        )
+    )
+
+
+def catalog_changed(connection):
+    result = connection.execute(
+        db.update(catalog_version).where(catalog_version.c.id == 1).values(generation=catalog_version.c.generation + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(db.insert(catalog_version).values(id=1, generation=1))
+
+
+def catalog_version_query():
+    return db.select(catalog_version.c.generation).where(catalog_version.c.id == 1)
+
+
+@event.listens_for(Course, 'after_insert')
+@event.listens_for(Course, 'after_update')
+@event.listens_for(Course, 'after_delete')
+@event.listens_for(Module, 'after_update')
+def _catalog_row_changed(mapper, connection, target):
+    catalog_changed(connection)
+
+
+@event.listens_for(Enrollment, 'after_insert')
+def _enrollment_added(mapper, connection, target):
+    _bump(connection, target.course_id, 'student_count', 1)
+
+
+@event.listens_for(Enrollment, 'after_delete')
+def _enrollment_removed(mapper, connection, target):
+    _bump(connection, target.course_id, 'student_count', -1)
+
+
+@event.listens_for(Module, 'after_insert')
+def _module_added(mapper, connection, target):
+    _bump(connection, target.course_id, 'module_count', 1)
+    catalog_changed(connection)
+
+
+@event.listens_for(Module, 'after_delete')
+def _module_removed(mapper, connection, target):
+    _bump(connection, target.course_id, 'module_count', -1)
+    catalog_changed(connection)
+
+
+def _actual_counts():
+    students = db.select(db.func.count(Enrollment.id)).where(Enrollment.course_id == Course.id).scalar_subquery()
+    modules = db.select(db.func.count(Module.id)).where(Module.course_id == Course.id).scalar_subquery()
+    return students, modules
+
+
+def find_drift():
+    # (course_id, stored students, actual students, stored modules, actual modules) for every mismatch
+    students, modules = _actual_counts()
+    return db.session.query(
+        Course.id, Course.student_count, students, Course.module_count, modules
+    ).filter(db.or_(Course.student_count != students, Course.module_count != modules)).all()
+
+
+def reconcile():
+    # recount only the drifted rows; returns the drift that was repaired
+    drift = find_drift()
+    if drift:
+        students, modules = _actual_counts()
+        db.session.execute(
+            db.update(Course).where(Course.id.in_([row[0] for row in drift])).values(
+                student_count=students, module_count=modules, updated_at=Course.updated_at
+            ).execution_options(synchronize_session=False)
+        )
+        catalog_changed(db.session.connection())
+        db.session.commit()
+    return drift
+
+
+def init_app(app):
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters():
+        """Find and repair drift in courses.student_count / module_count."""
+        drift = reconcile()
+        for course_id, stored_students, students, stored_modules, modules in drift:
+            print(f'course {course_id}: students {stored_students} -> {students}, modules {stored_modules} -> {modules}')
+        print(f'{len(drift)} course(s) repaired')
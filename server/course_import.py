@@ -0,0 +1,272 @@
+import json
+import time
+from collections import Counter
+import click
+import course_counters
+import course_search
+import dashboard_stats
+from grading import RUNNERS
+from models import db, User, Course, Module
+from response_cache import cache
+
+# Bulk course import. A bundle is NDJSON, one course per line with its modules
+# nested:
+#
+#   {"title": ..., "description": ..., "price": 0, "level": "beginner",
+#    "category": "Web", "instructor": "john_dev", "modules": [{"title": ...,
+#    "content": ..., "order": 1}, ...]}
+#
+# (a JSON array of the same objects also works, but has to be read into
+# memory first). The bundle is read twice: a validation pass that holds only
+# one record at a time, then an insert pass that writes batch_size courses
+# per transaction with executemany inserts. Each batch commits on its own, so
+# a failed import can be resumed from the returned next_start.
+#
+# Inserts bypass the ORM events, so the course counters, the search index
+# and the instructors' dashboard stats are maintained here.
+
+LEVELS = ('beginner', 'intermediate', 'advanced')
+MODULE_TYPES = ('lesson', 'challenge', 'project')
+MAX_ERRORS = 50
+
+
+class BundleError(ValueError):
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} problem(s) in bundle')
+        self.errors = errors
+
+
+class ImportFailed(Exception):
+    def __init__(self, message, next_start):
+        super().__init__(message)
+        self.next_start = next_start
+
+
+def read_records(stream):
+    # yields (line number, record) from a text stream
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        if line.lstrip().startswith('['):
+            # a JSON array can't be read a line at a time, take it in one go
+            try:
+                records = json.loads(line + stream.read())
+            except ValueError as e:
+                raise BundleError([{'line': number, 'error': f'invalid JSON ({e})'}])
+            yield from enumerate(records, start=1)
+            return
+        yield number, _parse(line)
+
+
+def _parse(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return {'_invalid': f'invalid JSON ({e})'}
+
+
+def _check(record, instructors):
+    # returns (course row, module rows, errors)
+    if not isinstance(record, dict):
+        return None, None, ['record must be an object']
+    if '_invalid' in record:
+        return None, None, [record['_invalid']]
+
+    errors = []
+    for field, size in (('title', 200), ('description', None), ('category', 50)):
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors.append(f'{field} is required')
+        elif size and len(value) > size:
+            errors.append(f'{field} is longer than {size} characters')
+    if record.get('level') not in LEVELS:
+        errors.append(f'level must be one of {", ".join(LEVELS)}')
+    try:
+        price = float(record.get('price', 0))
+        duration = int(record.get('duration', 0))
+        if price < 0 or duration < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        errors.append('price and duration must be non-negative numbers')
+        price = duration = 0
+
+    # a JSON boolean only: bool("false") would publish a draft
+    is_published = record.get('is_published', True)
+    if not isinstance(is_published, bool):
+        errors.append('is_published must be true or false')
+
+    key = record.get('instructor', record.get('instructor_id'))
+    instructor_id = instructors.get(key) if isinstance(key, (str, int)) else None
+    if instructor_id is None:
+        errors.append('instructor must name an existing instructor (username or instructor_id)')
+
+    modules = record.get('modules', [])
+    if not isinstance(modules, list):
+        errors.append('modules must be a list')
+        modules = []
+
+    module_rows = []
+    for position, module in enumerate(modules, start=1):
+        prefix = f'modules[{position - 1}]'
+        if not isinstance(module, dict):
+            errors.append(f'{prefix} must be an object')
+            continue
+        for field in ('title', 'content'):
+            if not isinstance(module.get(field), str) or not module[field].strip():
+                errors.append(f'{prefix}.{field} is required')
+        module_type = module.get('module_type', 'lesson')
+        if module_type not in MODULE_TYPES:
+            errors.append(f'{prefix}.module_type must be one of {", ".join(MODULE_TYPES)}')
+        if module.get('challenge_runner') not in (None,) + RUNNERS:
+            errors.append(f'{prefix}.challenge_runner must be one of {", ".join(RUNNERS)}')
+        try:
+            order = int(module.get('order', position))
+            module_duration = int(module.get('duration', 0))
+        except (TypeError, ValueError):
+            errors.append(f'{prefix}.order and duration must be integers')
+            continue
+        module_rows.append({
+            'title': module.get('title'),
+            'content': module.get('content'),
+            'video_url': module.get('video_url'),
+            'duration': module_duration,
+            'order': order,
+            'module_type': module_type,
+            'challenge_code': module.get('challenge_code'),
+            'challenge_tests': module.get('challenge_tests'),
+            'challenge_solution': module.get('challenge_solution'),
+            'challenge_runner': module.get('challenge_runner'),
+        })
+
+    if errors:
+        return None, None, errors
+
+    course_row = {
+        'title': record['title'],
+        'description': record['description'],
+        'price': price,
+        'level': record['level'],
+        'category': record['category'],
+        'duration': duration,
+        'instructor_id': instructor_id,
+        'is_published': is_published,
+        'student_count': 0,
+        'module_count': len(module_rows),
+    }
+    if record.get('thumbnail'):
+        course_row['thumbnail'] = record['thumbnail']
+    return course_row, module_rows, []
+
+
+def load_instructors():
+    # username -> id and id -> id, so records can name their instructor either way
+    instructors = {}
+    for username, user_id in db.session.query(User.username, User.id).filter(User.role == 'instructor'):
+        instructors[username] = instructors[user_id] = user_id
+    return instructors
+
+
+def validate(stream, instructors):
+    # streaming pass; raises BundleError listing the first MAX_ERRORS problems
+    errors = []
+    count = 0
+    try:
+        for number, record in read_records(stream):
+            count += 1
+            for problem in _check(record, instructors)[2]:
+                errors.append({'line': number, 'error': problem})
+            if len(errors) >= MAX_ERRORS:
+                break
+    except UnicodeDecodeError:
+        errors.append({'line': count + 1, 'error': 'bundle must be UTF-8'})
+    if errors:
+        raise BundleError(errors[:MAX_ERRORS])
+    return count
+
+
+def _insert_batch(connection, batch):
+    courses = Course.__table__
+    modules = Module.__table__
+    course_ids = connection.execute(
+        courses.insert().returning(courses.c.id, sort_by_parameter_order=True),
+        [course_row for course_row, _ in batch]
+    ).scalars().all()
+
+    module_rows = [dict(row, course_id=course_id)
+                   for course_id, (_, rows) in zip(course_ids, batch) for row in rows]
+    if module_rows:
+        connection.execute(modules.insert(), module_rows)
+
+    course_search.reindex(connection, course_ids)
+    course_counters.catalog_changed(connection)
+    dashboard_stats.courses_added(connection, Counter(course_row['instructor_id'] for course_row, _ in batch))
+    return len(module_rows)
+
+
+def import_bundle(stream, instructors, batch_size=500, start=0, progress=None):
+    # insert pass over a validated bundle, skipping the first `start` records.
+    # progress(stats) is called after every committed batch.
+    stats = {'courses': 0, 'modules': 0, 'batches': 0, 'next_start': start}
+    began = time.perf_counter()
+
+    def commit(batch):
+        try:
+            with db.engine.begin() as connection:
+                stats['modules'] += _insert_batch(connection, batch)
+        except Exception as e:
+            raise ImportFailed(f'batch starting at record {stats["next_start"]} failed: {e}', stats['next_start'])
+        stats['courses'] += len(batch)
+        stats['batches'] += 1
+        stats['next_start'] += len(batch)
+        elapsed = time.perf_counter() - began
+        stats['seconds'] = round(elapsed, 2)
+        stats['rows_per_second'] = round((stats['courses'] + stats['modules']) / elapsed) if elapsed else 0
+        if progress:
+            progress(stats)
+
+    batch = []
+    try:
+        for index, (_, record) in enumerate(read_records(stream)):
+            if index < start:
+                continue
+            course_row, module_rows, _ = _check(record, instructors)
+            batch.append((course_row, module_rows))
+            if len(batch) >= batch_size:
+                commit(batch)
+                batch = []
+        if batch:
+            commit(batch)
+    finally:
+        if stats['courses']:
+            cache.invalidate_catalog()
+
+    stats.setdefault('seconds', round(time.perf_counter() - began, 2))
+    stats.setdefault('rows_per_second', 0)
+    return stats
+
+
+def init_app(app):
+    @app.cli.command('import-courses')
+    @click.argument('bundle', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--batch-size', type=int, default=None, help='Courses per transaction.')
+    @click.option('--start', type=int, default=0, help='Skip this many records (resume a failed import).')
+    def import_courses(bundle, batch_size, start):
+        """Import courses and modules from a JSON/NDJSON bundle."""
+        instructors = load_instructors()
+        with open(bundle, encoding='utf-8') as f:
+            try:
+                count = validate(f, instructors)
+            except BundleError as e:
+                for problem in e.errors:
+                    print(f'line {problem["line"]}: {problem["error"]}')
+                raise click.ClickException(str(e))
+            print(f'{count} course(s) validated')
+
+            f.seek(0)
+            report = lambda s: print(f'{s["next_start"]}/{count} courses, {s["modules"]} modules, {s["rows_per_second"]} rows/s')
+            try:
+                stats = import_bundle(f, instructors, batch_size or app.config['IMPORT_BATCH_SIZE'], start, report)
+            except ImportFailed as e:
+                raise click.ClickException(f'{e}\nresume with --start {e.next_start}')
+        print(f'Imported {stats["courses"]} courses and {stats["modules"]} modules in {stats["seconds"]}s '
+              f'({stats["rows_per_second"]} rows/s)')
@@ -0,0 +1,251 @@
+import html
+import re
+from sqlalchemy import event, text, bindparam
+from models import db, Course, Module
+
+# Full-text index over courses: title, description, category and module titles.
+# SQLite uses an FTS5 virtual table (rowid = course id), Postgres a tsvector
+# table with a GIN index. Rows are kept in sync from the session flush, so
+# every create/update/delete of a course or module reindexes that course in
+# the same transaction.
+#
+# A search ranks and pages inside the index query, then builds snippets for
+# the page's rows only.
+
+SNIPPET_START = '<mark>'
+SNIPPET_END = '</mark>'
+# the database marks matches with these, they become SNIPPET_START/END once the text is escaped
+_MARK_START = '\ue000'
+_MARK_END = '\ue001'
+
+# engine -> whether the index table exists, so writes never fail on a db
+# that was created before the index existed
+_ready = {}
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS course_search
+USING fts5(title, description, category, module_titles, tokenize='porter unicode61')
+"""
+
+SQLITE_INDEX = """
+INSERT INTO course_search (rowid, title, description, category, module_titles)
+SELECT c.id, c.title, c.description, c.category,
+       COALESCE((SELECT group_concat(m.title, ' ') FROM modules m WHERE m.course_id = c.id), '')
+FROM courses c WHERE c.id IN :ids
+"""
+
+# column weights: title, description, category, module titles
+SQLITE_RANK = 'bm25(course_search, 10.0, 1.0, 4.0, 2.0)'
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE IF NOT EXISTS course_search (
+        course_id INTEGER PRIMARY KEY REFERENCES courses(id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_course_search_document ON course_search USING GIN (document)",
+]
+
+POSTGRES_INDEX = """
+INSERT INTO course_search (course_id, document)
+SELECT c.id,
+       setweight(to_tsvector('english', coalesce(c.title, '')), 'A') ||
+       setweight(to_tsvector('english', coalesce(c.category, '')), 'B') ||
+       setweight(to_tsvector('english', coalesce(
+           (SELECT string_agg(m.title, ' ') FROM modules m WHERE m.course_id = c.id), '')), 'B') ||
+       setweight(to_tsvector('english', coalesce(c.description, '')), 'C')
+FROM courses c WHERE c.id IN :ids
+ON CONFLICT (course_id) DO UPDATE SET document = EXCLUDED.document
+"""
+
+
+def is_supported(dialect_name):
+    return dialect_name in ('sqlite', 'postgresql')
+
+
+def _tokens(term):
+    return re.findall(r'\w+', term.lower())
+
+
+def _table_exists(connection):
+    key = connection.engine
+    if key not in _ready:
+        _ready[key] = db.inspect(connection).has_table('course_search')
+    return _ready[key]
+
+
+def create_index(connection, rebuild=False):
+    dialect = connection.dialect.name
+    if not is_supported(dialect):
+        return
+    if rebuild:
+        connection.execute(text('DROP TABLE IF EXISTS course_search'))
+    elif db.inspect(connection).has_table('course_search'):
+        _ready[connection.engine] = True
+        return
+
+    if dialect == 'sqlite':
+        connection.execute(text(SQLITE_CREATE))
+    else:
+        for statement in POSTGRES_CREATE:
+            connection.execute(text(statement))
+    _ready[connection.engine] = True
+
+    # new index: backfill anything that is already in the courses table
+    ids = [row[0] for row in connection.execute(text('SELECT id FROM courses'))]
+    reindex(connection, ids)
+
+
+def drop_index(connection):
+    if is_supported(connection.dialect.name):
+        connection.execute(text('DROP TABLE IF EXISTS course_search'))
+    _ready[connection.engine] = False
+
+
+def reindex(connection, course_ids, removed_ids=()):
+    if not is_supported(connection.dialect.name) or not _table_exists(connection):
+        return
+    ids = list(set(course_ids) | set(removed_ids))
+    if not ids:
+        return
+
+    if connection.dialect.name == 'sqlite':
+        delete = text('DELETE FROM course_search WHERE rowid IN :ids')
+        insert = text(SQLITE_INDEX)
+    else:
+        delete = text('DELETE FROM course_search WHERE course_id IN :ids')
+        insert = text(POSTGRES_INDEX)
+
+    connection.execute(delete.bindparams(bindparam('ids', expanding=True)), {'ids': ids})
+    course_ids = [i for i in course_ids if i not in removed_ids]
+    if course_ids:
+        connection.execute(insert.bindparams(bindparam('ids', expanding=True)), {'ids': course_ids})
+
+
+def _search_table():
+    return db.table('course_search', db.column('rowid'), db.column('course_id'), db.column('document'))
+
+
+def _sqlite_query(words):
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def _postgres_query(words):
+    return db.func.to_tsquery('english', ' & '.join(f'{w}:*' for w in words))
+
+
+def match_courses(term, dialect_name, course_ids, limit, offset):
+    # one page of matches among course_ids (a select of ids), best first: a
+    # subquery with course_id/rank, lower rank first. None if the term has
+    # nothing searchable in it.
+    words = _tokens(term)
+    if not words:
+        return None
+    search = _search_table()
+
+    if dialect_name == 'sqlite':
+        rank = db.literal_column(SQLITE_RANK)
+        query = db.select(search.c.rowid.label('course_id'), rank.label('rank')).where(
+            db.literal_column('course_search').op('MATCH')(_sqlite_query(words)),
+            # rowid + 0: as a plain rowid constraint FTS5 would run the MATCH once per id
+            (search.c.rowid + 0).in_(course_ids),
+        ).order_by(rank, search.c.rowid)
+    else:
+        tsquery = _postgres_query(words)
+        rank = -db.func.ts_rank(search.c.document, tsquery)
+        query = db.select(search.c.course_id, rank.label('rank')).where(
+            search.c.document.op('@@')(tsquery),
+            search.c.course_id.in_(course_ids),
+        ).order_by(rank, search.c.course_id)
+    return query.limit(limit).offset(offset).subquery('matches')
+
+
+def snippets(term, dialect_name, course_ids):
+    # {course id: escaped excerpt with SNIPPET_START/END around the matches}
+    words = _tokens(term)
+    if not words or not course_ids:
+        return {}
+
+    if dialect_name == 'sqlite':
+        search = _search_table()
+        query = db.select(
+            search.c.rowid,
+            db.func.snippet(db.literal_column('course_search'), -1, _MARK_START, _MARK_END, '...', 16)
+        ).where(
+            db.literal_column('course_search').op('MATCH')(_sqlite_query(words)),
+            (search.c.rowid + 0).in_(course_ids),
+        )
+    else:
+        query = db.select(Course.id, db.func.ts_headline(
+            'english', Course.description, _postgres_query(words),
+            f'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=24, MinWords=8'
+        )).where(Course.id.in_(course_ids))
+    return {course_id: _markup(snippet) for course_id, snippet in db.session.execute(query)}
+
+
+def _markup(snippet):
+    # the stored text is escaped, only our own markers become tags
+    if snippet is None:
+        return None
+    escaped = html.escape(snippet, quote=False)
+    return escaped.replace(_MARK_START, SNIPPET_START).replace(_MARK_END, SNIPPET_END)
+
+
+def _sync_after_flush(session, flush_context):
+    touched, removed = set(), set()
+
+    for obj in session.new:
+        if isinstance(obj, Course):
+            touched.add(obj.id)
+        elif isinstance(obj, Module):
+            touched.add(obj.course_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Course):
+            state = db.inspect(obj)
+            if any(state.attrs[key].history.has_changes() for key in ('title', 'description', 'category')):
+                touched.add(obj.id)
+        elif isinstance(obj, Module) and session.is_modified(obj):
+            touched.add(obj.course_id)
+            # module moved to another course: the old one needs reindexing too
+            old_course = db.inspect(obj).attrs.course_id.history.deleted
+            touched.update(c for c in old_course if c is not None)
+
+    for obj in session.deleted:
+        if isinstance(obj, Course):
+            removed.add(obj.id)
+        elif isinstance(obj, Module):
+            touched.add(obj.course_id)
+
+    touched.discard(None)
+    if touched or removed:
+        reindex(session.connection(), touched - removed, removed)
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # the index lives outside the ORM metadata, keep autogenerate from dropping it
+    return not (type_ == 'table' and name.startswith('course_search'))
+
+
+def init_app(app):
+    if not event.contains(db.session, 'after_flush', _sync_after_flush):
+        event.listen(db.session, 'after_flush', _sync_after_flush)
+
+    @app.cli.command('reindex-search')
+    def reindex_search():
+        """Rebuild the course full-text index from scratch."""
+        with db.engine.begin() as connection:
+            create_index(connection, rebuild=True)
+        print('Search index rebuilt')
+
+
+# keep the index table alongside the ORM tables for create_all/drop_all
+@event.listens_for(db.metadata, 'after_create')
+def _after_create(target, connection, **kw):
+    create_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _before_drop(target, connection, **kw):
+    drop_index(connection)
@@ -0,0 +1,179 @@
+from datetime import datetime
+from sqlalchemy import event
+from models import db, User, Course, Enrollment, ModuleCompletion, UserStats, DailyStats
+
+# Keeps user_stats and daily_stats current so /api/stats is a primary-key
+# lookup instead of live COUNT(*) queries. Course and enrollment inserts and
+# deletes are caught with mapper events (like course_counters.py); progress
+# changes come from Enrollment.refresh_progress. Every change is an atomic
+# "add delta" upsert on the flush's own connection.
+#
+# `flask rebuild-stats` recomputes everything from the source tables.
+
+user_stats = UserStats.__table__
+daily_stats = DailyStats.__table__
+
+
+def _upsert_add(connection, table, key, deltas):
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(**key, **deltas)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={column: table.c[column] + statement.excluded[column] for column in deltas}
+        )
+        connection.execute(statement)
+        return
+
+    # no upsert: try the update, insert if nothing was there yet
+    where = db.and_(*(table.c[column] == value for column, value in key.items()))
+    result = connection.execute(
+        db.update(table).where(where).values({column: table.c[column] + delta for column, delta in deltas.items()})
+    )
+    if result.rowcount == 0:
+        connection.execute(db.insert(table).values(**key, **deltas))
+
+
+def _add(connection, user_id, role, **deltas):
+    if user_id is None:
+        return
+    _upsert_add(connection, user_stats, {'user_id': user_id, 'role': role}, deltas)
+
+
+def _add_daily(connection, user_id, role, **deltas):
+    if user_id is None:
+        return
+    day = datetime.utcnow().date()
+    _upsert_add(connection, daily_stats, {'user_id': user_id, 'role': role, 'day': day}, deltas)
+
+
+def _instructor_of(connection, course_id):
+    return connection.execute(db.select(Course.instructor_id).where(Course.id == course_id)).scalar()
+
+
+@event.listens_for(Course, 'after_insert')
+def _course_added(mapper, connection, target):
+    _add(connection, target.instructor_id, 'instructor', courses=1)
+
+
+@event.listens_for(Course, 'after_delete')
+def _course_removed(mapper, connection, target):
+    _add(connection, target.instructor_id, 'instructor', courses=-1)
+
+
+@event.listens_for(Enrollment, 'after_insert')
+def _enrollment_added(mapper, connection, target):
+    completed = 1 if target.completion_status == 'completed' else 0
+    progress = target.progress_percentage or 0
+    instructor_id = _instructor_of(connection, target.course_id)
+    for user_id, role in ((target.user_id, 'student'), (instructor_id, 'instructor')):
+        _add(connection, user_id, role, enrollments=1, completions=completed, progress_sum=progress)
+        _add_daily(connection, user_id, role, enrollments=1, completions=completed)
+
+
+# before_delete so the course row is still there to find the instructor
+@event.listens_for(Enrollment, 'before_delete')
+def _enrollment_removed(mapper, connection, target):
+    completed = 1 if target.completion_status == 'completed' else 0
+    progress = target.progress_percentage or 0
+    instructor_id = _instructor_of(connection, target.course_id)
+    for user_id, role in ((target.user_id, 'student'), (instructor_id, 'instructor')):
+        _add(connection, user_id, role, enrollments=-1, completions=-completed, progress_sum=-progress)
+
+
+@event.listens_for(User, 'before_delete')
+def _user_removed(mapper, connection, target):
+    connection.execute(db.delete(user_stats).where(user_stats.c.user_id == target.id))
+    connection.execute(db.delete(daily_stats).where(daily_stats.c.user_id == target.id))
+
+
+def courses_added(connection, counts):
+    # for bulk inserts that bypass the mapper events: {instructor_id: new courses}
+    for instructor_id, count in counts.items():
+        _add(connection, instructor_id, 'instructor', courses=count)
+
+
+def progress_changed(connection, enrollment_id, before):
+    # before is the (progress_percentage, completion_status) prior to the update
+    after = connection.execute(
+        db.select(Enrollment.progress_percentage, Enrollment.completion_status, Enrollment.user_id, Course.instructor_id)
+        .join(Course, Course.id == Enrollment.course_id)
+        .where(Enrollment.id == enrollment_id)
+    ).one()
+    progress_delta = (after[0] or 0) - (before[0] or 0)
+    completed_delta = (after[1] == 'completed') - (before[1] == 'completed')
+
+    for user_id, role in ((after[2], 'student'), (after[3], 'instructor')):
+        _add(connection, user_id, role, progress_sum=progress_delta, completions=completed_delta)
+        if completed_delta > 0:
+            _add_daily(connection, user_id, role, completions=completed_delta)
+
+
+def rebuild(connection):
+    # recompute both tables from courses/enrollments/module_completions
+    connection.execute(db.delete(user_stats))
+    connection.execute(db.delete(daily_stats))
+
+    completed = db.case((Enrollment.completion_status == 'completed', 1), else_=0)
+    per_student = db.select(
+        Enrollment.user_id, db.literal('student'), db.literal(0), db.func.count(),
+        db.func.sum(completed), db.func.coalesce(db.func.sum(Enrollment.progress_percentage), 0)
+    ).group_by(Enrollment.user_id)
+    connection.execute(db.insert(user_stats).from_select(
+        ['user_id', 'role', 'courses', 'enrollments', 'completions', 'progress_sum'], per_student
+    ))
+
+    enrollments_per_course = db.select(
+        Enrollment.course_id, db.func.count().label('enrollments'), db.func.sum(completed).label('completions'),
+        db.func.coalesce(db.func.sum(Enrollment.progress_percentage), 0).label('progress_sum')
+    ).group_by(Enrollment.course_id).subquery()
+    per_instructor = db.select(
+        Course.instructor_id, db.literal('instructor'), db.func.count(Course.id),
+        db.func.coalesce(db.func.sum(enrollments_per_course.c.enrollments), 0),
+        db.func.coalesce(db.func.sum(enrollments_per_course.c.completions), 0),
+        db.func.coalesce(db.func.sum(enrollments_per_course.c.progress_sum), 0)
+    ).outerjoin(enrollments_per_course, enrollments_per_course.c.course_id == Course.id).group_by(Course.instructor_id)
+    connection.execute(db.insert(user_stats).from_select(
+        ['user_id', 'role', 'courses', 'enrollments', 'completions', 'progress_sum'], per_instructor
+    ))
+
+    # daily history: enrollments by enrollment_date, completions by the last module finished
+    finished_at = db.select(db.func.max(ModuleCompletion.completed_at)).where(
+        ModuleCompletion.enrollment_id == Enrollment.id
+    ).scalar_subquery()
+    rows = connection.execute(db.select(
+        Enrollment.user_id, Course.instructor_id, Enrollment.enrollment_date, Enrollment.completion_status,
+        db.func.coalesce(finished_at, Enrollment.last_accessed)
+    ).join(Course, Course.id == Enrollment.course_id))
+
+    buckets = {}
+    for user_id, instructor_id, enrolled_at, status, finished in rows:
+        for key in ((user_id, 'student'), (instructor_id, 'instructor')):
+            if enrolled_at:
+                bucket = buckets.setdefault(key + (enrolled_at.date(),), [0, 0])
+                bucket[0] += 1
+            if status == 'completed' and finished:
+                bucket = buckets.setdefault(key + (finished.date(),), [0, 0])
+                bucket[1] += 1
+    if buckets:
+        connection.execute(db.insert(daily_stats), [
+            {'user_id': user_id, 'role': role, 'day': day, 'enrollments': enrollments, 'completions': completions}
+            for (user_id, role, day), (enrollments, completions) in buckets.items()
+        ])
+
+
+def init_app(app):
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats():
+        """Recompute user_stats and daily_stats from scratch."""
+        with db.engine.begin() as connection:
+            rebuild(connection)
+        print('Dashboard stats rebuilt')
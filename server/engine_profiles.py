@@ -0,0 +1,63 @@
+import threading
+from sqlalchemy import event
+from models import db
+
+# SQLite side of the engine profiles in config.py; the Postgres side is plain
+# engine options and needs nothing here.
+#
+# Every new SQLite connection gets Config.SQLITE_PRAGMAS. With
+# SQLITE_SERIALIZE_WRITES, write transactions inside this process also queue
+# on a lock: SQLite allows one writer at a time anyway, and a waiting writer
+# otherwise polls with sleeps of up to 100 ms, so under many concurrent
+# progress updates a few unlucky requests wait for seconds. The lock is taken
+# at the first write statement and released when the connection goes back to
+# the pool (right after commit/rollback). Other processes are still held
+# off by busy_timeout.
+
+READ_ONLY = ('SELECT', 'PRAGMA', 'EXPLAIN', 'WITH')
+
+
+class WriteQueue:
+    def __init__(self, timeout):
+        self.timeout = timeout
+        # a semaphore, not a lock: the pool may check a connection in from another thread
+        self._slot = threading.Semaphore(1)
+
+    def before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        info = conn.connection.info if conn.connection is not None else conn.info
+        if info.get('writing') or statement.lstrip()[:7].upper().startswith(READ_ONLY):
+            return
+        # on timeout carry on unqueued and leave it to SQLite's busy handler
+        info['writing'] = self._slot.acquire(timeout=self.timeout)
+
+    def checkin(self, dbapi_connection, connection_record):
+        if connection_record.info.pop('writing', False):
+            self._slot.release()
+
+
+def _apply_pragmas(pragmas, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def listen_pragmas(engine, pragmas):
+    event.listen(engine, 'connect', lambda conn, record: _apply_pragmas(pragmas, conn, record))
+
+
+def init_app(app):
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    if pragmas:
+        listen_pragmas(engine, pragmas)
+    if app.config.get('SQLITE_SERIALIZE_WRITES'):
+        queue = WriteQueue(pragmas.get('busy_timeout', 5000) / 1000)
+        event.listen(engine, 'before_cursor_execute', queue.before_execute)
+        event.listen(engine, 'checkin', queue.checkin)
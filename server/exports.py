@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from models import db, User, Course, Enrollment, RedFlag
+
+# Admin bulk exports. Each export is a plain column select (no ORM objects,
+# so nothing piles up in the session's identity map) read with yield_per,
+# which uses a server-side cursor where the driver supports one and fetches
+# EXPORT_CHUNK_SIZE rows at a time. Rows are encoded and yielded as they
+# come, so memory stays flat however large the table is.
+
+EXPORTS = {
+    'users': lambda: db.select(
+        User.id, User.username, User.email, User.role, User.first_name, User.last_name, User.created_at
+    ).order_by(User.id),
+    'enrollments': lambda: db.select(
+        Enrollment.id, Enrollment.user_id, Enrollment.course_id, Course.title.label('course_title'),
+        Enrollment.enrollment_date, Enrollment.progress_percentage, Enrollment.completed_modules,
+        Enrollment.completion_status, Enrollment.last_accessed
+    ).join(Course, Course.id == Enrollment.course_id).order_by(Enrollment.id),
+    'red-flags': lambda: db.select(
+        RedFlag.id, RedFlag.email, RedFlag.username, RedFlag.reason, RedFlag.flagged_at
+    ).order_by(RedFlag.id),
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _ndjson(columns, chunks):
+    for rows in chunks:
+        yield ''.join(json.dumps(dict(zip(columns, map(_value, row)))) + '\n' for row in rows)
+
+
+def _csv(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows([_value(v) for v in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # header only, for an empty table
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_export(kind, fmt, chunk_size=1000):
+    # generator of encoded text chunks; run it under stream_with_context
+    result = db.session.execute(EXPORTS[kind]().execution_options(yield_per=chunk_size))
+    columns = list(result.keys())
+    encode = _csv if fmt == 'csv' else _ndjson
+    try:
+        yield from encode(columns, result.partitions())
+    finally:
+        result.close()
@@ -0,0 +1,151 @@
+import re
+import threading
+import time
+
+# Verifies Google ID tokens locally. Google's signing certs are fetched over a
+# pooled requests.Session, cached for as long as their Cache-Control max-age
+# allows, and refreshed in the background shortly before they expire, so a
+# sign-in normally costs no network round trip at all.
+#
+# Under the ASGI server (asgi.py) the certs are fetched with httpx before the
+# sign-in is handed to the sync view, so waiting on Google never holds a
+# worker thread.
+#
+# requests, httpx and google.auth are imported on first use: together they are a
+# good share of the serverless cold start, and most requests never need them.
+
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+
+class GoogleUnavailable(Exception):
+    pass
+
+
+class GoogleTokenVerifier:
+    # refresh this many seconds before the certs expire
+    REFRESH_MARGIN = 300
+    # used when the cert response has no usable max-age
+    DEFAULT_MAX_AGE = 3600
+
+    def __init__(self, app=None):
+        self.client_id = None
+        self.certs_url = None
+        self.session = None
+        self._certs = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._async_client = None
+        self._async_lock = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.client_id = app.config['GOOGLE_CLIENT_ID']
+        self.certs_url = app.config.get('GOOGLE_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs')
+        self.timeout = app.config.get('GOOGLE_CERTS_TIMEOUT', 5)
+        self.session = None
+        self._certs = None
+        self._expires_at = 0
+
+    def _get_session(self):
+        if self.session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=2))
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=2))
+            self.session = session
+        return self.session
+
+    def _fetch_certs(self):
+        import requests
+        try:
+            response = self._get_session().get(self.certs_url, timeout=self.timeout)
+            response.raise_for_status()
+            certs = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise GoogleUnavailable(f'Could not fetch Google certs: {e}')
+
+        return self._store(certs, response.headers.get('Cache-Control', ''))
+
+    def _store(self, certs, cache_control):
+        match = re.search(r'max-age=(\d+)', cache_control)
+        max_age = int(match.group(1)) if match else self.DEFAULT_MAX_AGE
+        self._certs = certs
+        self._expires_at = time.monotonic() + max_age
+        return certs
+
+    def _refresh_in_background(self):
+        def refresh():
+            try:
+                with self._lock:
+                    self._fetch_certs()
+            except GoogleUnavailable:
+                pass  # keep serving the cached certs until they expire
+            finally:
+                self._refreshing = False
+
+        self._refreshing = True
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get_certs(self, force=False):
+        now = time.monotonic()
+        if not force and self._certs is not None and now < self._expires_at:
+            if now > self._expires_at - self.REFRESH_MARGIN and not self._refreshing:
+                self._refresh_in_background()
+            return self._certs
+
+        with self._lock:
+            # someone else may have refreshed while we waited for the lock
+            if not force and self._certs is not None and time.monotonic() < self._expires_at:
+                return self._certs
+            return self._fetch_certs()
+
+    async def get_certs_async(self):
+        # also refreshes inside the margin, so the sync get_certs() after it has nothing to fetch
+        if self._certs is not None and time.monotonic() < self._expires_at - self.REFRESH_MARGIN:
+            return self._certs
+        import asyncio
+        import httpx
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+            self._async_client = httpx.AsyncClient(timeout=self.timeout, transport=httpx.AsyncHTTPTransport(retries=2))
+        async with self._async_lock:
+            if self._certs is not None and time.monotonic() < self._expires_at - self.REFRESH_MARGIN:
+                return self._certs
+            try:
+                response = await self._async_client.get(self.certs_url)
+                response.raise_for_status()
+                certs = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                if self._certs is not None and time.monotonic() < self._expires_at:
+                    return self._certs  # still good for a while
+                raise GoogleUnavailable(f'Could not fetch Google certs: {e}')
+            return self._store(certs, response.headers.get('Cache-Control', ''))
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_lock = None
+
+    def verify(self, token):
+        # returns the token's claims, raises ValueError if it isn't valid for us
+        if not token:
+            raise ValueError('Missing token')
+        from google.auth import jwt as google_jwt
+        try:
+            idinfo = google_jwt.decode(token, certs=self.get_certs(), audience=self.client_id, clock_skew_in_seconds=10)
+        except ValueError as e:
+            # Google may have rotated keys since we cached them; try once with fresh certs
+            if 'Certificate for key id' not in str(e):
+                raise
+            idinfo = google_jwt.decode(token, certs=self.get_certs(force=True), audience=self.client_id, clock_skew_in_seconds=10)
+
+        if idinfo.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError('Wrong issuer')
+        return idinfo
+
+
+google_verifier = GoogleTokenVerifier()
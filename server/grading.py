@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import pwd
+import queue
+import select
+import subprocess
+import sys
+import tempfile
+import threading
+from response_cache import LRUBackend
+
+# Server-side grading for code challenges. Submissions run in a pool of
+# GRADER_WORKERS sandbox processes (sandbox_runner.py), all started together
+# on first use and restarted if one dies. Each submission gets
+# GRADER_CPU_SECONDS of CPU, GRADER_MEMORY_MB of memory and
+# GRADER_WALL_SECONDS in total. At most GRADER_MAX_PENDING submissions may be
+# queued or running per app process; past that we shed load with GradingBusy
+# (a 503), like password hashing does.
+#
+# A test is the body of a function of `code`, the submitted source:
+#   {"description": "adds", "test": "return add(2, 3)", "expected": 5}
+# Tests with an expected value run with the submission's globals and pass
+# if they return that value; the sandbox only reports what they returned,
+# the comparison happens here, so the submission never sees the expected
+# values and can't decide its own grade. Tests without one only read the
+# source ("return 'for ' in code") and pass if they return something truthy;
+# they run in a process of their own, away from the submission.
+#
+# The sandboxes run submissions as GRADER_USER (default nobody) in an empty
+# chroot, which needs the app to run as root; otherwise grading is
+# unavailable (GraderUnavailable, a 503). GRADER_USER= keeps the server's
+# user and filesystem, for development only.
+#
+# Results are cached by a hash of the runner, the tests and the code, so the
+# same answer to the same challenge is only run once per process. Timeouts
+# and crashes aren't cached, they may just mean the machine was busy.
+
+RUNNERS = ('python',)
+
+RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_runner.py')
+
+
+class GradingBusy(Exception):
+    pass
+
+
+class GraderUnavailable(Exception):
+    pass
+
+
+def grading_key(runner, tests, code):
+    raw = json.dumps([runner, tests, code], sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def score(tests, result):
+    # pass/fail for each test from the values the sandbox reported, and the submission's status
+    results = result['results']
+    for test, outcome in zip(tests, results):
+        value = outcome.pop('value', None)
+        if result['status'] != 'ran' or 'error' in outcome:
+            outcome['passed'] = False
+        elif 'expected' in test:
+            outcome['passed'] = value == test['expected']
+        else:
+            outcome['passed'] = value is True
+    if result['status'] != 'ran':
+        status = 'timeout' if result['status'] == 'timeout' else 'error'
+    elif result['error'] is not None:
+        status = 'error'
+    else:
+        status = 'passed' if results and all(r['passed'] for r in results) else 'failed'
+    return dict(result, status=status)
+
+
+class SandboxWorker:
+    def __init__(self, workdir, sandbox_args=()):
+        self.workdir = workdir
+        self.sandbox_args = list(sandbox_args)
+        self.process = None
+
+    def start(self):
+        # -I -S: no environment variables, user site or site-packages
+        self.process = subprocess.Popen(
+            [sys.executable, '-I', '-S', RUNNER_SCRIPT] + self.sandbox_args,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=self.workdir, env={}, start_new_session=True
+        )
+
+    def run(self, job, timeout):
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        try:
+            self.process.stdin.write(json.dumps(job).encode() + b'\n')
+            self.process.stdin.flush()
+            if not select.select([self.process.stdout], [], [], timeout)[0]:
+                raise TimeoutError()
+            line = self.process.stdout.readline()
+            if not line:
+                raise EOFError()
+            return json.loads(line)
+        except (OSError, EOFError, ValueError):  # TimeoutError is an OSError
+            self.stop()
+            return {'status': 'error', 'results': [], 'error': 'Grader unavailable, please retry', 'output': '',
+                    'duration_ms': None}
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+class Grader:
+    def __init__(self, app=None):
+        self.workers = 2
+        self.limits = {'cpu_seconds': 2, 'memory_mb': 256, 'wall_seconds': 5}
+        self.user = 'nobody'
+        self._pool = None
+        self._idle = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(16)
+        self._results = LRUBackend(max_entries=2048, ttl=3600)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.workers = app.config.get('GRADER_WORKERS', 2)
+        self.limits = {
+            'cpu_seconds': app.config.get('GRADER_CPU_SECONDS', 2),
+            'memory_mb': app.config.get('GRADER_MEMORY_MB', 256),
+            'wall_seconds': app.config.get('GRADER_WALL_SECONDS', 5),
+        }
+        self.user = app.config.get('GRADER_USER', 'nobody') or None
+        self._slots = threading.BoundedSemaphore(self.workers + app.config.get('GRADER_MAX_PENDING', 16))
+        self._results = LRUBackend(max_entries=app.config.get('GRADER_CACHE_SIZE', 2048), ttl=3600)
+
+    def _sandbox_args(self, root):
+        if self.user is None:
+            return []
+        if os.geteuid() != 0:
+            raise GraderUnavailable(f'the server must run as root to grade as {self.user} (GRADER_USER)')
+        try:
+            account = pwd.getpwnam(self.user)
+        except KeyError:
+            raise GraderUnavailable(f'no such user: {self.user} (GRADER_USER)')
+        return ['--user', f'{account.pw_uid}:{account.pw_gid}', '--root', root]
+
+    def _get_pool(self):
+        # started on first use, not at import, so a cold start doesn't pay for it
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # the workers' cwd and the children's chroot: empty, and only root may even list it
+                    workdir = tempfile.mkdtemp(prefix='lms-grader-')
+                    sandbox_args = self._sandbox_args(workdir)
+                    pool = [SandboxWorker(workdir, sandbox_args) for _ in range(self.workers)]
+                    self._idle = queue.Queue()
+                    for worker in pool:
+                        worker.start()
+                        self._idle.put(worker)
+                    self._pool = pool
+        return self._idle
+
+    def grade(self, runner, code, tests):
+        if runner not in RUNNERS:
+            raise ValueError(f'No grader for {runner}')
+        key = grading_key(runner, tests, code)
+        cached = self._results.get(key)
+        if cached is not None:
+            return dict(cached, cached=True, key=key)
+
+        if not self._slots.acquire(blocking=False):
+            raise GradingBusy()
+        try:
+            idle = self._get_pool()
+            worker = idle.get()
+            # the expected values stay here
+            job_tests = [{'description': t.get('description', ''), 'test': t.get('test'),
+                          'kind': 'value' if 'expected' in t else 'source'} for t in tests]
+            try:
+                result = worker.run({'code': code, 'tests': job_tests, 'limits': self.limits},
+                                    timeout=self.limits['wall_seconds'] + 5)
+            finally:
+                idle.put(worker)
+        finally:
+            self._slots.release()
+        if result['status'] != 'error':
+            result = score(tests, result)
+
+        if result['status'] in ('passed', 'failed'):
+            self._results.set(key, result)
+        return dict(result, cached=False, key=key)
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._pool or ():
+                worker.stop()
+            self._pool = None
+            self._idle = None
+
+
+grader = Grader()
@@ -1,10 +1,19 @@
 # Vercel serverless function handler
+import os
+
+# an instance can be frozen between requests, so nothing may wait in memory for a later flush
+os.environ.setdefault('HEARTBEAT_FLUSH_INTERVAL', '0')
+# no /dev/shm on Lambda for a multiprocessing pool, hash bcrypt inline
+os.environ.setdefault('HASH_WORKERS', '0')
+# requests arrive through Vercel's proxy, clients are told apart by X-Forwarded-For
+os.environ.setdefault('RATE_LIMIT_TRUSTED_PROXIES', '1')
+
 from app import app
-from models import db
+import schema
 
-# Initialize database tables
-with app.app_context():
-    db.create_all()
+# Migrations are applied at deploy time (`flask --app app ensure-schema`), never by
+# concurrent cold starts; this is one version lookup and refuses a database that's behind
+schema.ensure_schema(app)
 
 # Export for Vercel
 handler = app
@@ -0,0 +1,74 @@
+from datetime import date
+from flask.json.provider import DefaultJSONProvider, _default
+
+# app.json for the whole app: jsonify, request.get_json and the cached
+# response bodies all go through it. JSON_BACKEND=orjson (the default) uses
+# orjson when it's installed and the stdlib json module when it isn't, or
+# for anything orjson refuses (integers past 64 bits, NaN, custom dump
+# arguments). Both give the same output apart from whitespace, and both
+# write dates as ISO 8601 like the to_dict methods do.
+
+
+def _iso_default(o):
+    if isinstance(o, date):
+        return o.isoformat()
+    return _default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_iso_default)
+
+    def __init__(self, app, backend='orjson'):
+        super().__init__(app)
+        self.orjson = None
+        if backend == 'orjson':
+            try:
+                import orjson  # optional dependency, the stdlib json module is used without it
+                self.orjson = orjson
+            except ImportError:
+                pass
+        elif backend != 'stdlib':
+            raise ValueError(f'Unknown JSON_BACKEND: {backend}')
+
+    def _options(self, indent=False):
+        option = self.orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= self.orjson.OPT_SORT_KEYS
+        if indent:
+            option |= self.orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, indent=False):
+        # UTF-8 bytes, skipping the str round trip when orjson is there
+        if self.orjson is not None:
+            try:
+                return self.orjson.dumps(obj, default=self.default, option=self._options(indent))
+            except self.orjson.JSONEncodeError:
+                pass
+        kwargs = {'indent': 2} if indent else {'separators': (',', ':')}
+        return super().dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        # compact, or indent=2: anything else is passed to json.dumps
+        indent = kwargs.pop('indent', None)
+        separators = kwargs.pop('separators', (',', ':'))
+        if self.orjson is None or kwargs or indent not in (None, 2) or separators != (',', ':'):
+            return super().dumps(obj, indent=indent, separators=separators, **kwargs)
+        return self.dumps_bytes(obj, indent=indent == 2).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if self.orjson is not None and not kwargs:
+            try:
+                return self.orjson.loads(s)
+            except self.orjson.JSONDecodeError:
+                pass  # the stdlib accepts a little more (NaN, huge integers), or raises the same error
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app, app.config.get('JSON_BACKEND', 'orjson'))
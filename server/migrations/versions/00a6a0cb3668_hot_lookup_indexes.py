@@ -0,0 +1,173 @@
+"""hot lookup indexes
+
+Revision ID: 00a6a0cb3668
+Revises: ff57f0c884f1
+Create Date: 2026-10-18 15:37:28.344869
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '00a6a0cb3668'
+down_revision = 'ff57f0c884f1'
+branch_labels = None
+depends_on = None
+
+# the tables as they are at this revision, the backfill must not follow later models
+courses = sa.table('courses', sa.column('id', sa.Integer), sa.column('instructor_id', sa.Integer))
+enrollments = sa.table(
+    'enrollments', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('course_id', sa.Integer),
+    sa.column('enrollment_date', sa.DateTime), sa.column('progress_percentage', sa.Integer),
+    sa.column('completion_status', sa.String), sa.column('last_accessed', sa.DateTime)
+)
+module_completions = sa.table(
+    'module_completions', sa.column('enrollment_id', sa.Integer), sa.column('completed_at', sa.DateTime)
+)
+user_stats = sa.table(
+    'user_stats', sa.column('user_id', sa.Integer), sa.column('role', sa.String), sa.column('courses', sa.Integer),
+    sa.column('enrollments', sa.Integer), sa.column('completions', sa.Integer), sa.column('progress_sum', sa.Integer)
+)
+daily_stats = sa.table(
+    'daily_stats', sa.column('user_id', sa.Integer), sa.column('role', sa.String), sa.column('day', sa.Date),
+    sa.column('enrollments', sa.Integer), sa.column('completions', sa.Integer)
+)
+
+
+def rebuild_stats(conn):
+    # same numbers as dashboard_stats.rebuild at the time of this revision
+    conn.execute(user_stats.delete())
+    conn.execute(daily_stats.delete())
+    completed = sa.case((enrollments.c.completion_status == 'completed', 1), else_=0)
+    progress_sum = sa.func.coalesce(sa.func.sum(enrollments.c.progress_percentage), 0)
+    columns = ['user_id', 'role', 'courses', 'enrollments', 'completions', 'progress_sum']
+
+    per_student = sa.select(
+        enrollments.c.user_id, sa.literal('student'), sa.literal(0), sa.func.count(), sa.func.sum(completed), progress_sum
+    ).group_by(enrollments.c.user_id)
+    conn.execute(user_stats.insert().from_select(columns, per_student))
+
+    per_course = sa.select(
+        enrollments.c.course_id, sa.func.count().label('enrollments'), sa.func.sum(completed).label('completions'),
+        progress_sum.label('progress_sum')
+    ).group_by(enrollments.c.course_id).subquery()
+    per_instructor = sa.select(
+        courses.c.instructor_id, sa.literal('instructor'), sa.func.count(courses.c.id),
+        sa.func.coalesce(sa.func.sum(per_course.c.enrollments), 0),
+        sa.func.coalesce(sa.func.sum(per_course.c.completions), 0),
+        sa.func.coalesce(sa.func.sum(per_course.c.progress_sum), 0)
+    ).outerjoin(per_course, per_course.c.course_id == courses.c.id).group_by(courses.c.instructor_id)
+    conn.execute(user_stats.insert().from_select(columns, per_instructor))
+
+    # enrollments by enrollment_date, completions by the last module finished
+    finished_at = sa.select(sa.func.max(module_completions.c.completed_at)).where(
+        module_completions.c.enrollment_id == enrollments.c.id
+    ).scalar_subquery()
+    rows = conn.execute(sa.select(
+        enrollments.c.user_id, courses.c.instructor_id, enrollments.c.enrollment_date,
+        enrollments.c.completion_status, sa.func.coalesce(finished_at, enrollments.c.last_accessed, type_=sa.DateTime)
+    ).join(courses, courses.c.id == enrollments.c.course_id))
+
+    buckets = {}
+    for user_id, instructor_id, enrolled_at, status, finished in rows:
+        for key in ((user_id, 'student'), (instructor_id, 'instructor')):
+            if enrolled_at:
+                buckets.setdefault(key + (enrolled_at.date(),), [0, 0])[0] += 1
+            if status == 'completed' and finished:
+                buckets.setdefault(key + (finished.date(),), [0, 0])[1] += 1
+    if buckets:
+        op.bulk_insert(daily_stats, [
+            {'user_id': user_id, 'role': role, 'day': day, 'enrollments': count, 'completions': done}
+            for (user_id, role, day), (count, done) in buckets.items()
+        ])
+
+
+def merge_duplicate_enrollments(conn):
+    # the unique index can't be built while the old double-enroll race has left
+    # duplicates behind: fold each extra enrollment into the oldest one
+    groups = conn.execute(sa.text(
+        'SELECT user_id, course_id, MIN(id) FROM enrollments GROUP BY user_id, course_id HAVING COUNT(*) > 1'
+    )).fetchall()
+    for user_id, course_id, keep in groups:
+        extras = [row[0] for row in conn.execute(sa.text(
+            'SELECT id FROM enrollments WHERE user_id = :user AND course_id = :course AND id != :keep'
+        ), {'user': user_id, 'course': course_id, 'keep': keep})]
+        for extra in extras:
+            params = {'keep': keep, 'extra': extra}
+            conn.execute(sa.text(
+                'INSERT INTO module_completions (enrollment_id, module_id, completed_at) '
+                'SELECT :keep, module_id, completed_at FROM module_completions WHERE enrollment_id = :extra '
+                'AND module_id NOT IN (SELECT module_id FROM module_completions WHERE enrollment_id = :keep)'
+            ), params)
+            conn.execute(sa.text('DELETE FROM module_completions WHERE enrollment_id = :extra'), params)
+            conn.execute(sa.text('UPDATE submissions SET enrollment_id = :keep WHERE enrollment_id = :extra'), params)
+            conn.execute(sa.text('DELETE FROM enrollments WHERE id = :extra'), params)
+        conn.execute(sa.text("""
+            UPDATE enrollments SET
+                completed_modules = (SELECT count(*) FROM module_completions mc WHERE mc.enrollment_id = enrollments.id),
+                progress_percentage = CASE
+                    WHEN (SELECT count(*) FROM modules m WHERE m.course_id = enrollments.course_id) = 0 THEN 0
+                    ELSE (SELECT count(*) FROM module_completions mc WHERE mc.enrollment_id = enrollments.id) * 100
+                         / (SELECT count(*) FROM modules m WHERE m.course_id = enrollments.course_id)
+                END,
+                completion_status = CASE
+                    WHEN (SELECT count(*) FROM modules m WHERE m.course_id = enrollments.course_id) > 0
+                     AND (SELECT count(*) FROM module_completions mc WHERE mc.enrollment_id = enrollments.id)
+                         >= (SELECT count(*) FROM modules m WHERE m.course_id = enrollments.course_id)
+                    THEN 'completed' ELSE completion_status
+                END
+            WHERE id = :keep AND EXISTS (SELECT 1 FROM module_completions mc WHERE mc.enrollment_id = :keep)
+        """), {'keep': keep})
+        conn.execute(sa.text(
+            'UPDATE courses SET student_count = (SELECT count(*) FROM enrollments e WHERE e.course_id = courses.id) '
+            'WHERE id = :course'
+        ), {'course': course_id})
+    if groups:
+        rebuild_stats(conn)
+
+
+def upgrade():
+    merge_duplicate_enrollments(op.get_bind())
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.create_index('ix_courses_instructor', ['instructor_id'], unique=False)
+        batch_op.create_index('ix_courses_published_category', ['is_published', 'category', 'level', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.create_index('ix_enrollments_course', ['course_id'], unique=False)
+        batch_op.create_index('ix_enrollments_user_course', ['user_id', 'course_id'], unique=True)
+
+    with op.batch_alter_table('instructor_applications', schema=None) as batch_op:
+        batch_op.create_index('ix_instructor_applications_user', ['user_id'], unique=False)
+
+    with op.batch_alter_table('red_flags', schema=None) as batch_op:
+        batch_op.create_index('ix_red_flags_email', ['email'], unique=False)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_role', ['role'], unique=False)
+
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_role')
+
+    with op.batch_alter_table('red_flags', schema=None) as batch_op:
+        batch_op.drop_index('ix_red_flags_email')
+
+    with op.batch_alter_table('instructor_applications', schema=None) as batch_op:
+        batch_op.drop_index('ix_instructor_applications_user')
+
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.drop_index('ix_enrollments_user_course')
+        batch_op.drop_index('ix_enrollments_course')
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_index('ix_courses_published_category')
+        batch_op.drop_index('ix_courses_instructor')
+
+    # ### end Alembic commands ###
@@ -0,0 +1,72 @@
+"""catalog indexes
+
+Revision ID: 5b1e7c3a9d20
+Revises: 30abb744cf73
+Create Date: 2026-10-18 14:51:40.102311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c3a9d20'
+down_revision = '30abb744cf73'
+branch_labels = None
+depends_on = None
+
+# the full-text index as course_search.py built it at this revision; it lives
+# outside the ORM metadata and is backfilled from the courses already there
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS course_search
+    USING fts5(title, description, category, module_titles, tokenize='porter unicode61')
+    """,
+    """
+    INSERT INTO course_search (rowid, title, description, category, module_titles)
+    SELECT c.id, c.title, c.description, c.category,
+           COALESCE((SELECT group_concat(m.title, ' ') FROM modules m WHERE m.course_id = c.id), '')
+    FROM courses c
+    """,
+]
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE IF NOT EXISTS course_search (
+        course_id INTEGER PRIMARY KEY REFERENCES courses(id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_course_search_document ON course_search USING GIN (document)",
+    """
+    INSERT INTO course_search (course_id, document)
+    SELECT c.id,
+           setweight(to_tsvector('english', coalesce(c.title, '')), 'A') ||
+           setweight(to_tsvector('english', coalesce(c.category, '')), 'B') ||
+           setweight(to_tsvector('english', coalesce(
+               (SELECT string_agg(m.title, ' ') FROM modules m WHERE m.course_id = c.id), '')), 'B') ||
+           setweight(to_tsvector('english', coalesce(c.description, '')), 'C')
+    FROM courses c
+    ON CONFLICT (course_id) DO NOTHING
+    """,
+]
+
+
+def upgrade():
+    # if_not_exists: databases stamped at 30abb744cf73 while it still created these
+    op.create_index('ix_courses_published_created', 'courses', ['is_published', 'created_at', 'id'],
+                    unique=False, if_not_exists=True)
+
+    conn = op.get_bind()
+    statements = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}.get(conn.dialect.name)
+    # same reason: an index that is already there is already filled
+    if statements and not sa.inspect(conn).has_table('course_search'):
+        for statement in statements:
+            conn.execute(sa.text(statement))
+
+
+def downgrade():
+    if op.get_bind().dialect.name in ('sqlite', 'postgresql'):
+        op.execute('DROP TABLE IF EXISTS course_search')
+
+    op.drop_index('ix_courses_published_created', table_name='courses')
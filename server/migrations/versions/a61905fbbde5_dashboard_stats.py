@@ -0,0 +1,115 @@
+"""dashboard stats
+
+Revision ID: a61905fbbde5
+Revises: 98b956a79a2a
+Create Date: 2026-10-18 15:01:53.233259
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61905fbbde5'
+down_revision = '98b956a79a2a'
+branch_labels = None
+depends_on = None
+
+# the tables as they are at this revision, the backfill must not follow later models
+courses = sa.table('courses', sa.column('id', sa.Integer), sa.column('instructor_id', sa.Integer))
+enrollments = sa.table(
+    'enrollments', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('course_id', sa.Integer),
+    sa.column('enrollment_date', sa.DateTime), sa.column('progress_percentage', sa.Integer),
+    sa.column('completion_status', sa.String), sa.column('last_accessed', sa.DateTime)
+)
+module_completions = sa.table(
+    'module_completions', sa.column('enrollment_id', sa.Integer), sa.column('completed_at', sa.DateTime)
+)
+user_stats = sa.table(
+    'user_stats', sa.column('user_id', sa.Integer), sa.column('role', sa.String), sa.column('courses', sa.Integer),
+    sa.column('enrollments', sa.Integer), sa.column('completions', sa.Integer), sa.column('progress_sum', sa.Integer)
+)
+daily_stats = sa.table(
+    'daily_stats', sa.column('user_id', sa.Integer), sa.column('role', sa.String), sa.column('day', sa.Date),
+    sa.column('enrollments', sa.Integer), sa.column('completions', sa.Integer)
+)
+
+
+def backfill(conn):
+    # same numbers as dashboard_stats.rebuild at the time of this revision
+    completed = sa.case((enrollments.c.completion_status == 'completed', 1), else_=0)
+    progress_sum = sa.func.coalesce(sa.func.sum(enrollments.c.progress_percentage), 0)
+    columns = ['user_id', 'role', 'courses', 'enrollments', 'completions', 'progress_sum']
+
+    per_student = sa.select(
+        enrollments.c.user_id, sa.literal('student'), sa.literal(0), sa.func.count(), sa.func.sum(completed), progress_sum
+    ).group_by(enrollments.c.user_id)
+    conn.execute(user_stats.insert().from_select(columns, per_student))
+
+    per_course = sa.select(
+        enrollments.c.course_id, sa.func.count().label('enrollments'), sa.func.sum(completed).label('completions'),
+        progress_sum.label('progress_sum')
+    ).group_by(enrollments.c.course_id).subquery()
+    per_instructor = sa.select(
+        courses.c.instructor_id, sa.literal('instructor'), sa.func.count(courses.c.id),
+        sa.func.coalesce(sa.func.sum(per_course.c.enrollments), 0),
+        sa.func.coalesce(sa.func.sum(per_course.c.completions), 0),
+        sa.func.coalesce(sa.func.sum(per_course.c.progress_sum), 0)
+    ).outerjoin(per_course, per_course.c.course_id == courses.c.id).group_by(courses.c.instructor_id)
+    conn.execute(user_stats.insert().from_select(columns, per_instructor))
+
+    # enrollments by enrollment_date, completions by the last module finished
+    finished_at = sa.select(sa.func.max(module_completions.c.completed_at)).where(
+        module_completions.c.enrollment_id == enrollments.c.id
+    ).scalar_subquery()
+    rows = conn.execute(sa.select(
+        enrollments.c.user_id, courses.c.instructor_id, enrollments.c.enrollment_date,
+        enrollments.c.completion_status, sa.func.coalesce(finished_at, enrollments.c.last_accessed, type_=sa.DateTime)
+    ).join(courses, courses.c.id == enrollments.c.course_id))
+
+    buckets = {}
+    for user_id, instructor_id, enrolled_at, status, finished in rows:
+        for key in ((user_id, 'student'), (instructor_id, 'instructor')):
+            if enrolled_at:
+                buckets.setdefault(key + (enrolled_at.date(),), [0, 0])[0] += 1
+            if status == 'completed' and finished:
+                buckets.setdefault(key + (finished.date(),), [0, 0])[1] += 1
+    if buckets:
+        op.bulk_insert(daily_stats, [
+            {'user_id': user_id, 'role': role, 'day': day, 'enrollments': count, 'completions': done}
+            for (user_id, role, day), (count, done) in buckets.items()
+        ])
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('daily_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(length=20), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('enrollments', sa.Integer(), nullable=False),
+    sa.Column('completions', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'role', 'day')
+    )
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(length=20), nullable=False),
+    sa.Column('courses', sa.Integer(), nullable=False),
+    sa.Column('enrollments', sa.Integer(), nullable=False),
+    sa.Column('completions', sa.Integer(), nullable=False),
+    sa.Column('progress_sum', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'role')
+    )
+    # ### end Alembic commands ###
+
+    # backfill from courses/enrollments, see dashboard_stats.py
+    backfill(op.get_bind())
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('user_stats')
+    op.drop_table('daily_stats')
+    # ### end Alembic commands ###
@@ -1,9 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from password_hashing import PasswordHasher
+from sqlalchemy.orm import joinedload, defer
 from datetime import datetime
+import json
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
+hasher = PasswordHasher()
+
+def insert_ignore(model):
+    # INSERT that silently skips rows hitting a unique/primary key
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(model).on_conflict_do_nothing()
+    if db.engine.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(model).on_conflict_do_nothing()
+    return db.insert(model).prefix_with('IGNORE')
 
 # User model - handles students, instructors, and admins
 class User(db.Model):
@@ -20,15 +32,22 @@ class User(db.Model):
     avatar = db.Column(db.String(200), default='https://ui-avatars.com/api/?name=User')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # instructors are a small share of users, looked up by role for imports
+    __table_args__ = (db.Index('ix_users_role', 'role'),)
+    
     courses = db.relationship('Course', backref='instructor', lazy=True, cascade='all, delete-orphan')
     enrollments = db.relationship('Enrollment', backref='student', lazy=True, cascade='all, delete-orphan')
     instructor_application = db.relationship('InstructorApplication', backref='user', uselist=False, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hasher.generate_password_hash(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return hasher.check_password_hash(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        # hashed with an older BCRYPT_LOG_ROUNDS
+        return hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -47,6 +66,8 @@ class User(db.Model):
 class Course(db.Model):
     __tablename__ = 'courses'
     
+    SUMMARY_LENGTH = 200
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -59,10 +80,52 @@ class Course(db.Model):
     is_published = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # denormalized counters, kept up to date by course_counters.py
+    student_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    module_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # keyset pagination for the catalog walks (created_at, id) or (student_count, id) among published courses;
+    # category (+ level) filters and "my courses" have their own
+    __table_args__ = (
+        db.Index('ix_courses_published_created', 'is_published', 'created_at', 'id'),
+        db.Index('ix_courses_published_popular', 'is_published', 'student_count', 'id'),
+        db.Index('ix_courses_published_category', 'is_published', 'category', 'level', 'created_at', 'id'),
+        db.Index('ix_courses_instructor', 'instructor_id'),
+    )
     
     modules = db.relationship('Module', backref='course', lazy=True, cascade='all, delete-orphan', order_by='Module.order')
     enrollments = db.relationship('Enrollment', backref='course', lazy=True, cascade='all, delete-orphan')
     
+    @staticmethod
+    def catalog_query(query, card=False):
+        # catalog path: instructor joined in, counts are plain columns, so a
+        # whole page of courses is one SELECT
+        query = query.options(joinedload(Course.instructor))
+        if card:
+            # card projection: never pull the full description, just a short summary
+            query = query.options(defer(Course.description)).add_columns(
+                db.func.substr(Course.description, 1, Course.SUMMARY_LENGTH)
+            )
+        return query
+    
+    def to_card_dict(self, summary):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'summary': summary,
+            'price': self.price,
+            'level': self.level,
+            'category': self.category,
+            'thumbnail': self.thumbnail,
+            'duration': self.duration,
+            'instructor_id': self.instructor_id,
+            'instructor_name': f"{self.instructor.first_name} {self.instructor.last_name}" if self.instructor.first_name else self.instructor.username,
+            'instructor_avatar': self.instructor.avatar,
+            'created_at': self.created_at.isoformat(),
+            'module_count': self.module_count,
+            'student_count': self.student_count
+        }
+    
     def to_dict(self, include_modules=False):
         data = {
             'id': self.id,
@@ -78,11 +141,12 @@ class Course(db.Model):
             'instructor_avatar': self.instructor.avatar,
             'is_published': self.is_published,
             'created_at': self.created_at.isoformat(),
-            'module_count': len(self.modules),
-            'student_count': len(self.enrollments)
+            'module_count': self.module_count,
+            'student_count': self.student_count
         }
         if include_modules:
-            data['modules'] = [m.to_dict() for m in self.modules]
+            # outline only, lesson bodies come from the per-module endpoint
+            data['modules'] = [Module.outline_dict(row) for row in Module.outline_query(self.id)]
         return data
     
     # Module/Lesson model - contains actual course content
@@ -101,9 +165,25 @@ class Module(db.Model):
     challenge_code = db.Column(db.Text)  # starter code for challenges
     challenge_tests = db.Column(db.Text)  # test cases
     challenge_solution = db.Column(db.Text)  # solution code
+    challenge_runner = db.Column(db.String(20))  # graded on the server by this runner (grading.RUNNERS), else in the browser
     
-    def to_dict(self):
-        return {
+    # outline reads and the search index's per-course module titles both go by course
+    __table_args__ = (db.Index('ix_modules_course_order', 'course_id', 'order'),)
+    
+    OUTLINE_COLUMNS = ('id', 'title', 'order', 'module_type', 'duration')
+    
+    @staticmethod
+    def outline_query(course_id):
+        # just the outline columns, never the lesson text
+        columns = [getattr(Module, name) for name in Module.OUTLINE_COLUMNS]
+        return db.session.query(*columns).filter(Module.course_id == course_id).order_by(Module.order)
+    
+    @staticmethod
+    def outline_dict(row):
+        return dict(zip(Module.OUTLINE_COLUMNS, row))
+    
+    def to_dict(self, include_solution=False):
+        data = {
             'id': self.id,
             'title': self.title,
             'content': self.content,
@@ -114,8 +194,19 @@ class Module(db.Model):
             'module_type': self.module_type,
             'challenge_code': self.challenge_code,
             'challenge_tests': self.challenge_tests,
-            'challenge_solution': self.challenge_solution
+            'challenge_runner': self.challenge_runner
         }
+        # solutions only go back to the course's instructor
+        if include_solution:
+            data['challenge_solution'] = self.challenge_solution
+        elif self.challenge_runner and self.challenge_tests:
+            # server-graded tests stay on the server, students just see what's checked
+            try:
+                tests = json.loads(self.challenge_tests)
+                data['challenge_tests'] = json.dumps([{'description': t.get('description', '')} for t in tests])
+            except (ValueError, AttributeError):
+                data['challenge_tests'] = None
+        return data
         
 class Enrollment(db.Model):
     __tablename__ = 'enrollments'
@@ -129,24 +220,103 @@ class Enrollment(db.Model):
     grade = db.Column(db.String(5))
     completion_status = db.Column(db.String(20), default='in_progress')
     last_accessed = db.Column(db.DateTime, default=datetime.utcnow)
-    completed_module_ids = db.Column(db.Text, default='')  # comma-separated module IDs
     
-    def to_dict(self):
+    # one enrollment per student per course, enforced by the database (two concurrent
+    # enroll requests used to both get through); also serves every by-student lookup
+    __table_args__ = (
+        db.Index('ix_enrollments_user_course', 'user_id', 'course_id', unique=True),
+        db.Index('ix_enrollments_course', 'course_id'),
+    )
+    
+    completions = db.relationship('ModuleCompletion', backref='enrollment', lazy=True, cascade='all, delete-orphan')
+    submissions = db.relationship('Submission', backref='enrollment', lazy=True, cascade='all, delete-orphan')
+    
+    def mark_modules_complete(self, module_ids):
+        # plain inserts (one row per module), completing the same module twice is a no-op
+        now = datetime.utcnow()
+        db.session.execute(
+            insert_ignore(ModuleCompletion),
+            [{'enrollment_id': self.id, 'module_id': module_id, 'completed_at': now} for module_id in module_ids]
+        )
+        self.refresh_progress()
+    
+    def refresh_progress(self):
+        # recompute the progress columns from module_completions in one UPDATE
+        from dashboard_stats import progress_changed
+        before = db.session.query(Enrollment.progress_percentage, Enrollment.completion_status).filter_by(id=self.id).one()
+        completed = db.select(db.func.count()).where(ModuleCompletion.enrollment_id == Enrollment.id).scalar_subquery()
+        total = db.select(db.func.count()).where(Module.course_id == Enrollment.course_id).scalar_subquery()
+        db.session.execute(
+            db.update(Enrollment).where(Enrollment.id == self.id).values(
+                completed_modules=completed,
+                progress_percentage=db.case((total > 0, completed * 100 // total), else_=0),
+                completion_status=db.case((db.and_(total > 0, completed >= total), 'completed'), else_=Enrollment.completion_status),
+                last_accessed=datetime.utcnow()
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.expire(self)
+        progress_changed(db.session.connection(), self.id, before)
+    
+    def to_progress_dict(self):
+        # just the progress fields, for the progress and submission endpoints
+        completed_ids = db.session.query(ModuleCompletion.module_id).filter_by(enrollment_id=self.id)
         return {
             'id': self.id,
-            'user_id': self.user_id,
             'course_id': self.course_id,
-            'enrollment_date': self.enrollment_date.isoformat(),
             'progress_percentage': self.progress_percentage,
             'completed_modules': self.completed_modules,
-            'grade': self.grade,
             'completion_status': self.completion_status,
             'last_accessed': self.last_accessed.isoformat(),
-            'course_title': self.course.title if self.course else None,
-            'course_description': self.course.description if self.course else None,
-            'course': self.course.to_dict() if self.course else None,
-            'completed_module_ids': self.completed_module_ids.split(',') if self.completed_module_ids else []
+            'completed_module_ids': [str(module_id) for (module_id,) in completed_ids]
+        }
+
+# one row per (enrollment, module) a student has finished
+class ModuleCompletion(db.Model):
+    __tablename__ = 'module_completions'
+    
+    enrollment_id = db.Column(db.Integer, db.ForeignKey('enrollments.id'), primary_key=True)
+    module_id = db.Column(db.Integer, db.ForeignKey('modules.id'), primary_key=True)
+    completed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # "how many students finished module X" reads the module side of the key
+    __table_args__ = (db.Index('ix_module_completions_module', 'module_id', 'completed_at'),)
+
+# graded challenge attempts, see grading.py
+class Submission(db.Model):
+    __tablename__ = 'submissions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    enrollment_id = db.Column(db.Integer, db.ForeignKey('enrollments.id'), nullable=False)
+    module_id = db.Column(db.Integer, db.ForeignKey('modules.id'), nullable=False)
+    code = db.Column(db.Text, nullable=False)
+    grading_key = db.Column(db.String(64), nullable=False)  # hash of runner, tests and code
+    status = db.Column(db.String(20), nullable=False)  # passed, failed, error, timeout
+    passed_tests = db.Column(db.Integer, default=0)
+    total_tests = db.Column(db.Integer, default=0)
+    results = db.Column(db.Text)  # JSON list of {description, passed, error}
+    output = db.Column(db.Text)  # what the code printed, truncated
+    error = db.Column(db.Text)  # why it didn't run: exception, time limit, ...
+    duration_ms = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # a student's history for one challenge, newest first
+    __table_args__ = (db.Index('ix_submissions_enrollment_module', 'enrollment_id', 'module_id', 'created_at'),)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'module_id': self.module_id,
+            'code': self.code,
+            'status': self.status,
+            'passed_tests': self.passed_tests,
+            'total_tests': self.total_tests,
+            'results': json.loads(self.results) if self.results else [],
+            'output': self.output,
+            'error': self.error,
+            'duration_ms': self.duration_ms,
+            'created_at': self.created_at.isoformat()
         }
+
 class InstructorApplication(db.Model):
     __tablename__ = 'instructor_applications'
 
@@ -160,6 +330,9 @@ class InstructorApplication(db.Model):
     reviewed_at = db.Column(db.DateTime)
     admin_notes = db.Column(db.Text)
     
+    # "has this student applied already?" on every application
+    __table_args__ = (db.Index('ix_instructor_applications_user', 'user_id'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -183,6 +356,9 @@ class RedFlag(db.Model):
     reason = db.Column(db.Text)
     flagged_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # checked on every registration
+    __table_args__ = (db.Index('ix_red_flags_email', 'email'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -191,3 +367,44 @@ class RedFlag(db.Model):
             'reason': self.reason,
             'flagged_at': self.flagged_at.isoformat()
         } 
+
+# precomputed dashboard numbers per (user, role), maintained by dashboard_stats.py.
+# For instructors enrollments/completions/progress cover every enrollment in
+# their courses, for students their own enrollments.
+class UserStats(db.Model):
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    role = db.Column(db.String(20), primary_key=True)  # instructor, student
+    courses = db.Column(db.Integer, nullable=False, default=0)
+    enrollments = db.Column(db.Integer, nullable=False, default=0)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+    progress_sum = db.Column(db.Integer, nullable=False, default=0)
+    
+    def average_progress(self):
+        return round(self.progress_sum / self.enrollments, 1) if self.enrollments else 0
+
+# enrollments/completions per day, same (user, role) scoping as UserStats
+class DailyStats(db.Model):
+    __tablename__ = 'daily_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    role = db.Column(db.String(20), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    enrollments = db.Column(db.Integer, nullable=False, default=0)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'enrollments': self.enrollments,
+            'completions': self.completions
+        }
+
+# a single row (id 1) whose generation goes up on every course or module write,
+# the version of cached catalog pages; maintained by course_counters.py
+class CatalogVersion(db.Model):
+    __tablename__ = 'catalog_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# bcrypt hashing in a small process pool so a login storm can't pin every
+# request thread. At most HASH_MAX_PENDING hashes may be queued or running
+# per worker process; past that we shed load with HashingBusy (a 503) instead
+# of letting the whole API stall behind the hashes.
+#
+# Where the pool can't start (no /dev/shm on AWS Lambda, say) we log it once
+# and hash inline from then on; a pool whose workers died is started again
+# on the next hash.
+
+
+class HashingBusy(Exception):
+    pass
+
+
+# bcrypt only looks at the first 72 bytes of a password
+def _encode(password):
+    return password.encode('utf-8')[:72]
+
+
+# bcrypt is imported where it's used, it isn't needed to serve most requests
+def _hash(password, rounds):
+    import bcrypt
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password, password_hash):
+    import bcrypt
+    return bcrypt.checkpw(_encode(password), password_hash.encode('utf-8'))
+
+
+def hash_cost(password_hash):
+    # "$2b$12$..." -> 12
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.app = None
+        self.rounds = 12
+        self.workers = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(32)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.workers = app.config.get('HASH_WORKERS', 0)
+        self._slots = threading.BoundedSemaphore(app.config.get('HASH_MAX_PENDING', 32))
+
+    def _get_executor(self):
+        # started on first use, not at import, so forking happens after app setup;
+        # None if this platform can't run one
+        if self._executor is None and self.workers:
+            with self._lock:
+                if self._executor is None and self.workers:
+                    try:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    except (OSError, ImportError, NotImplementedError) as e:
+                        self._unavailable(e)
+        return self._executor
+
+    def _unavailable(self, error):
+        if self.app is not None:
+            self.app.logger.warning('bcrypt process pool unavailable, hashing inline: %s', error)
+        self.workers = 0
+        self._executor = None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return fn(*args)
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                return fn(*args)
+            except OSError as e:
+                # the workers themselves are only started by submit
+                with self._lock:
+                    self._unavailable(e)
+                return fn(*args)
+        finally:
+            self._slots.release()
+
+    def generate_password_hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def check_password_hash(self, password_hash, password):
+        return self._run(_check, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        return hash_cost(password_hash) != self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,84 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+from models import db, Enrollment
+
+# Write-behind buffer for "student is still on this course" heartbeats.
+# Each heartbeat only records (user_id, course_id) -> time in memory; repeated
+# heartbeats for the same enrollment coalesce into one entry. The buffer is
+# written out as a single batched UPDATE once it holds HEARTBEAT_BATCH_SIZE
+# entries or HEARTBEAT_FLUSH_INTERVAL seconds have passed, and at shutdown.
+# A timer thread does the interval flush, so a quiet instance doesn't sit on
+# the last heartbeats until someone else sends one. last_accessed may
+# therefore lag by up to the flush interval.
+#
+# HEARTBEAT_FLUSH_INTERVAL=0 writes every heartbeat through; the serverless
+# handler (index.py) uses that, a frozen instance never gets to flush.
+
+
+class HeartbeatBuffer:
+    def __init__(self, app=None):
+        self.app = None
+        self.batch_size = 100
+        self.flush_interval = 30
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._timer = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('HEARTBEAT_BATCH_SIZE', 100)
+        self.flush_interval = app.config.get('HEARTBEAT_FLUSH_INTERVAL', 30)
+        atexit.register(self._flush_on_exit)
+
+    def touch(self, user_id, course_id, at=None):
+        with self._lock:
+            self._pending[(user_id, course_id)] = at or datetime.utcnow()
+            waited = time.monotonic() - self._last_flush
+            due = len(self._pending) >= self.batch_size or waited >= self.flush_interval
+            if not due and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval - waited, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not batch:
+            return 0
+
+        table = Enrollment.__table__
+        statement = db.update(table).where(
+            table.c.user_id == db.bindparam('b_user_id'),
+            table.c.course_id == db.bindparam('b_course_id')
+        ).values(last_accessed=db.bindparam('b_last_accessed'))
+        rows = [{'b_user_id': user_id, 'b_course_id': course_id, 'b_last_accessed': at}
+                for (user_id, course_id), at in batch.items()]
+        # own connection and transaction, independent of the request's session
+        with db.engine.begin() as connection:
+            connection.execute(statement, rows)
+        return len(rows)
+
+    def _flush_on_timer(self):
+        with self._lock:
+            self._timer = None
+        with self.app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception('heartbeat flush failed')
+
+    def _flush_on_exit(self):
+        if self._pending and self.app is not None:
+            with self.app.app_context():
+                self.flush()
+
+
+heartbeats = HeartbeatBuffer()
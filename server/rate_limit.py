@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import jsonify, request
+from response_cache import LRUBackend
+
+# Admission control in front of every request, in two layers:
+#
+# - Token buckets per client: signed-in users by user id, everyone else by
+#   IP. A bucket holds up to RATE_LIMIT_BURST tokens and refills at
+#   RATE_LIMIT_RATE per second; each request spends its route's cost
+#   (ROUTE_COSTS, 1 by default) and gets a 429 with Retry-After when the
+#   bucket can't cover it. Buckets live in this process ('memory') or in
+#   Redis ('redis') so all workers share them.
+# - A cap of RATE_LIMIT_MAX_CONCURRENT requests in flight per process; past
+#   that we answer 503 straight away instead of queueing until latency
+#   collapses for everyone.
+
+# bcrypt, full-text search, sandboxed grading and bulk jobs cost more than a PK lookup
+ROUTE_COSTS = {
+    ('POST', '/api/auth/login'): 10,
+    ('POST', '/api/auth/register'): 10,
+    ('POST', '/api/auth/google'): 5,
+    ('POST', '/api/modules/<int:module_id>/submissions'): 5,
+    ('GET', '/api/admin/export/<kind>'): 10,
+    ('POST', '/api/admin/import'): 50,
+}
+SEARCH_COST = 5  # GET /api/courses?search=
+
+EXEMPT_ENDPOINTS = ('metrics', 'static')
+
+
+class MemoryBuckets:
+    # in-process buckets, least recently used ones are dropped past max_entries
+    # (a dropped bucket is simply full again)
+
+    def __init__(self, rate, burst, max_entries=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, cost):
+        # returns 0 if allowed, else seconds until it would be
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0
+            else:
+                wait = (cost - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# refill and spend in one round trip; keys expire once they'd be full anyway
+TAKE_SCRIPT = '''
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+'''
+
+
+class RedisBuckets:
+    def __init__(self, url, rate, burst, prefix='lms:ratelimit:'):
+        import redis  # optional dependency, only needed for RATE_LIMIT_BACKEND=redis
+        self.client = redis.Redis.from_url(url)
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self._take = self.client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, cost):
+        return float(self._take(keys=[self.prefix + key], args=[self.rate, self.burst, cost]))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.buckets = None
+        self.trusted_proxies = 0
+        self._proxy_warned = False
+        self._in_flight = None
+        # token -> (bucket key, expiry), so a signature is checked once per token rather than per request
+        self._token_keys = LRUBackend(max_entries=10000, ttl=300)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        if not self.enabled:
+            return
+        rate = app.config.get('RATE_LIMIT_RATE', 5)
+        burst = app.config.get('RATE_LIMIT_BURST', 100)
+        kind = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+        if kind == 'redis':
+            self.buckets = RedisBuckets(app.config['RATE_LIMIT_REDIS_URL'], rate, burst)
+        elif kind == 'memory':
+            self.buckets = MemoryBuckets(rate, burst)
+        else:
+            raise ValueError(f'Unknown RATE_LIMIT_BACKEND: {kind}')
+        self.trusted_proxies = app.config.get('RATE_LIMIT_TRUSTED_PROXIES', 0)
+        max_concurrent = app.config.get('RATE_LIMIT_MAX_CONCURRENT', 64)
+        self._in_flight = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+
+    def client_ip(self):
+        # behind N proxies, the client is the Nth address from the right of X-Forwarded-For
+        if self.trusted_proxies:
+            forwarded = [a.strip() for a in request.headers.get('X-Forwarded-For', '').split(',') if a.strip()]
+            if len(forwarded) >= self.trusted_proxies:
+                return forwarded[-self.trusted_proxies]
+        elif not self._proxy_warned and 'X-Forwarded-For' in request.headers:
+            # every client then shares the proxy's bucket
+            self._proxy_warned = True
+            self.app.logger.warning('requests carry X-Forwarded-For but RATE_LIMIT_TRUSTED_PROXIES is 0, so all '
+                                    'anonymous clients share one rate limit bucket; set it to the number of proxies')
+        return request.remote_addr or 'unknown'
+
+    def client_key(self):
+        # a valid token means a user bucket, anything else (no token, bad token) is limited by IP
+        auth = request.headers.get('Authorization', '')
+        if auth.startswith('Bearer '):
+            token = auth[7:]
+            known = self._token_keys.get(token)
+            if known is None:
+                from flask_jwt_extended import decode_token
+                try:
+                    claims = decode_token(token)
+                    known = ('user:' + str(claims['sub']), claims.get('exp', float('inf')))
+                except Exception:
+                    known = (None, float('inf'))
+                self._token_keys.set(token, known)
+            key, expires = known
+            if key is not None and expires > time.time():
+                return key
+        return 'ip:' + self.client_ip()
+
+    def request_cost(self):
+        rule = request.url_rule.rule if request.url_rule else None
+        cost = ROUTE_COSTS.get((request.method, rule), 1)
+        if rule == '/api/courses' and request.method == 'GET' and request.args.get('search'):
+            cost = SEARCH_COST
+        return cost
+
+    def _admit(self):
+        if not self.enabled or request.method == 'OPTIONS' or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+
+        wait = self.buckets.take(self.client_key(), self.request_cost())
+        if wait > 0:
+            response = jsonify({'error': 'Too many requests, slow down'})
+            response.headers['Retry-After'] = str(int(wait) + 1)
+            return response, 429
+
+        if self._in_flight is not None:
+            if not self._in_flight.acquire(blocking=False):
+                response = jsonify({'error': 'Server busy, please retry'})
+                response.headers['Retry-After'] = '1'
+                return response, 503
+            request.environ['rate_limit.admitted'] = True
+        return None
+
+    def _release(self, exc):
+        if request.environ.pop('rate_limit.admitted', False):
+            self._in_flight.release()
+
+
+rate_limiter = RateLimiter()
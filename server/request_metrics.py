@@ -0,0 +1,205 @@
+import hmac
+import random
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request instrumentation. Every request's latency goes into a histogram
+# per (method, route); a sampled share of requests (METRICS_SQL_SAMPLE_RATE)
+# also counts its SQL statements, their total time and the slowest one.
+# Statements slower than METRICS_SLOW_QUERY_MS are logged, with their query
+# plan when METRICS_EXPLAIN is on. Everything is exposed in Prometheus text
+# format on /metrics, which is only served when METRICS_TOKEN is set and wants
+# it as a bearer token: route names and timings aren't for the public.
+#
+# Numbers are per process; with several gunicorn workers each one reports its
+# own, so let Prometheus sum them.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class RequestMetrics:
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self._latency = {}
+        self._queries = {}
+        self._sql_seconds = {}
+        self._responses = {}
+        self._slow_queries = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.sample_rate = app.config.get('METRICS_SQL_SAMPLE_RATE', 1.0)
+        self.slow_query = app.config.get('METRICS_SLOW_QUERY_MS', 200) / 1000
+        self.explain = app.config.get('METRICS_EXPLAIN', False)
+        self.token = app.config.get('METRICS_TOKEN')
+        self.server_timing = app.config.get('METRICS_SERVER_TIMING', False)
+        if not self.enabled:
+            return
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        if self.token:
+            app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+        if not getattr(RequestMetrics, '_listening', False):
+            # engine-wide, so it also covers engines created after this point
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            RequestMetrics._listening = True
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            g.sql_stats = {'queries': 0, 'seconds': 0.0, 'slowest': 0.0, 'slowest_statement': None}
+
+    def _finish(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        key = (request.method, route)
+        stats = g.pop('sql_stats', None)
+
+        if stats is not None:
+            if self.server_timing:
+                response.headers['Server-Timing'] = (
+                    f'db;dur={stats["seconds"] * 1000:.1f};desc="{stats["queries"]} queries", '
+                    f'app;dur={elapsed * 1000:.1f}'
+                )
+            if stats['slowest_statement']:
+                self.app.logger.debug('%s %s: %d queries, %.1f ms SQL, slowest %.1f ms: %s',
+                                      request.method, request.path, stats['queries'], stats['seconds'] * 1000,
+                                      stats['slowest'] * 1000, stats['slowest_statement'])
+
+        with self._lock:
+            self._latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            status_key = key + (response.status_code,)
+            self._responses[status_key] = self._responses.get(status_key, 0) + 1
+            if stats is not None:
+                self._queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats['queries'])
+                self._sql_seconds[key] = self._sql_seconds.get(key, 0) + stats['seconds']
+        return response
+
+    def statement_finished(self, connection, statement, parameters, seconds, stats):
+        stats['queries'] += 1
+        stats['seconds'] += seconds
+        if seconds > stats['slowest']:
+            stats['slowest'] = seconds
+            stats['slowest_statement'] = statement
+        if seconds < self.slow_query:
+            return
+
+        with self._lock:
+            self._slow_queries += 1
+        message = f'slow query ({seconds * 1000:.1f} ms) in {request.method} {request.path}: {statement}'
+        if self.explain and not isinstance(parameters, list) and statement.lstrip()[:6].upper() == 'SELECT':
+            message += '\n' + self._explain(connection, statement, parameters)
+        self.app.logger.warning(message)
+
+    def _explain(self, connection, statement, parameters):
+        # raw DBAPI cursor, so the EXPLAIN itself doesn't go through these hooks
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.dialect.name == 'sqlite' else 'EXPLAIN '
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return '\n'.join(' '.join(str(part) for part in row) for row in cursor.fetchall())
+        except Exception as e:
+            return f'(no plan: {e})'
+        finally:
+            cursor.close()
+
+    def render(self):
+        with self._lock:
+            lines = ['# HELP http_request_duration_seconds Request latency by route.',
+                     '# TYPE http_request_duration_seconds histogram']
+            for (method, route), histogram in sorted(self._latency.items()):
+                lines += histogram.render('http_request_duration_seconds', f'method="{method}",route="{route}"')
+
+            lines += ['# HELP http_responses_total Responses by route and status code.',
+                      '# TYPE http_responses_total counter']
+            for (method, route, status), count in sorted(self._responses.items()):
+                lines.append(f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            lines += ['# HELP db_queries_per_request SQL statements per sampled request.',
+                      '# TYPE db_queries_per_request histogram']
+            for (method, route), histogram in sorted(self._queries.items()):
+                lines += histogram.render('db_queries_per_request', f'method="{method}",route="{route}"')
+
+            lines += ['# HELP db_query_seconds_total Time spent in SQL by sampled requests.',
+                      '# TYPE db_query_seconds_total counter']
+            for (method, route), seconds in sorted(self._sql_seconds.items()):
+                lines.append(f'db_query_seconds_total{{method="{method}",route="{route}"}} {seconds:.6f}')
+
+            lines += ['# HELP db_slow_queries_total Statements slower than METRICS_SLOW_QUERY_MS.',
+                      '# TYPE db_slow_queries_total counter',
+                      f'db_slow_queries_total {self._slow_queries}']
+        return '\n'.join(lines) + '\n'
+
+    def _metrics_view(self):
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {self.token}'):
+            return 'Unauthorized\n', 401, {'Content-Type': 'text/plain'}
+        return self.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_stats' in g:
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+        if context is not None:
+            context.metrics_timed = True
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    stats = g.get('sql_stats') if has_request_context() else None
+    if stats is not None:
+        request_metrics.statement_finished(conn, statement, parameters, seconds, stats)
+
+
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute; drop its start time, or it stays on the
+    # pooled connection and the next statement timed there is matched with it
+    if context.connection is None or not getattr(context.execution_context, 'metrics_timed', False):
+        return
+    started = context.connection.info.get('metrics_started')
+    if started:
+        started.pop()
+
+
+request_metrics = RequestMetrics()
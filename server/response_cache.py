@@ -0,0 +1,175 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Server-side cache for public read endpoints (catalog, course detail,
+# lesson bodies).
+#
+# Course detail and lesson entries are stored under "course:<id>" and
+# "module:<id>" together with the course version (its updated_at), so a
+# stale entry is simply a miss.
+# Catalog entries are stored with a version read from the database on every
+# request (the catalog_version row, bumped on every course and module write),
+# so a course added, edited or deleted through any worker is seen by all of
+# them, whichever backend. Their key also has a generation number bumped on every course
+# mutation, which drops this process's (or, with Redis, everyone's) cached
+# pages at once.
+
+
+class CacheEntry:
+    # body is the UTF-8 JSON; variants holds it precompressed, by content encoding
+    def __init__(self, body, version=None, last_modified=None, variants=None):
+        self.body = body
+        self.version = version
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.last_modified = last_modified or datetime.utcnow()
+        self.variants = variants or {}
+
+    def dumps(self):
+        return json.dumps({
+            'body': self.body.decode('utf-8'),
+            'version': self.version,
+            'last_modified': self.last_modified.isoformat(),
+            'variants': {k: base64.b64encode(v).decode('ascii') for k, v in self.variants.items()}
+        })
+
+    @classmethod
+    def loads(cls, raw):
+        data = json.loads(raw)
+        variants = {k: base64.b64decode(v) for k, v in data.get('variants', {}).items()}
+        return cls(data['body'].encode('utf-8'), data['version'], datetime.fromisoformat(data['last_modified']),
+                   variants)
+
+
+class LRUBackend:
+    # in-process backend: bounded by entry count, entries expire after ttl seconds
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return self._counters[name]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+class RedisBackend:
+    # shared backend so every worker sees the same entries and invalidations
+
+    def __init__(self, url, ttl=300, prefix='lms:cache:'):
+        import redis  # optional dependency, only needed for CACHE_BACKEND=redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return CacheEntry.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl, value.dumps())
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def counter(self, name):
+        return int(self.client.get(self.prefix + 'counter:' + name) or 0)
+
+    def incr(self, name):
+        return self.client.incr(self.prefix + 'counter:' + name)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get('CACHE_BACKEND', 'memory')
+        ttl = app.config.get('CACHE_TTL', 300)
+        if kind == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'], ttl=ttl)
+        elif kind == 'memory':
+            self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024), ttl=ttl)
+        else:
+            raise ValueError(f'Unknown CACHE_BACKEND: {kind}')
+
+    def catalog_key(self, args):
+        generation = self.backend.counter('catalog')
+        params = '&'.join(f'{k}={v}' for k, v in sorted(args.items(multi=True)))
+        return f'catalog:{generation}:{params}'
+
+    def course_key(self, course_id):
+        return f'course:{course_id}'
+
+    def module_key(self, module_id):
+        return f'module:{module_id}'
+
+    def get(self, key, version=None):
+        entry = self.backend.get(key)
+        if entry is None or entry.version != version:
+            return None
+        return entry
+
+    def set(self, key, body, version=None, last_modified=None, variants=None):
+        entry = CacheEntry(body, version, last_modified, variants)
+        self.backend.set(key, entry)
+        return entry
+
+    def invalidate_catalog(self):
+        self.backend.incr('catalog')
+
+    def invalidate_course(self, course_id):
+        self.backend.delete(self.course_key(course_id))
+        self.invalidate_catalog()
+
+    def clear(self):
+        self.backend.clear()
+
+
+cache = ResponseCache()
@@ -0,0 +1,240 @@
+import argparse
+import io
+import json
+import os
+import resource
+import select
+import signal
+import sys
+import textwrap
+import time
+
+# Sandbox worker for challenge grading, see grading.py. Runs as its own
+# `python -I -S` process with an empty environment, reading one job per line
+# on stdin and answering with one JSON line on stdout. It never runs any of
+# the job's code itself: the submission runs in a child forked from here,
+# and the tests that only look at the source in another, so CPU time, memory
+# and file limits apply to one job only and the submission can't reach the
+# code that checks it.
+#
+# Children chroot into an empty directory (--root) and switch to an
+# unprivileged user (--user uid:gid) before running anything, so they can't
+# read the app, its config or the database, and can't signal or trace the
+# worker. That needs the worker to start as root; without --user/--root
+# (GRADER_USER= for development) children keep the server's user and
+# filesystem. Nothing can be imported inside the chroot, so the modules a
+# submission may use are imported here first (SANDBOX_MODULES). Network
+# access isn't cut off, run the workers in a container without a network
+# for that.
+#
+# The submission's child only reports what the tests returned; grading.py
+# compares that with the expected values, which never get here.
+#
+# This file only uses the standard library and must not import the app.
+
+MAX_OUTPUT = 4096  # characters of print() output sent back
+MAX_RESULT = 1024 * 1024  # bytes a child may send back, past that it's a crash
+
+SANDBOX_MODULES = ('bisect', 'collections', 'copy', 'datetime', 'decimal', 'fractions', 'functools', 'heapq',
+                   'itertools', 'math', 'operator', 'random', 're', 'statistics', 'string')
+
+
+def _limit(name, value):
+    try:
+        resource.setrlimit(name, (value, value))
+    except (ValueError, OSError):
+        pass  # not supported here, the wall-clock limit still applies
+
+
+def _enter_sandbox(limits, sandbox):
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDWR)  # before the chroot, there's no /dev in there
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    if sandbox['root']:
+        os.chroot(sandbox['root'])
+        os.chdir('/')
+    if sandbox['user']:
+        uid, gid = sandbox['user']
+        os.setgroups([])
+        os.setgid(gid)
+        os.setuid(uid)
+    _limit(resource.RLIMIT_CPU, limits['cpu_seconds'])
+    _limit(resource.RLIMIT_AS, limits['memory_mb'] * 1024 * 1024)
+    _limit(resource.RLIMIT_FSIZE, 0)
+    _limit(resource.RLIMIT_NPROC, 0)
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)  # writing a file raises instead of killing us
+
+
+def _error(e):
+    return f'{type(e).__name__}: {e}'
+
+
+def _call(test, namespace, code):
+    # a test is the body of a function of `code` (the submitted source)
+    source = 'def __test__(code):\n' + textwrap.indent(test.get('test') or 'pass', '    ')
+    exec(compile(source, '<test>', 'exec'), namespace)
+    return namespace.pop('__test__')(code)
+
+
+def _submission(job):
+    # runs the submission, then the tests that call into it, with its globals; reports their return values
+    output = io.StringIO()
+    sys.stdout = sys.stderr = output
+    sys.stdin = io.StringIO()
+
+    code = job['code']
+    namespace = {'__name__': '__main__'}
+    error = None
+    try:
+        exec(compile(code, '<submission>', 'exec'), namespace)
+    except BaseException as e:
+        error = _error(e)
+
+    values = []
+    for test in job['tests']:
+        if error is not None:
+            values.append({'error': error})
+            continue
+        try:
+            value = _call(test, namespace, code)
+            json.dumps(value)  # only JSON values can be compared
+            values.append({'value': value})
+        except BaseException as e:
+            values.append({'error': _error(e)})
+    return {'error': error, 'values': values, 'output': output.getvalue()[:MAX_OUTPUT]}
+
+
+def _source_checks(job):
+    # the tests that only read the source; the submission never runs in this process
+    values = []
+    for test in job['tests']:
+        try:
+            values.append({'value': bool(_call(test, {'__name__': '__main__'}, job['code']))})
+        except NameError as e:
+            values.append({'error': f"{_error(e)} (tests without an expected value only see the source, as `code`)"})
+        except BaseException as e:
+            values.append({'error': _error(e)})
+    return {'values': values}
+
+
+def _fork(target, job, limits, sandbox, deadline):
+    # runs target(job) in a sandboxed child; returns ('ok', its JSON answer), ('timeout', None) or ('crashed', None)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            _enter_sandbox(limits, sandbox)
+            payload = json.dumps(target(job)).encode()
+            while payload:
+                payload = payload[os.write(write_fd, payload):]
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+
+    chunks, size = [], 0
+    outcome = 'ok'
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+            outcome = 'timeout'
+            break
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_RESULT:
+            outcome = 'crashed'
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    if outcome != 'ok':
+        for kill in (os.killpg, os.kill):  # the child's session, or just the child if it didn't get to setsid
+            try:
+                kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+    done, status = os.waitpid(pid, os.WNOHANG)
+    while not done and time.monotonic() < deadline:
+        # the pipe closes just before the child is gone, or it closed it and kept running
+        time.sleep(0.001)
+        done, status = os.waitpid(pid, os.WNOHANG)
+    if not done:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        outcome = 'timeout'
+    elif outcome == 'ok' and os.WIFSIGNALED(status) and os.WTERMSIG(status) in (signal.SIGXCPU, signal.SIGKILL):
+        outcome = 'timeout'
+    if outcome != 'ok':
+        return outcome, None
+    try:
+        answer = json.loads(b''.join(chunks))
+    except (ValueError, RecursionError):
+        return 'crashed', None
+    return 'ok', answer
+
+
+def _values(answer, count):
+    # the shape we asked for, or None: the submission's child can send anything
+    values = answer.get('values') if isinstance(answer, dict) else None
+    if not isinstance(values, list) or len(values) != count or not all(isinstance(v, dict) for v in values):
+        return None
+    return [{'error': str(v['error'])} if 'error' in v else {'value': v.get('value')} for v in values]
+
+
+def run(job, sandbox):
+    started = time.monotonic()
+    deadline = started + job['limits']['wall_seconds']
+    tests = job['tests']
+    calls = [i for i, test in enumerate(tests) if test.get('kind') == 'value']
+    checks = [i for i, test in enumerate(tests) if test.get('kind') != 'value']
+    results = [{'description': test.get('description', '')} for test in tests]
+
+    def finish(status, error=None, output=''):
+        return {'status': status, 'results': results, 'error': error, 'output': output,
+                'duration_ms': int((time.monotonic() - started) * 1000)}
+
+    outcome, answer = _fork(_submission, dict(job, tests=[tests[i] for i in calls]), job['limits'], sandbox, deadline)
+    if outcome == 'timeout':
+        return finish('timeout', 'Time limit exceeded')
+    values = _values(answer, len(calls)) if outcome == 'ok' else None
+    if values is None:
+        return finish('crashed', 'Submission crashed')
+    for i, value in zip(calls, values):
+        results[i].update(value)
+    error = answer.get('error')
+    output = answer.get('output')
+    error = str(error)[:MAX_OUTPUT] if error is not None else None
+    output = str(output)[:MAX_OUTPUT] if output else ''
+
+    if error is not None:
+        for i in checks:
+            results[i]['error'] = error
+    elif checks:
+        outcome, answer = _fork(_source_checks, dict(job, tests=[tests[i] for i in checks]), job['limits'], sandbox,
+                                deadline)
+        values = _values(answer, len(checks)) if outcome == 'ok' else None
+        if values is None:
+            return finish('timeout' if outcome == 'timeout' else 'crashed', 'Tests could not be run', output)
+        for i, value in zip(checks, values):
+            results[i].update(value)
+    return finish('ran', error, output)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--user', help='uid:gid to run the children as')
+    parser.add_argument('--root', help='empty directory to chroot the children into')
+    args = parser.parse_args()
+    sandbox = {'user': tuple(int(n) for n in args.user.split(':')) if args.user else None, 'root': args.root}
+    for name in SANDBOX_MODULES:
+        __import__(name)
+
+    for line in sys.stdin:
+        sys.stdout.write(json.dumps(run(json.loads(line), sandbox)) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
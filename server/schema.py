@@ -0,0 +1,124 @@
+import os
+import re
+from sqlalchemy import inspect, text
+from models import db
+
+# Schema setup without Alembic on the request path. Migrations are applied
+# explicitly (`flask db upgrade`, or `flask ensure-schema` in a deploy step);
+# a cold start only compares the database's alembic_version with the newest
+# revision file, one cheap query, and refuses to start if they differ. Nothing
+# locks a migration against another process running one, so serverless
+# instances and uvicorn workers must not migrate as they start: AUTO_MIGRATE=1
+# is only for a single process that starts alone.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+_REVISION = re.compile(r"^revision = ['\"](\w+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision = (?:['\"](\w+)['\"]|None)", re.MULTILINE)
+
+# the tables as they were before migrations (migrations/versions/30abb744cf73)
+BASELINE_REVISION = '30abb744cf73'
+
+_head = None
+
+
+class SchemaOutdated(RuntimeError):
+    pass
+
+
+def init_migrate(app):
+    if 'migrate' in app.extensions:
+        return
+    from flask_migrate import Migrate
+    import course_search
+    Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True, include_object=course_search.include_object)
+
+
+def head_revision():
+    # read straight from the revision files, parsing them is much cheaper than
+    # loading Alembic's script directory
+    global _head
+    if _head is None:
+        revisions, parents = set(), set()
+        versions = os.path.join(MIGRATIONS_DIR, 'versions')
+        for name in os.listdir(versions):
+            if not name.endswith('.py'):
+                continue
+            with open(os.path.join(versions, name)) as f:
+                source = f.read()
+            revision = _REVISION.search(source)
+            if revision:
+                revisions.add(revision.group(1))
+                down = _DOWN_REVISION.search(source)
+                if down and down.group(1):
+                    parents.add(down.group(1))
+        heads = revisions - parents
+        if len(heads) != 1:
+            raise SchemaOutdated(f'expected one migration head, found {sorted(heads)}')
+        _head = heads.pop()
+    return _head
+
+
+def current_revision(connection):
+    try:
+        return connection.execute(text('SELECT version_num FROM alembic_version')).scalar()
+    except Exception:
+        connection.rollback()
+        return None
+
+
+def unversioned_revision(connection):
+    # which revision a database without alembic_version is at, from the columns it has:
+    # made by db.create_all() from the current models (seed.py, app.py) -> head,
+    # from the pre-migration models -> the baseline, anything else is ambiguous
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+
+    def columns(table):
+        return {c['name'] for c in inspector.get_columns(table)} if table in tables else set()
+
+    if all({c.name for c in table.columns} <= columns(table.name) for table in db.metadata.sorted_tables):
+        return head_revision()
+    if 'module_completions' not in tables and 'completed_module_ids' in columns('enrollments'):
+        return BASELINE_REVISION
+    raise SchemaOutdated('database has tables but no alembic_version and matches no known revision; '
+                         'stamp it by hand (`flask db stamp <revision>`) and run `flask db upgrade`')
+
+
+def ensure_schema(app, auto_migrate=None):
+    # returns what was done: 'current', 'upgraded' or 'stamped'
+    if auto_migrate is None:
+        auto_migrate = app.config.get('AUTO_MIGRATE', False)
+    head = head_revision()
+    with app.app_context():
+        with db.engine.connect() as connection:
+            current = current_revision(connection)
+            if current == head:
+                return 'current'
+            stamp_at = None
+            if current is None and inspect(connection).has_table('users'):
+                stamp_at = unversioned_revision(connection)
+
+        if not auto_migrate:
+            run = 'flask --app app db upgrade'
+            if stamp_at:
+                run = f'flask --app app db stamp {stamp_at} && {run}'
+            state = f'has no alembic_version, its tables match {stamp_at}' if stamp_at else \
+                f'is at {current or "no revision"}'
+            raise SchemaOutdated(f'database {state}, code expects {head}; '
+                                 f'run `{run}` (or `flask --app app ensure-schema`, which does the same)')
+        init_migrate(app)
+        from flask_migrate import stamp, upgrade
+        if stamp_at is not None:
+            stamp(directory=MIGRATIONS_DIR, revision=stamp_at)
+            if stamp_at == head:
+                return 'stamped'
+        upgrade(directory=MIGRATIONS_DIR)
+        return 'upgraded'
+
+
+def init_app(app):
+    @app.cli.command('ensure-schema')
+    def ensure_schema_command():
+        """Upgrade the database to the latest migration if it's behind."""
+        print(f'schema {ensure_schema(app, auto_migrate=True)} at {head_revision()}')
@@ -324,11 +324,16 @@ Task: Add an h2 element with the text "My First Website" below the existing h1.'
             # Sample enrollments
         enrollments = [
             Enrollment(user_id=alice.id, course_id=js_course.id, progress_percentage=0, completed_modules=0),
-            Enrollment(user_id=alice.id, course_id=html_course.id, progress_percentage=25, completed_modules=2)
+            Enrollment(user_id=alice.id, course_id=html_course.id)
         ]
         
         for enrollment in enrollments:
             db.session.add(enrollment)
+        db.session.flush()
+        
+        # alice has finished the first two web dev lessons
+        html_module_ids = [m.id for m in all_modules if m.course_id == html_course.id][:2]
+        enrollments[1].mark_modules_complete(html_module_ids)
         
         # Sample instructor application
         app_obj = InstructorApplication(
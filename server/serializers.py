@@ -0,0 +1,229 @@
+import json
+import operator
+from flask import request
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from models import Course, Module, Enrollment, Submission, InstructorApplication, User, RedFlag
+
+# Sparse fieldsets for the list endpoints.
+#   ?fields=id,title,progress_percentage   just these fields
+#   ?include=course                        add a related object (slim, see the nested serializers below)
+# Every field says which columns and relationships it reads, and the query
+# loads exactly those: load_only for columns, joinedload for a single related
+# row, selectinload for a collection. Asking for a field or include that
+# doesn't exist is a 400 (InvalidFields).
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+class Field:
+    # get(obj) -> value; columns are read from obj, relations maps a relationship to the columns read from it
+    def __init__(self, get, columns=(), relations=None):
+        self.get = get
+        self.columns = columns
+        self.relations = relations or {}
+
+
+def column(name):
+    # dates are left as they are, app.json writes them as ISO 8601
+    return Field(operator.attrgetter(name), columns=(name,))
+
+
+class Related:
+    # a relationship rendered with another serializer, limited to fields
+    def __init__(self, relation, serializer, fields):
+        self.relation = relation
+        self.serializer = serializer
+        self.fields = fields
+
+
+def _new_plan():
+    return {'columns': set(), 'relations': {}}
+
+
+def _merge(plan, other):
+    plan['columns'] |= other['columns']
+    for name, sub in other['relations'].items():
+        _merge(plan['relations'].setdefault(name, _new_plan()), sub)
+
+
+def loader_options(model, plan):
+    # load_only the columns, then one loader per relationship, chosen by its direction
+    options = []
+    columns = set(plan['columns'])
+    for name in plan['relations']:
+        prop = getattr(model, name).property
+        if not prop.uselist:
+            columns |= {c.key for c in prop.local_columns}  # the foreign key, so the join has something to match
+    columns = [getattr(model, name) for name in sorted(columns)]
+    if columns:
+        options.append(load_only(*columns))
+    for name, sub in sorted(plan['relations'].items()):
+        attr = getattr(model, name)
+        strategy = selectinload if attr.property.uselist else joinedload
+        options.append(strategy(attr).options(*loader_options(attr.property.mapper.class_, sub)))
+    return options
+
+
+class Serializer:
+    def __init__(self, model, fields, default, includes=None, default_includes=()):
+        self.model = model
+        self.fields = fields
+        self.default = default
+        self.includes = includes or {}
+        self.default_includes = default_includes
+
+    def select(self, fields=None, include=None):
+        # comma-separated names, as they come from the query string; None means the defaults
+        if fields:
+            names = [name.strip() for name in fields.split(',') if name.strip()]
+            unknown = [name for name in names if name not in self.fields]
+            if unknown:
+                raise InvalidFields(f'Unknown field(s): {", ".join(unknown)}')
+        else:
+            names = list(self.default)
+        if include is not None:
+            includes = [name.strip() for name in include.split(',') if name.strip()]
+            unknown = [name for name in includes if name not in self.includes]
+            if unknown:
+                raise InvalidFields(f'Unknown include(s): {", ".join(unknown)}')
+        else:
+            includes = list(self.default_includes)
+        return names, includes
+
+    def from_request(self):
+        return self.select(request.args.get('fields'), request.args.get('include'))
+
+    def plan(self, names, includes=()):
+        plan = _new_plan()
+        for name in names:
+            field = self.fields[name]
+            plan['columns'] |= set(field.columns)
+            for relation, columns in field.relations.items():
+                plan['relations'].setdefault(relation, _new_plan())['columns'] |= set(columns)
+        for name in includes:
+            related = self.includes[name]
+            _merge(plan['relations'].setdefault(related.relation, _new_plan()), related.serializer.plan(related.fields))
+        return plan
+
+    def options(self, names, includes=()):
+        return loader_options(self.model, self.plan(names, includes))
+
+    def dump(self, obj, names, includes=()):
+        data = {name: self.fields[name].get(obj) for name in names}
+        for name in includes:
+            related = self.includes[name]
+            value = getattr(obj, related.relation)
+            if value is None:
+                data[name] = None
+            elif isinstance(value, list):
+                data[name] = [related.serializer.dump(item, related.fields) for item in value]
+            else:
+                data[name] = related.serializer.dump(value, related.fields)
+        return data
+
+    def dump_all(self, objs, names, includes=()):
+        return [self.dump(obj, names, includes) for obj in objs]
+
+
+def _instructor_name(user):
+    return f'{user.first_name} {user.last_name}' if user.first_name else user.username
+
+
+users = Serializer(User, {
+    'id': column('id'),
+    'username': column('username'),
+    'email': column('email'),
+    'role': column('role'),
+    'first_name': column('first_name'),
+    'last_name': column('last_name'),
+    'bio': column('bio'),
+    'avatar': column('avatar'),
+    'created_at': column('created_at'),
+}, default=('id', 'username', 'email', 'role', 'first_name', 'last_name', 'bio', 'avatar', 'created_at'))
+
+modules = Serializer(Module, {name: column(name) for name in Module.OUTLINE_COLUMNS + ('course_id',)},
+                     default=Module.OUTLINE_COLUMNS)
+
+courses = Serializer(Course, {
+    'id': column('id'),
+    'title': column('title'),
+    'description': column('description'),
+    'price': column('price'),
+    'level': column('level'),
+    'category': column('category'),
+    'thumbnail': column('thumbnail'),
+    'duration': column('duration'),
+    'instructor_id': column('instructor_id'),
+    'instructor_name': Field(lambda c: _instructor_name(c.instructor),
+                             relations={'instructor': ('first_name', 'last_name', 'username')}),
+    'instructor_avatar': Field(lambda c: c.instructor.avatar, relations={'instructor': ('avatar',)}),
+    'is_published': column('is_published'),
+    'created_at': column('created_at'),
+    'updated_at': column('updated_at'),
+    'module_count': column('module_count'),
+    'student_count': column('student_count'),
+}, default=('id', 'title', 'description', 'price', 'level', 'category', 'thumbnail', 'duration', 'instructor_id',
+            'instructor_name', 'instructor_avatar', 'is_published', 'created_at', 'module_count', 'student_count'),
+   includes={
+    # outline only, lesson bodies come from the per-module endpoint
+    'modules': Related('modules', modules, Module.OUTLINE_COLUMNS),
+    'instructor': Related('instructor', users, ('id', 'username', 'first_name', 'last_name', 'avatar')),
+})
+
+enrollments = Serializer(Enrollment, {
+    'id': column('id'),
+    'user_id': column('user_id'),
+    'course_id': column('course_id'),
+    'enrollment_date': column('enrollment_date'),
+    'progress_percentage': column('progress_percentage'),
+    'completed_modules': column('completed_modules'),
+    'grade': column('grade'),
+    'completion_status': column('completion_status'),
+    'last_accessed': column('last_accessed'),
+    'course_title': Field(lambda e: e.course.title if e.course else None, relations={'course': ('title',)}),
+    # not in the default, descriptions can be long; ?fields=...,course_description for the pages that show it
+    'course_description': Field(lambda e: e.course.description if e.course else None,
+                                relations={'course': ('description',)}),
+    'completed_module_ids': Field(lambda e: [str(c.module_id) for c in e.completions],
+                                  relations={'completions': ('module_id',)}),
+}, default=('id', 'user_id', 'course_id', 'enrollment_date', 'progress_percentage', 'completed_modules', 'grade',
+            'completion_status', 'last_accessed', 'course_title', 'completed_module_ids'),
+   includes={
+    'course': Related('course', courses, ('id', 'title', 'level', 'category', 'thumbnail', 'duration',
+                                          'instructor_name', 'module_count')),
+})
+
+submissions = Serializer(Submission, {
+    'id': column('id'),
+    'module_id': column('module_id'),
+    'code': column('code'),
+    'status': column('status'),
+    'passed_tests': column('passed_tests'),
+    'total_tests': column('total_tests'),
+    'results': Field(lambda s: json.loads(s.results) if s.results else [], columns=('results',)),
+    'output': column('output'),
+    'error': column('error'),
+    'duration_ms': column('duration_ms'),
+    'created_at': column('created_at'),
+}, default=('id', 'module_id', 'code', 'status', 'passed_tests', 'total_tests', 'results', 'output', 'error',
+            'duration_ms', 'created_at'))
+
+applications = Serializer(InstructorApplication, {
+    'id': column('id'),
+    'user_id': column('user_id'),
+    'qualifications': column('qualifications'),
+    'experience': column('experience'),
+    'linkedin_url': column('linkedin_url'),
+    'status': column('status'),
+    'applied_at': column('applied_at'),
+    'reviewed_at': column('reviewed_at'),
+    'admin_notes': column('admin_notes'),
+}, default=('id', 'user_id', 'qualifications', 'experience', 'linkedin_url', 'status', 'applied_at', 'reviewed_at',
+            'admin_notes'),
+   includes={'user': Related('user', users, ('id', 'username', 'email', 'first_name', 'last_name'))},
+   default_includes=('user',))
+
+red_flags = Serializer(RedFlag, {name: column(name) for name in ('id', 'email', 'username', 'reason', 'flagged_at')},
+                       default=('id', 'email', 'username', 'reason', 'flagged_at'))